@@ -20,6 +20,26 @@ def create_app(config_class=None):
     init_extensions(app)
     register_routes(api)
 
+    # 初始化异步上传队列
+    from .utils.upload_queue import upload_queue
+    upload_queue.init_app(app)
+
+    # 初始化文件删除队列
+    from .utils.deletion_queue import deletion_queue
+    deletion_queue.init_app(app)
+
+    # 初始化接口响应缓存
+    from .utils.response_cache import response_cache
+    response_cache.init_app(app)
+
+    # 初始化下载外部图片的HTTP连接池
+    from .utils.http_client import http_client
+    http_client.init_app(app)
+
+    # 注册命令行命令
+    from .commands import register_commands
+    register_commands(app)
+
     # from .utils.email_service import email_service
     # # 初始化邮件服务
     # email_service.init_app(app)
@@ -40,6 +60,9 @@ def create_app(config_class=None):
     # 初始化数据库
     with app.app_context():
         db.create_all()
+        # 检测提示词全文索引（由迁移创建），不可用时搜索使用LIKE
+        from .utils.image_search import detect_search_index
+        detect_search_index()
 
     # 开发环境路由打印
     # if app.debug:
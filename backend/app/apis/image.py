@@ -2,17 +2,219 @@ from flask import request, current_app
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import base64
+import hashlib
+import json
 import requests
-from datetime import datetime
-from io import BytesIO
-from PIL import Image
+from datetime import datetime, timedelta
 
 from app import db, APIResponse
-from app.models.image_records import ImageRecord
-from app.models.user_storage import UserStorage, update_storage_on_image_save, \
-    update_storage_on_image_delete
-from app.utils.oss_service import oss_service
+from app.models.image_records import ImageRecord, find_duplicate_image, count_image_references, \
+    query_image_list, query_images_by_ids, query_image_detail, get_user_image_version, compile_fields, \
+    parse_fields
+from app.models.storage_deletion import enqueue_deletions
+from app.models.storage_reservation import reserve_storage, commit_reservation, release_reservation
+from app.models.upload_session import UploadSession
+from app.models.user_storage import UserStorage, update_storage_on_image_delete
+from app.utils.deletion_queue import deletion_queue
+from app.utils.http_client import http_client
+from app.utils.image_derivatives import attach_derivatives, schedule_derivatives, derivative_keys
+from app.utils.image_ingest import ImageIngest, StreamIngest, check_image_format, get_image_info
+from app.utils.image_probe import MIME_TYPES, probe_image, verify_image
+from app.utils.image_search import search_images
+from app.utils.image_transcode import format_type
+from app.utils.response_cache import response_cache
+from app.utils.storage import file_storage
+from app.utils.upload_queue import upload_queue, UploadTask
+
+
+QUOTA_EXCEEDED_MESSAGE = '存储空间不足或图片数量已达上限'
+
+
+class QuotaExceeded(Exception):
+    """占用存储配额失败（并发保存时预检查通过但条件更新未命中）"""
+
+
+def _parse_image_metadata(data):
+    """解析并校验图片元数据，返回 (metadata, 错误信息)"""
+    metadata = {
+        'prompt': (data.get('prompt') or '').strip(),
+        'model': (data.get('model') or '').strip(),
+        'elapsed_time': data.get('elapsed_time', ''),
+        'base_url': data.get('base_url', ''),
+        'api_key': data.get('api_key', ''),
+        'model_response': data.get('model_response', '')
+    }
+
+    # 参数长度验证
+    if len(metadata['prompt']) > 2000:
+        return None, '提示词长度不能超过2000字符'
+
+    if len(metadata['model']) > 100:
+        return None, '模型名称长度不能超过100字符'
+
+    return metadata, None
+
+
+def _build_image_record(user_id, metadata, upload_result):
+    """根据元数据和上传结果构建图片记录"""
+    return ImageRecord(
+        user_id=user_id,
+        prompt=metadata['prompt'],
+        model=metadata['model'],
+        base_url=metadata['base_url'],
+        api_key=metadata['api_key'],
+        image_url=upload_result['url'],
+        image_filename=upload_result['filename'],
+        elapsed_time=metadata['elapsed_time'],
+        model_response=metadata['model_response'],
+        image_width=upload_result.get('width'),
+        image_height=upload_result.get('height'),
+        image_size=upload_result['size'],
+        original_size=upload_result.get('original_size', upload_result['size']),
+        content_hash=upload_result.get('content_hash')
+    )
+
+
+def _process_derivatives(image_record, image_bytes=None):
+    """按配置同步或在后台生成缩略图/预览图（需在图片记录提交后调用）"""
+    mode = current_app.config.get('IMAGE_DERIVATIVES_MODE', 'async')
+    if mode == 'sync':
+        if attach_derivatives(image_record, image_bytes):
+            db.session.commit()
+        else:
+            db.session.rollback()
+    elif mode == 'async':
+        schedule_derivatives(current_app._get_current_object(), image_record.image_id, image_bytes)
+
+
+def _reservation_ttl():
+    return current_app.config.get('STORAGE_RESERVATION_TTL', 300)
+
+
+def _find_duplicate(user_id, content_hash):
+    """查找可复用的相同内容图片（未开启去重时返回None）"""
+    if not current_app.config.get('IMAGE_DEDUP_ENABLED'):
+        return None
+    return find_duplicate_image(user_id, content_hash)
+
+
+def _save_duplicate(user_id, storage, metadata, duplicate, reservation):
+    """复用已有OSS文件保存图片记录，只占用图片数量，不重复计算存储空间"""
+    try:
+        image_record = _build_image_record(user_id, metadata, {
+            'url': duplicate.image_url,
+            'filename': duplicate.image_filename,
+            'size': duplicate.image_size,
+            'width': duplicate.image_width,
+            'height': duplicate.image_height,
+            'content_hash': duplicate.content_hash
+        })
+        image_record.thumb_url = duplicate.thumb_url
+        image_record.preview_url = duplicate.preview_url
+
+        db.session.add(image_record)
+        db.session.flush()
+
+        if not commit_reservation(reservation, 0):
+            db.session.rollback()
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+        db.session.commit()
+
+        current_app.logger.info(f"图片内容重复，复用文件保存成功: {image_record.image_id}")
+
+        return APIResponse.success(
+            data={
+                'image': image_record.to_simple_dict(),
+                'storage': storage.to_dict()
+            },
+            message='图片保存成功'
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"保存图片记录失败: {str(e)}")
+        return APIResponse.error('保存失败，请稍后重试', code=500)
+
+
+
+def _encode_cursor(*values):
+    """生成分页游标（不透明字符串）"""
+    payload = json.dumps(list(values), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
 
+def _decode_cursor(cursor, *types):
+    """解析分页游标，按types依次转换各个值，无效时返回None"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(types):
+            return None
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_fields(simple=False):
+    """
+    解析fields参数（逗号分隔的字段名），返回 (字段集, 错误信息)
+
+    未传fields时使用完整版本或简化版本的字段；simple为true时提示词输出为预览。
+    """
+    fields, unknown = parse_fields(request.args.get('fields'))
+    if unknown:
+        return None, f"不支持的字段: {', '.join(unknown)}"
+    return compile_fields(fields, simple), None
+
+
+def _image_etag(user_id, kind, params):
+    """根据用户图片数据版本和请求参数生成强ETag值（不含引号，只执行一次聚合查询）"""
+    updated_at, count = get_user_image_version(user_id)
+    version = f"{user_id}|{updated_at.isoformat() if updated_at else ''}|{count}|{kind}|" + \
+        '|'.join(str(param) for param in params)
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag):
+    """客户端缓存仍有效时返回304响应，否则返回None"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+
+def _with_etag(response, etag):
+    """给接口响应加上ETag"""
+    body, code = response
+    return body, code, {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+
+
+def _cached_response(user_id, kind, params, loader):
+    """
+    带ETag的缓存读取：ETag与响应数据一起写入缓存，命中时返回同一份ETag
+
+    ETag在加载数据之前计算，缓存中的数据至少与ETag对应的版本一样新；
+    客户端携带的ETag与当前版本一致时直接返回304。
+
+    Returns:
+        (响应, True) 或 (None, False)（loader返回None时）
+    """
+    etag = _image_etag(user_id, kind, params)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified, True
+
+    def load():
+        data = loader()
+        return {'etag': etag, 'data': data} if data is not None else None
+
+    entry = response_cache.get_or_load(user_id, kind, params, load)
+    if entry is None:
+        return None, False
+    return _with_etag(APIResponse.success(data=entry['data']), entry['etag']), True
 
 class ImageSaveResource(Resource):
     """图片保存接口 - 前端绘图成功后调用"""
@@ -29,80 +231,88 @@ class ImageSaveResource(Resource):
             if field not in data:
                 return APIResponse.error(f'缺少必需参数: {field}')
 
-        image_data = data.get('image_data')
-        prompt = data.get('prompt', '').strip()
-        model = data.get('model', '').strip()
-        elapsed_time = data.get('elapsed_time', '')
-        base_url = data.get('base_url', '')
-        api_key = data.get('api_key', '')
-
-        # 参数长度验证
-        if len(prompt) > 2000:
-            return APIResponse.error('提示词长度不能超过2000字符')
+        metadata, error_message = _parse_image_metadata(data)
+        if error_message:
+            return APIResponse.error(error_message)
 
-        if len(model) > 100:
-            return APIResponse.error('模型名称长度不能超过100字符')
-
-        # 验证base64格式
-        validation_result = self._validate_base64_image(image_data)
-        if not validation_result['valid']:
-            current_app.logger.error(f"图片数据验证失败: {validation_result['message']}")
-            return APIResponse.error(f"数据中未找到图片: {validation_result['message']}")
+        # 拆分data URL（此时不解码）
+        ingest = ImageIngest(data.get('image_data'))
+        parse_result = ingest.parse()
+        if not parse_result['valid']:
+            current_app.logger.error(f"图片数据验证失败: {parse_result['message']}")
+            return APIResponse.error(f"数据中未找到图片: {parse_result['message']}")
 
         # 检查用户存储空间
         storage = UserStorage.query.filter_by(user_id=user_id).first()
         if not storage:
             return APIResponse.error('用户存储信息不存在')
 
-        # 估算图片大小
+        # 根据base64长度估算图片大小并预留配额，配额不足时无需解码
+        estimated_size = ingest.estimated_size
+        if estimated_size > storage.max_file_size:
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+        reservation = reserve_storage(user_id, estimated_size, ttl_seconds=_reservation_ttl())
+        if not reservation:
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
         try:
-            base64_part = image_data.split(',')[1] if ',' in image_data else image_data
-            estimated_size = len(base64.b64decode(base64_part))
-        except Exception:
-            return APIResponse.error('图片数据解析失败')
+            return self._save(user_id, storage, metadata, ingest, reservation, data.get('async'))
+        finally:
+            # 保存成功时预留已转为使用量，这里不会重复归还
+            release_reservation(reservation)
+
+    def _save(self, user_id, storage, metadata, ingest, reservation, is_async=False):
+        """解码、上传并保存图片记录（已预留配额）"""
+        # 解码并验证图片数据（整个请求只解码这一次）
+        validation_result = ingest.validate(strict=current_app.config.get('IMAGE_STRICT_VERIFY', False))
+        if not validation_result['valid']:
+            current_app.logger.error(f"图片数据验证失败: {validation_result['message']}")
+            return APIResponse.error(f"数据中未找到图片: {validation_result['message']}")
+
+        # 相同内容的图片已保存过时直接复用OSS文件，不再上传
+        duplicate = _find_duplicate(user_id, ingest.content_hash)
+        if duplicate:
+            return _save_duplicate(user_id, storage, metadata, duplicate, reservation)
 
-        # 检查存储限制
-        if not storage.can_upload(estimated_size):
-            return APIResponse.error('存储空间不足或图片数量已达上限')
+        # 异步保存：先写入pending记录，由后台队列上传
+        if is_async and current_app.config.get('ASYNC_UPLOAD_ENABLED'):
+            return self._save_async(user_id, storage, metadata, ingest, reservation)
 
         try:
             # 上传到OSS
-            current_app.logger.info(f"用户 {user_id} 开始上传图片，预估大小: {estimated_size} bytes")
+            current_app.logger.info(f"用户 {user_id} 开始上传图片，大小: {ingest.size} bytes")
 
-            upload_result = oss_service.upload_base64_image(
-                base64_data=image_data,
+            upload_result = file_storage.upload_image_bytes(
+                image_bytes=ingest.image_bytes,
                 user_id=user_id,
-                folder='ai-images'
+                folder='ai-images',
+                image_info=ingest.image_info,
+                transcode_policy=current_app.config.get('IMAGE_TRANSCODE_POLICY'),
+                transcode_quality=current_app.config.get('IMAGE_TRANSCODE_QUALITY', 85)
             )
 
             if not upload_result['success']:
                 current_app.logger.error(f"OSS上传失败: {upload_result['message']}")
                 return APIResponse.error(f"图片上传失败: {upload_result['message']}")
 
+            upload_result['content_hash'] = ingest.content_hash
+
             # 保存图片记录到数据库
-            image_record = ImageRecord(
-                user_id=user_id,
-                prompt=prompt,
-                model=model,
-                base_url=base_url,
-                api_key=api_key,
-                image_url=upload_result['url'],
-                image_filename=upload_result['filename'],
-                elapsed_time=elapsed_time,
-                model_response=data.get('model_response', ''),
-                image_width=upload_result.get('width'),
-                image_height=upload_result.get('height'),
-                image_size=upload_result['size']
-            )
+            image_record = _build_image_record(user_id, metadata, upload_result)
 
             db.session.add(image_record)
             db.session.flush()  # 获取生成的image_id
 
-            # 更新存储使用量
-            update_storage_on_image_save(user_id, upload_result['size'])
+            # 预留转为实际使用量（按实际存储大小，与图片记录在同一事务中提交）
+            if not commit_reservation(reservation, upload_result['size']):
+                db.session.rollback()
+                file_storage.delete_file(upload_result['filename'])
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
 
             db.session.commit()
 
+            _process_derivatives(image_record, ingest.image_bytes)
+
             current_app.logger.info(f"图片保存成功: {image_record.image_id}")
 
             return APIResponse.success(
@@ -118,147 +328,772 @@ class ImageSaveResource(Resource):
             current_app.logger.error(f"保存图片记录失败: {str(e)}")
             return APIResponse.error('保存失败，请稍后重试', code=500)
 
-    def _validate_base64_image(self, image_data):
-        """详细验证base64图片数据并返回验证结果"""
+    def _save_async(self, user_id, storage, metadata, ingest, reservation):
+        """写入pending状态的记录并提交后台上传，返回202"""
+        if upload_queue.is_full():
+            return APIResponse.error('上传队列繁忙，请稍后重试', code=503)
+
         try:
-            current_app.logger.info(f"开始验证图片数据，数据长度: {len(image_data) if image_data else 0}")
-            
-            if not image_data:
-                return {'valid': False, 'message': '图片数据为空'}
-            
-            if not isinstance(image_data, str):
-                return {'valid': False, 'message': '图片数据必须是字符串格式'}
-            
-            # 检查是否包含data URL前缀
-            if image_data.startswith('data:image'):
-                current_app.logger.info("检测到data URL格式")
-                if ',' not in image_data:
-                    return {'valid': False, 'message': 'data URL格式错误，缺少逗号分隔符'}
-                
-                # 提取base64部分
-                try:
-                    header, base64_part = image_data.split(',', 1)
-                    current_app.logger.info(f"data URL头部: {header}")
-                except ValueError:
-                    return {'valid': False, 'message': 'data URL格式错误，无法分割'}
+            image_record = _build_image_record(user_id, metadata, {
+                'url': '',
+                'filename': None,
+                'size': ingest.size,
+                'width': ingest.image_info.get('width'),
+                'height': ingest.image_info.get('height'),
+                'content_hash': ingest.content_hash
+            })
+            image_record.status = 'pending'
+
+            db.session.add(image_record)
+            db.session.flush()
+
+            # 先占用存储空间，上传失败时由队列归还
+            if not commit_reservation(reservation, ingest.size):
+                db.session.rollback()
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"保存图片记录失败: {str(e)}")
+            return APIResponse.error('保存失败，请稍后重试', code=500)
+
+        task = UploadTask(
+            image_id=image_record.image_id,
+            user_id=user_id,
+            image_bytes=ingest.image_bytes,
+            image_info=ingest.image_info
+        )
+        if not upload_queue.submit(task):
+            # 提交失败（队列已满），撤销记录并归还空间
+            image_record.status = 'failed'
+            image_record.deleted_at = datetime.utcnow()
+            update_storage_on_image_delete(user_id, ingest.size)
+            db.session.commit()
+            return APIResponse.error('上传队列繁忙，请稍后重试', code=503)
+
+        current_app.logger.info(f"图片已加入后台上传队列: {image_record.image_id}")
+
+        return APIResponse.success(
+            data={
+                'image_id': image_record.image_id,
+                'status': image_record.status,
+                'image': image_record.to_simple_dict(),
+                'storage': storage.to_dict()
+            },
+            message='图片已提交，正在后台上传',
+            code=202
+        )
+
+
+class ImageBatchSaveResource(Resource):
+    """
+    批量保存接口 - 一次生成多张图片时调用
+
+    所有图片共用prompt/model等元数据，配额按总大小一次预留，
+    各图片并发上传到OSS，所有记录和存储使用量在同一事务中写入。
+    单张图片失败不影响其他图片，响应中按顺序返回每张图片的结果。
+    """
+
+    @jwt_required()
+    def post(self):
+        """批量保存AI生成的图片"""
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+
+        for field in ['images', 'prompt', 'model']:
+            if field not in data:
+                return APIResponse.error(f'缺少必需参数: {field}')
+
+        items = data.get('images')
+        if not isinstance(items, list) or not items:
+            return APIResponse.error('images必须是非空数组')
+
+        max_batch = current_app.config.get('IMAGE_BATCH_MAX', 10)
+        if len(items) > max_batch:
+            return APIResponse.error(f'单次最多保存{max_batch}张图片')
+
+        metadata, error_message = _parse_image_metadata(data)
+        if error_message:
+            return APIResponse.error(error_message)
+
+        storage = UserStorage.query.filter_by(user_id=user_id).first()
+        if not storage:
+            return APIResponse.error('用户存储信息不存在')
+
+        # 拆分data URL（不解码），每项可以是字符串或包含image_data的对象
+        results = [None] * len(items)
+        entries = []
+        for index, item in enumerate(items):
+            image_data = item.get('image_data') if isinstance(item, dict) else item
+            ingest = ImageIngest(image_data)
+            parse_result = ingest.parse()
+            if not parse_result['valid']:
+                results[index] = {'index': index, 'success': False, 'message': parse_result['message']}
+                continue
+            item_metadata = dict(metadata)
+            if isinstance(item, dict) and 'model_response' in item:
+                item_metadata['model_response'] = item.get('model_response') or ''
+            entries.append((index, ingest, item_metadata))
+
+        # 按总大小一次预留配额，配额不足时无需解码
+        reservation = None
+        if entries:
+            if any(ingest.estimated_size > storage.max_file_size for _, ingest, _ in entries):
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+            reservation = reserve_storage(
+                user_id,
+                sum(ingest.estimated_size for _, ingest, _ in entries),
+                image_count=len(entries),
+                ttl_seconds=_reservation_ttl()
+            )
+            if not reservation:
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+        strict = current_app.config.get('IMAGE_STRICT_VERIFY', False)
+        uploads = {}      # index -> Future
+        duplicates = {}   # index -> 可复用的记录或同批次中首次出现的index
+        seen_hashes = {}
+        for index, ingest, _ in entries:
+            validation_result = ingest.validate(strict=strict)
+            if not validation_result['valid']:
+                results[index] = {'index': index, 'success': False, 'message': validation_result['message']}
+                continue
+
+            duplicate = _find_duplicate(user_id, ingest.content_hash)
+            if duplicate:
+                duplicates[index] = duplicate
+            elif ingest.content_hash in seen_hashes and current_app.config.get('IMAGE_DEDUP_ENABLED'):
+                duplicates[index] = seen_hashes[ingest.content_hash]
             else:
-                base64_part = image_data
-                current_app.logger.info("检测到纯base64格式")
-            
-            # 验证base64编码
+                seen_hashes[ingest.content_hash] = index
+                uploads[index] = file_storage.submit(
+                    file_storage.upload_image_bytes,
+                    image_bytes=ingest.image_bytes,
+                    user_id=user_id,
+                    folder='ai-images',
+                    image_info=ingest.image_info,
+                    transcode_policy=current_app.config.get('IMAGE_TRANSCODE_POLICY'),
+                    transcode_quality=current_app.config.get('IMAGE_TRANSCODE_QUALITY', 85)
+                )
+
+        # 等待并发上传完成
+        upload_results = {}
+        for index, future in uploads.items():
             try:
-                decoded = base64.b64decode(base64_part)
-                current_app.logger.info(f"base64解码成功，数据大小: {len(decoded)} bytes")
+                upload_results[index] = future.result()
             except Exception as e:
-                return {'valid': False, 'message': f'base64解码失败: {str(e)}'}
-            
-            # 检查解码后的数据大小
-            if len(decoded) < 100:
-                return {'valid': False, 'message': f'解码后数据太小: {len(decoded)} bytes'}
-            
-            # 检查是否为图片格式（简单的魔数检查）
-            if not self._check_image_format(decoded):
-                return {'valid': False, 'message': '数据不是有效的图片格式'}
-            
-            current_app.logger.info("图片数据验证成功")
-            return {'valid': True, 'message': '图片数据验证成功'}
-            
+                upload_results[index] = {'success': False, 'message': str(e)}
+            if not upload_results[index]['success']:
+                current_app.logger.error(f"OSS上传失败: {upload_results[index]['message']}")
+                results[index] = {'index': index, 'success': False, 'message': '图片上传失败'}
+
+        ingests = {index: ingest for index, ingest, _ in entries}
+        saved = []
+        charged_size = 0
+        try:
+            for index, ingest, item_metadata in entries:
+                if results[index] is not None:
+                    continue
+
+                source = duplicates.get(index)
+                if isinstance(source, int):
+                    # 与同批次前面的图片内容相同
+                    source_result = upload_results.get(source)
+                    if not source_result or not source_result['success']:
+                        results[index] = {'index': index, 'success': False, 'message': '图片上传失败'}
+                        continue
+                    upload_result = dict(source_result, content_hash=ingest.content_hash)
+                    image_record = _build_image_record(user_id, item_metadata, upload_result)
+                elif source is not None:
+                    image_record = _build_image_record(user_id, item_metadata, {
+                        'url': source.image_url,
+                        'filename': source.image_filename,
+                        'size': source.image_size,
+                        'width': source.image_width,
+                        'height': source.image_height,
+                        'content_hash': source.content_hash
+                    })
+                    image_record.thumb_url = source.thumb_url
+                    image_record.preview_url = source.preview_url
+                else:
+                    upload_result = dict(upload_results[index], content_hash=ingest.content_hash)
+                    image_record = _build_image_record(user_id, item_metadata, upload_result)
+                    charged_size += upload_result['size']
+
+                db.session.add(image_record)
+                saved.append((index, image_record))
+
+            if saved:
+                db.session.flush()
+                # 预留按实际保存的数量和大小转为使用量，与记录在同一事务中提交
+                if not commit_reservation(reservation, charged_size, len(saved)):
+                    raise QuotaExceeded()
+                db.session.commit()
+
         except Exception as e:
-            current_app.logger.error(f"图片数据验证异常: {str(e)}")
-            return {'valid': False, 'message': f'验证过程异常: {str(e)}'}
-    
-    def _check_image_format(self, data):
-        """检查数据是否为常见图片格式"""
-        if len(data) < 8:
-            return False
-        
-        # 检查常见图片格式的魔数
-        magic_numbers = [
-            b'\xFF\xD8\xFF',  # JPEG
-            b'\x89\x50\x4E\x47\x0D\x0A\x1A\x0A',  # PNG
-            b'\x47\x49\x46\x38',  # GIF
-            b'\x42\x4D',  # BMP
-            b'\x52\x49\x46\x46'  # WEBP (部分)
-        ]
-        
-        for magic in magic_numbers:
-            if data.startswith(magic):
-                return True
-        
-        return False
+            db.session.rollback()
+            release_reservation(reservation)
+            # 清理已上传的文件
+            for upload_result in upload_results.values():
+                if upload_result['success']:
+                    file_storage.delete_file(upload_result['filename'])
+            if isinstance(e, QuotaExceeded):
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+            current_app.logger.error(f"批量保存图片记录失败: {str(e)}")
+            return APIResponse.error('保存失败，请稍后重试', code=500)
+
+        # 没有保存任何图片时归还整个预留；已保存时预留已由commit_reservation按实际用量结清，这里不会重复归还
+        release_reservation(reservation)
+
+        for index, image_record in saved:
+            if index in uploads:
+                _process_derivatives(image_record, ingests[index].image_bytes)
+            results[index] = {'index': index, 'success': True, 'image': image_record.to_simple_dict()}
+
+        current_app.logger.info(f"用户 {user_id} 批量保存图片: 成功 {len(saved)} 张，失败 {len(items) - len(saved)} 张")
+
+        payload = {
+            'results': results,
+            'saved': len(saved),
+            'failed': len(items) - len(saved),
+            'storage': storage.to_dict()
+        }
+        if not saved:
+            return APIResponse.error('图片保存失败', errors=payload)
+
+        return APIResponse.success(data=payload, message='图片保存成功')
+
+
+# 二进制上传时携带元数据的请求头
+METADATA_HEADER = 'X-Image-Metadata'
+
+
+def _read_header_metadata():
+    """从X-Image-Metadata请求头读取JSON元数据，返回 (元数据, 错误信息)"""
+    if any(field in request.args for field in ('prompt', 'model', 'api_key', 'model_response')):
+        return None, f'元数据请放在{METADATA_HEADER}请求头中，不要放在查询参数中'
+
+    raw = request.headers.get(METADATA_HEADER)
+    if not raw:
+        return None, f'缺少{METADATA_HEADER}请求头'
+    try:
+        # 请求头按latin-1解码，客户端直接发送UTF-8时还原为原文（推荐使用\u转义的JSON）
+        data = json.loads(raw.encode('latin-1').decode('utf-8'))
+    except (UnicodeError, ValueError):
+        return None, f'{METADATA_HEADER}请求头不是有效的JSON'
+    if not isinstance(data, dict):
+        return None, f'{METADATA_HEADER}请求头必须是JSON对象'
+
+    return {key: value if isinstance(value, str) else str(value)
+            for key, value in data.items() if value is not None}, None
+
+
+class ImageUploadResource(Resource):
+    """
+    图片二进制上传接口 - 与base64 JSON接口并存
+
+    支持 application/octet-stream（元数据以JSON对象放在X-Image-Metadata请求头中）和
+    multipart/form-data（图片放在image字段，元数据放在表单字段中）。
+    元数据不放在查询参数中，避免api_key等写入访问日志；提示词较长时应使用multipart。
+    图片数据分块读取后直接流式上传，内存占用不随图片大小增长。
+    """
+
+    @jwt_required()
+    def post(self):
+        """以二进制方式上传AI生成的图片"""
+        user_id = get_jwt_identity()
+
+        if request.mimetype == 'multipart/form-data':
+            image_file = request.files.get('image')
+            if not image_file:
+                return APIResponse.error('缺少必需参数: image')
+            data = request.form
+            stream = image_file.stream
+            # multipart文件已由werkzeug缓存（大文件落盘），可直接得到大小
+            stream.seek(0, 2)
+            content_length = stream.tell()
+            stream.seek(0)
+        elif request.mimetype == 'application/octet-stream':
+            data, error_message = _read_header_metadata()
+            if error_message:
+                return APIResponse.error(error_message)
+            stream = request.stream
+            content_length = request.content_length
+            if not content_length:
+                return APIResponse.error('缺少Content-Length请求头')
+        else:
+            return APIResponse.error('仅支持application/octet-stream或multipart/form-data上传')
+
+        for field in ['prompt', 'model']:
+            if field not in data:
+                return APIResponse.error(f'缺少必需参数: {field}')
+
+        metadata, error_message = _parse_image_metadata(data)
+        if error_message:
+            return APIResponse.error(error_message)
+
+        # 检查用户存储空间
+        storage = UserStorage.query.filter_by(user_id=user_id).first()
+        if not storage:
+            return APIResponse.error('用户存储信息不存在')
+
+        if not storage.can_upload(content_length):
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+        ingest = StreamIngest(
+            stream,
+            content_length=content_length,
+            max_size=min(storage.max_file_size, storage.get_remaining_space())
+        )
+        validation_result = ingest.prime()
+        if not validation_result['valid']:
+            current_app.logger.error(f"图片数据验证失败: {validation_result['message']}")
+            return APIResponse.error(f"数据中未找到图片: {validation_result['message']}")
+
+        # 上传前按声明的大小预留配额，并发上传不会同时通过检查
+        reservation = reserve_storage(user_id, content_length, ttl_seconds=_reservation_ttl())
+        if not reservation:
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
 
-    def _is_valid_base64_image(self, data):
-        """验证是否为有效的base64图片数据"""
         try:
-            if data.startswith('data:image'):
-                if ',' in data:
-                    data = data.split(',')[1]
-                else:
-                    return False
+            current_app.logger.info(f"用户 {user_id} 开始流式上传图片，大小: {content_length} bytes")
 
-            decoded = base64.b64decode(data)
-            return len(decoded) > 100  # 至少100字节
+            # 流式上传不在内存中保留图片，按原格式存储（不转码）
+            extension, content_type = format_type(ingest.format)
+            upload_result = file_storage.upload_image_stream(
+                body=ingest.iter_chunks(),
+                user_id=user_id,
+                folder='ai-images',
+                content_length=content_length,
+                extension=extension,
+                content_type=content_type
+            )
 
-        except Exception:
-            return False
+            if not upload_result['success']:
+                current_app.logger.error(f"OSS上传失败: {upload_result['message']}")
+                return APIResponse.error(f"图片上传失败: {upload_result['message']}")
 
+            # 流式上传完成后才能得到内容哈希，重复时删除刚上传的文件并复用已有文件
+            duplicate = _find_duplicate(user_id, ingest.content_hash)
+            if duplicate:
+                file_storage.delete_file(upload_result['filename'])
+                return _save_duplicate(user_id, storage, metadata, duplicate, reservation)
 
-class ImageListResource(Resource):
-    """用户图片列表接口 - 最多返回20条"""
+            # 以实际读取的数据为准
+            upload_result['size'] = ingest.size
+            upload_result['width'] = ingest.image_info.get('width')
+            upload_result['height'] = ingest.image_info.get('height')
+            upload_result['content_hash'] = ingest.content_hash
+
+            image_record = _build_image_record(user_id, metadata, upload_result)
+
+            db.session.add(image_record)
+            db.session.flush()
+
+            if not commit_reservation(reservation, upload_result['size']):
+                db.session.rollback()
+                file_storage.delete_file(upload_result['filename'])
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+            db.session.commit()
+
+            # 图片数据未保留在内存中，派生图从OSS读取原图生成
+            _process_derivatives(image_record)
+
+            current_app.logger.info(f"图片保存成功: {image_record.image_id}")
+
+            return APIResponse.success(
+                data={
+                    'image': image_record.to_simple_dict(),
+                    'storage': storage.to_dict()
+                },
+                message='图片保存成功'
+            )
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"保存图片记录失败: {str(e)}")
+            return APIResponse.error('保存失败，请稍后重试', code=500)
+
+        finally:
+            # 保存成功时预留已转为使用量，这里不会重复归还
+            release_reservation(reservation)
+
+
+# 直传OSS允许的图片类型及对应扩展名
+PRESIGN_CONTENT_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/bmp': '.bmp'
+}
+
+
+class ImagePresignResource(Resource):
+    """直传OSS第一步 - 预留配额并返回预签名上传地址"""
 
     @jwt_required()
-    def get(self):
-        """获取用户的图片列表（最多20条）"""
+    def post(self):
+        """申请预签名PUT地址"""
         user_id = get_jwt_identity()
+        data = request.get_json() or {}
 
-        # 查询参数
-        simple = request.args.get('simple', 'false').lower() == 'true'
+        content_type = (data.get('content_type') or '').strip().lower()
+        if content_type not in PRESIGN_CONTENT_TYPES:
+            return APIResponse.error('不支持的图片类型')
 
         try:
-            # 查询最新的20条图片记录（排除软删除）
-            images = ImageRecord.query.filter_by(user_id=user_id).filter(
-                ImageRecord.deleted_at.is_(None)
-            ).order_by(ImageRecord.created_at.desc()).limit(20).all()
-
-            # 根据simple参数决定返回数据格式
-            if simple:
-                image_list = [image.to_simple_dict() for image in images]
-            else:
-                image_list = [image.to_dict() for image in images]
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            return APIResponse.error('缺少必需参数: size')
+        if size <= 0:
+            return APIResponse.error('图片大小无效')
+
+        storage = UserStorage.query.filter_by(user_id=user_id).first()
+        if not storage:
+            return APIResponse.error('用户存储信息不存在')
+        if size > storage.max_file_size:
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+        # 按声明的大小预留配额，有效期与上传地址一致，提交时转为实际使用量
+        expires_seconds = current_app.config.get('PRESIGN_EXPIRES', 900)
+        reservation = reserve_storage(user_id, size, ttl_seconds=expires_seconds)
+        if not reservation:
+            return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+        presign_result = file_storage.presign_upload(
+            user_id=user_id,
+            content_type=content_type,
+            folder='ai-images',
+            extension=PRESIGN_CONTENT_TYPES[content_type],
+            expires_seconds=expires_seconds
+        )
+        if not presign_result['success']:
+            release_reservation(reservation)
+            current_app.logger.error(f"生成预签名地址失败: {presign_result['message']}")
+            return APIResponse.error('生成上传地址失败，请稍后重试', code=500)
+
+        try:
+            upload_session = UploadSession(
+                user_id=user_id,
+                object_key=presign_result['filename'],
+                declared_size=size,
+                content_type=content_type,
+                reservation_id=reservation['id'],
+                expires_at=datetime.utcnow() + timedelta(seconds=expires_seconds)
+            )
+            db.session.add(upload_session)
+            db.session.commit()
+
+            headers = dict(presign_result['signed_headers'])
+            headers['Content-Type'] = content_type
 
             return APIResponse.success(
                 data={
-                    'images': image_list,
-                    'total': len(image_list)
-                }
+                    'upload_id': upload_session.upload_id,
+                    'upload_url': presign_result['url'],
+                    'method': presign_result['method'],
+                    'headers': headers,
+                    'expires_at': upload_session.expires_at.isoformat()
+                },
+                message='上传地址生成成功'
             )
 
+        except Exception as e:
+            db.session.rollback()
+            release_reservation(reservation)
+            current_app.logger.error(f"创建上传会话失败: {str(e)}")
+            return APIResponse.error('生成上传地址失败，请稍后重试', code=500)
+
+
+class ImageCommitResource(Resource):
+    """直传OSS第二步 - 校验已上传的文件并写入图片记录"""
+
+    @jwt_required()
+    def post(self):
+        """提交直传完成的图片"""
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+
+        for field in ['upload_id', 'prompt', 'model']:
+            if field not in data:
+                return APIResponse.error(f'缺少必需参数: {field}')
+
+        metadata, error_message = _parse_image_metadata(data)
+        if error_message:
+            return APIResponse.error(error_message)
+
+        upload_session = UploadSession.query.filter_by(
+            upload_id=data.get('upload_id'),
+            user_id=user_id
+        ).first()
+
+        if not upload_session:
+            return APIResponse.not_found('上传会话不存在')
+        if upload_session.status != 'pending':
+            return APIResponse.error('该上传已提交')
+        if upload_session.is_expired():
+            return APIResponse.error('上传会话已过期，请重新上传')
+
+        # 校验OSS中的文件大小和类型
+        head_result = file_storage.head_file(upload_session.object_key)
+        if not head_result['success']:
+            return APIResponse.error('未找到已上传的图片，请先完成上传')
+
+        object_size = head_result['size'] or 0
+        error_message = None
+        if object_size > upload_session.declared_size:
+            error_message = '上传的图片大小超过申请的大小'
+        elif not (head_result['content_type'] or '').startswith('image/'):
+            error_message = '上传的文件不是图片'
+        else:
+            head_bytes = file_storage.read_file_head(upload_session.object_key)
+            if not head_bytes or not check_image_format(head_bytes):
+                error_message = '数据不是有效的图片格式'
+
+        if error_message:
+            # 删除不合规的文件，会话保持待上传状态
+            file_storage.delete_file(upload_session.object_key)
+            return APIResponse.error(error_message)
+
+        image_info = get_image_info(head_bytes)
+
+        try:
+            upload_result = {
+                'url': head_result['url'],
+                'filename': upload_session.object_key,
+                'size': object_size,
+                'width': image_info.get('width'),
+                'height': image_info.get('height')
+            }
+            # 条件更新认领会话，并发的重复提交只有一个能成功
+            claimed = db.session.execute(
+                db.update(UploadSession).where(
+                    UploadSession.id == upload_session.id,
+                    UploadSession.status == 'pending'
+                ).values(status='committed').execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed != 1:
+                db.session.rollback()
+                return APIResponse.error('该上传已提交')
+
+            image_record = _build_image_record(user_id, metadata, upload_result)
+            db.session.add(image_record)
+            db.session.flush()
+
+            # 预留已过期释放（或会话创建于预留机制之前）时按普通保存占用配额
+            if not commit_reservation(upload_session.reservation(), object_size):
+                # 会话和预留保持不变，释放空间后可重新提交
+                db.session.rollback()
+                return APIResponse.error(QUOTA_EXCEEDED_MESSAGE)
+
+            db.session.commit()
+
+            _process_derivatives(image_record)
+
+            current_app.logger.info(f"直传图片提交成功: {image_record.image_id}")
+
+            storage = UserStorage.query.filter_by(user_id=user_id).first()
+            return APIResponse.success(
+                data={
+                    'image': image_record.to_simple_dict(),
+                    'storage': storage.to_dict() if storage else None
+                },
+                message='图片保存成功'
+            )
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"提交直传图片失败: {str(e)}")
+            return APIResponse.error('保存失败，请稍后重试', code=500)
+
+
+class ImageListResource(Resource):
+    """用户图片列表接口 - 按创建时间倒序，游标分页"""
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    @jwt_required()
+    def get(self):
+        """
+        获取用户的图片列表
+
+        查询参数：limit（默认20，最多100）、cursor（上一页返回的next_cursor）、simple、
+        fields（只返回指定字段，逗号分隔）
+        """
+        user_id = get_jwt_identity()
+
+        # 查询参数
+        simple = request.args.get('simple', 'false').lower() == 'true'
+        fieldset, error = _parse_fields(simple)
+        if error:
+            return APIResponse.error(error)
+        limit = request.args.get('limit', self.DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        position = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            position = _decode_cursor(cursor, datetime.fromisoformat, int)
+            if position is None:
+                return APIResponse.error('cursor参数无效')
+
+        def load():
+            # 只查询需要的列，多取一条判断是否还有下一页
+            images = query_image_list(user_id, limit + 1, position=position, fieldset=fieldset)
+
+            has_more = len(images) > limit
+            images = images[:limit]
+            image_list = [fieldset.serialize(image) for image in images]
+
+            return {
+                'images': image_list,
+                'total': len(image_list),
+                'has_more': has_more,
+                'next_cursor': _encode_cursor(images[-1].created_at.isoformat(), images[-1].id) if has_more else None
+            }
+
+        try:
+            params = (simple, ','.join(fieldset.fields), limit, cursor)
+            response, _ = _cached_response(user_id, 'list', params, load)
+            return response
+
         except Exception as e:
             current_app.logger.error(f"获取图片列表失败: {str(e)}")
             return APIResponse.error('获取失败，请稍后重试', code=500)
 
 
+class ImageSearchResource(Resource):
+    """图片搜索接口 - 全文检索提示词和模型回复，按相关度排序，游标分页"""
+
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+
+    @jwt_required()
+    def get(self):
+        """
+        搜索用户的图片
+
+        查询参数：q（检索词，多个词用空格分隔）、limit（默认20，最多100）、cursor、simple、fields
+        """
+        user_id = get_jwt_identity()
+
+        keyword = (request.args.get('q') or '').strip()
+        if not keyword:
+            return APIResponse.error('缺少必需参数: q')
+        if len(keyword) > 100:
+            return APIResponse.error('检索词长度不能超过100字符')
+
+        simple = request.args.get('simple', 'false').lower() == 'true'
+        fieldset, error = _parse_fields(simple)
+        if error:
+            return APIResponse.error(error)
+        limit = request.args.get('limit', self.DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        position = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            position = _decode_cursor(cursor, float, int)
+            if position is None:
+                return APIResponse.error('cursor参数无效')
+
+        def load():
+            # 多取一条判断是否还有下一页
+            matches = search_images(user_id, keyword, limit + 1, position=position)
+
+            has_more = len(matches) > limit
+            matches = matches[:limit]
+            images = query_images_by_ids([record_id for record_id, _ in matches], fieldset=fieldset)
+
+            return {
+                'images': [fieldset.serialize(image) for image in images],
+                'total': len(images),
+                'has_more': has_more,
+                'next_cursor': _encode_cursor(matches[-1][1], matches[-1][0]) if has_more else None
+            }
+
+        try:
+            params = (keyword, simple, ','.join(fieldset.fields), limit, cursor)
+            response, _ = _cached_response(user_id, 'search', params, load)
+            return response
+
+        except Exception as e:
+            current_app.logger.error(f"搜索图片失败: {str(e)}")
+            return APIResponse.error('搜索失败，请稍后重试', code=500)
+
+
 class ImageDetailResource(Resource):
     """图片详情接口"""
 
     @jwt_required()
     def get(self, image_id):
-        """根据业务ID获取图片详情"""
+        """根据业务ID获取图片详情，fields参数只返回指定字段（逗号分隔）"""
+        user_id = get_jwt_identity()
+
+        fieldset, error = _parse_fields()
+        if error:
+            return APIResponse.error(error)
+
+        def load():
+            image = query_image_detail(user_id, image_id, fieldset=fieldset)
+            return {'image': fieldset.serialize(image)} if image else None
+
+        try:
+            params = (image_id, ','.join(fieldset.fields))
+            response, found = _cached_response(user_id, 'detail', params, load)
+            if not found:
+                return APIResponse.not_found('图片不存在')
+            return response
+
+        except Exception as e:
+            current_app.logger.error(f"获取图片详情失败: {str(e)}")
+            return APIResponse.error('获取失败，请稍后重试', code=500)
+
+
+class ImageStatusResource(Resource):
+    """图片上传状态接口 - 用于异步保存后轮询"""
+
+    # 长轮询最长等待时间（秒）
+    MAX_WAIT_SECONDS = 30
+
+    @jwt_required()
+    def get(self, image_id):
+        """查询图片上传状态，wait参数大于0时在上传结束前最多等待wait秒"""
         user_id = get_jwt_identity()
 
+        try:
+            wait = min(float(request.args.get('wait', 0)), self.MAX_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+
         try:
             image_record = ImageRecord.query.filter_by(
                 image_id=image_id,
                 user_id=user_id
-            ).filter(ImageRecord.deleted_at.is_(None)).first()
+            ).first()
 
             if not image_record:
                 return APIResponse.not_found('图片不存在')
 
-            return APIResponse.success(data={'image': image_record.to_dict()})
+            if image_record.status == 'pending' and wait > 0:
+                # 本进程内的任务可直接等待完成通知
+                db.session.rollback()
+                upload_queue.wait(image_id, wait)
+                db.session.refresh(image_record)
+
+            return APIResponse.success(data={
+                'image_id': image_record.image_id,
+                'status': image_record.status,
+                'image_url': image_record.image_url
+            })
 
         except Exception as e:
-            current_app.logger.error(f"获取图片详情失败: {str(e)}")
+            current_app.logger.error(f"获取图片状态失败: {str(e)}")
             return APIResponse.error('获取失败，请稍后重试', code=500)
 
 
@@ -319,22 +1154,41 @@ class ImageDeleteResource(Resource):
             if not image_record:
                 return APIResponse.not_found('图片不存在')
 
+            # 锁住引用同一文件的全部记录（按ID顺序加锁，避免死锁）并重新读取，
+            # 并发删除共用文件的最后两条记录时不会都认为文件仍被另一条引用
+            if image_record.image_filename:
+                ImageRecord.query.filter_by(image_filename=image_record.image_filename).order_by(
+                    ImageRecord.id
+                ).with_for_update().populate_existing().all()
+            else:
+                db.session.refresh(image_record, with_for_update=True)
+            if image_record.deleted_at is not None:
+                db.session.rollback()
+                return APIResponse.not_found('图片不存在')
+
             # 软删除（标记删除时间）
             image_record.deleted_at = datetime.utcnow()
+            db.session.flush()
+
+            # 文件仍被其他记录引用（内容去重）时只归还图片数量，保留OSS文件
+            shared = count_image_references(image_record.image_filename) > 0
+
+            # 登记待删除的OSS文件，与软删除在同一事务中提交
+            queued = 0
+            if image_record.image_filename and not shared:
+                filenames = [image_record.image_filename]
+                if image_record.thumb_url or image_record.preview_url:
+                    filenames += derivative_keys(image_record.image_filename)
+                queued = enqueue_deletions(filenames)
 
             # 更新存储使用量
-            update_storage_on_image_delete(user_id, image_record.image_size or 0)
+            update_storage_on_image_delete(user_id, 0 if shared else (image_record.image_size or 0))
 
             db.session.commit()
 
-            # 异步删除OSS文件（可选，避免影响响应速度）
-            if image_record.image_filename:
-                try:
-                    delete_result = oss_service.delete_file(image_record.image_filename)
-                    if not delete_result['success']:
-                        current_app.logger.warning(f"OSS删除失败: {delete_result['message']}")
-                except Exception as oss_error:
-                    current_app.logger.warning(f"OSS删除异常: {str(oss_error)}")
+            # 异步删除OSS文件（由后台线程批量删除，不影响响应速度）
+            if queued:
+                deletion_queue.notify()
 
             current_app.logger.info(f"图片软删除成功: {image_id}")
 
@@ -349,6 +1203,9 @@ class ImageDeleteResource(Resource):
 class ImageUrlToBase64Resource(Resource):
     """图片URL转Base64接口 - 用于"修改此图"功能"""
 
+    # 下载图片的最大大小
+    MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
     @jwt_required()
     def post(self):
         """将图片URL转换为base64格式"""
@@ -370,66 +1227,23 @@ class ImageUrlToBase64Resource(Resource):
         try:
             current_app.logger.info(f"用户 {user_id} 开始转换图片URL: {image_url}")
 
-            # 设置请求头
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'image/*,*/*;q=0.8',
-                'Accept-Encoding': 'gzip, deflate',
-                'Connection': 'keep-alive',
-            }
-
-            # 下载图片
-            response = requests.get(image_url, headers=headers, timeout=30, stream=True)
-            response.raise_for_status()
+            # 本站存储的图片直接从存储（或本地缓存）读取，不再经公网/CDN重新下载
+            image = self._read_stored_image(user_id, image_url)
+            if image is None:
+                image, error_response = self._download_image(image_url)
+                if error_response:
+                    return error_response
 
-            # 检查Content-Type
-            content_type = response.headers.get('Content-Type', '')
-            if not content_type.startswith('image/'):
-                return APIResponse.error('URL指向的不是有效的图片文件')
+            image_data = image['data']
+            width, height = image['width'], image['height']
+            format_name = image['format']
+            mime_type = image['mime_type']
 
-            # 检查文件大小
-            content_length = response.headers.get('Content-Length')
-            if content_length:
-                file_size = int(content_length)
-                # 限制图片大小为10MB
-                if file_size > 10 * 1024 * 1024:
-                    return APIResponse.error('图片文件过大，最大支持10MB')
-
-            # 读取图片数据
-            image_data = response.content
-            
-            # 检查实际大小
-            if len(image_data) > 10 * 1024 * 1024:
-                return APIResponse.error('图片文件过大，最大支持10MB')
-
-            if len(image_data) < 100:
-                return APIResponse.error('图片数据过小，可能不是有效的图片文件')
-
-            # 使用PIL验证图片格式并获取信息
-            try:
-                image_io = BytesIO(image_data)
-                pil_image = Image.open(image_io)
-                pil_image.verify()  # 验证图片完整性
-                
-                # 重新打开获取信息（verify后需要重新打开）
-                image_io.seek(0)
-                pil_image = Image.open(image_io)
-                
-                width, height = pil_image.size
-                format_name = pil_image.format.lower() if pil_image.format else 'unknown'
-                
-                current_app.logger.info(f"图片信息: {width}x{height}, 格式: {format_name}, 大小: {len(image_data)} bytes")
-                
-            except Exception as img_error:
-                current_app.logger.error(f"图片验证失败: {str(img_error)}")
-                return APIResponse.error('图片文件格式无效或已损坏')
+            current_app.logger.info(f"图片信息: {width}x{height}, 格式: {format_name}, 大小: {len(image_data)} bytes")
 
             # 转换为base64
             base64_data = base64.b64encode(image_data).decode('utf-8')
-            
-            # 确定MIME类型
-            mime_type = content_type if content_type.startswith('image/') else 'image/png'
-            
+
             # 构建完整的data URL
             data_url = f"data:{mime_type};base64,{base64_data}"
 
@@ -462,3 +1276,86 @@ class ImageUrlToBase64Resource(Resource):
         except Exception as e:
             current_app.logger.error(f"图片转换失败: {str(e)}")
             return APIResponse.error('图片转换失败，请重试', code=500)
+
+    def _read_stored_image(self, user_id, image_url):
+        """
+        读取当前用户保存在本站存储中的图片（尺寸使用保存时记录的值）
+
+        Returns:
+            dict: data、width、height、format、mime_type，不是当前用户的图片或读取失败时返回None
+        """
+        key = file_storage.key_for_url(image_url)
+        if not key:
+            return None
+
+        image_record = db.session.query(ImageRecord.image_width, ImageRecord.image_height).filter(
+            ImageRecord.user_id == user_id,
+            ImageRecord.image_filename == key,
+            ImageRecord.deleted_at.is_(None)
+        ).first()
+        if not image_record:
+            return None
+
+        image_data = file_storage.read_file(key)
+        if not image_data or len(image_data) > self.MAX_IMAGE_SIZE:
+            return None
+
+        # 只解析文件头确定格式，保存时已校验过图片
+        probe = probe_image(image_data)
+        if not probe:
+            return None
+
+        return {
+            'data': image_data,
+            'width': image_record.image_width or probe['width'],
+            'height': image_record.image_height or probe['height'],
+            'format': probe['format'].lower(),
+            'mime_type': MIME_TYPES.get(probe['format'], 'image/png')
+        }
+
+    def _download_image(self, image_url):
+        """
+        流式下载外部图片：先解析文件头，再按块读取，超过大小限制时立即中断
+
+        Returns:
+            tuple: (图片信息, 错误响应)
+        """
+        with http_client.stream(image_url) as response:
+            response.raise_for_status()
+
+            # 检查Content-Type
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith('image/'):
+                return None, APIResponse.error('URL指向的不是有效的图片文件')
+
+            # 声明的大小已超过限制时不再下载
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > self.MAX_IMAGE_SIZE:
+                return None, APIResponse.error('图片文件过大，最大支持10MB')
+
+            # Content-Length可能缺失或不准确（以及gzip压缩），以实际读取的大小为准
+            ingest = StreamIngest(response.raw, max_size=self.MAX_IMAGE_SIZE)
+            validation_result = ingest.prime()
+            if not validation_result['valid']:
+                current_app.logger.error(f"图片验证失败: {validation_result['message']}")
+                return None, APIResponse.error('图片文件格式无效或已损坏')
+
+            try:
+                image_data = b''.join(ingest.iter_chunks())
+            except ValueError:
+                return None, APIResponse.error('图片文件过大，最大支持10MB')
+
+        # 文件头已在读取第一块时解析，严格模式下再用Pillow完整校验
+        if current_app.config.get('IMAGE_STRICT_VERIFY') and not verify_image(image_data):
+            current_app.logger.error("图片验证失败: 图片已损坏")
+            return None, APIResponse.error('图片文件格式无效或已损坏')
+
+        probe = ingest.image_info
+        return {
+            'data': image_data,
+            'width': probe['width'],
+            'height': probe['height'],
+            'format': probe['format'].lower(),
+            # 以解析出的实际格式为准，远端的Content-Type可能与内容不符
+            'mime_type': probe['mime_type']
+        }, None
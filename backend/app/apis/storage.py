@@ -0,0 +1,40 @@
+from flask import request
+from flask_restful import Resource
+
+from app import APIResponse
+from app.utils.storage import file_storage
+
+
+class StorageFileResource(Resource):
+    """本地存储文件接口 - 仅在 STORAGE_BACKEND=local 时可用"""
+
+    def get(self, key):
+        """下载文件（send_file或X-Accel-Redirect）"""
+        if file_storage.name != 'local':
+            return APIResponse.not_found()
+
+        response = file_storage.send(key)
+        if response is None:
+            return APIResponse.not_found('文件不存在')
+        return response
+
+    def put(self, key):
+        """通过预签名地址直传文件"""
+        if file_storage.name != 'local':
+            return APIResponse.not_found()
+
+        content_type = request.headers.get('Content-Type', '')
+        if not file_storage.verify_signature(key, content_type, request.args.get('expires'),
+                                        request.args.get('signature')):
+            return APIResponse.error('签名无效或已过期', code=403)
+
+        result = file_storage.put_stream(
+            key,
+            request.stream,
+            content_length=request.content_length,
+            content_type=content_type
+        )
+        if not result['success']:
+            return APIResponse.error(result['message'], code=500)
+
+        return APIResponse.success(data={'etag': result['etag']}, message='上传成功')
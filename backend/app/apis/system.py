@@ -0,0 +1,33 @@
+import hmac
+
+from flask import current_app, request
+from flask_restful import Resource
+
+from app import APIResponse
+from app.utils.deletion_queue import deletion_queue
+from app.utils.file_cache import image_file_cache
+from app.utils.response_cache import response_cache
+from app.utils.storage import file_storage
+from app.utils.upload_queue import upload_queue
+
+
+class SystemMetricsResource(Resource):
+    """运行指标接口 - 上传队列、存储传输等统计信息（仅统计当前进程，仅供内部监控使用）"""
+
+    def get(self):
+        """获取运行指标，需在请求头 X-Metrics-Token 中携带配置的METRICS_TOKEN"""
+        expected = current_app.config.get('METRICS_TOKEN')
+        if not expected:
+            return APIResponse.error('运行指标接口未启用', code=403)
+
+        token = request.headers.get('X-Metrics-Token', '')
+        if not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return APIResponse.unauthorized('访问令牌无效')
+
+        return APIResponse.success(data={
+            'upload_queue': upload_queue.get_metrics(),
+            'storage_transfer': file_storage.get_metrics(),
+            'deletion_queue': deletion_queue.get_metrics(),
+            'response_cache': response_cache.get_metrics(),
+            'image_cache': image_file_cache.get_metrics()
+        })
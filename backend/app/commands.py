@@ -0,0 +1,297 @@
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+import click
+
+from app import db
+
+
+def register_commands(app):
+    """注册命令行命令（flask <command>）"""
+
+    @app.cli.command('backfill-derivatives')
+    @click.option('--batch-size', default=100, show_default=True, help='每批处理的记录数')
+    @click.option('--limit', default=0, help='最多处理的记录数，0表示不限制')
+    def backfill_derivatives(batch_size, limit):
+        """为已有图片补生成缩略图和预览图"""
+        from app.models.image_records import ImageRecord
+        from app.utils.image_derivatives import attach_derivatives
+
+        started = time.monotonic()
+        last_id = 0
+        processed = succeeded = 0
+        # 内容去重后多条记录共用同一文件，同一文件只生成一次
+        done = {}
+
+        while not limit or processed < limit:
+            records = ImageRecord.query.filter(
+                ImageRecord.id > last_id,
+                ImageRecord.thumb_url.is_(None),
+                ImageRecord.deleted_at.is_(None),
+                ImageRecord.image_filename.isnot(None),
+                ImageRecord.status == 'ready'
+            ).order_by(ImageRecord.id).limit(batch_size).all()
+
+            if not records:
+                break
+
+            for image_record in records:
+                last_id = image_record.id
+                processed += 1
+
+                if image_record.image_filename in done:
+                    image_record.thumb_url, image_record.preview_url = done[image_record.image_filename]
+                    succeeded += 1
+                elif attach_derivatives(image_record):
+                    done[image_record.image_filename] = (image_record.thumb_url, image_record.preview_url)
+                    succeeded += 1
+                else:
+                    click.echo(f"生成失败: {image_record.image_id}")
+
+                if limit and processed >= limit:
+                    break
+
+            db.session.commit()
+            click.echo(f"已处理 {processed} 条，成功 {succeeded} 条")
+
+        click.echo(f"完成：共处理 {processed} 条，成功 {succeeded} 条，耗时 {time.monotonic() - started:.1f}s")
+
+    @app.cli.command('gc-images')
+    @click.option('--retention-days', default=30, show_default=True, help='软删除记录的保留天数')
+    @click.option('--batch-size', default=500, show_default=True, help='每批删除的记录数')
+    @click.option('--dry-run', is_flag=True, help='只统计，不删除')
+    def gc_images(retention_days, batch_size, dry_run):
+        """硬删除超过保留期的软删除图片记录和过期的上传会话"""
+        from app.models.image_records import ImageRecord
+        from app.models.upload_session import UploadSession
+
+        started = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+
+        def purge(model, *criteria):
+            last_id = 0
+            total = 0
+            while True:
+                ids = [row.id for row in db.session.query(model.id).filter(
+                    model.id > last_id,
+                    *criteria
+                ).order_by(model.id).limit(batch_size)]
+                if not ids:
+                    break
+
+                last_id = ids[-1]
+                total += len(ids)
+                if not dry_run:
+                    model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+                    db.session.commit()
+                click.echo(f"{model.__tablename__}: 已处理 {total} 条")
+            return total
+
+        records = purge(ImageRecord, ImageRecord.deleted_at.isnot(None), ImageRecord.deleted_at < cutoff)
+        sessions = purge(UploadSession, UploadSession.expires_at < cutoff)
+        db.session.rollback()
+
+        elapsed = time.monotonic() - started
+        action = '可删除' if dry_run else '已删除'
+        click.echo(f"完成：{action}图片记录 {records} 条、上传会话 {sessions} 条，"
+                   f"耗时 {elapsed:.1f}s（{(records + sessions) / max(elapsed, 0.001):.0f} 条/秒）")
+
+    @app.cli.command('release-reservations')
+    def release_reservations():
+        """释放所有用户已过期的配额预留（后台删除线程也会定期执行）"""
+        from app.models.storage_reservation import release_expired_reservations
+
+        started = time.monotonic()
+        released = release_expired_reservations()
+        click.echo(f"完成：释放过期预留 {released} 条，耗时 {time.monotonic() - started:.1f}s")
+
+    @app.cli.command('reconcile-orphans')
+    @click.option('--prefix', default='ai-images/', show_default=True, help='扫描的文件前缀，如 ai-images/user_1/2024/05')
+    @click.option('--min-age-hours', default=24, show_default=True, help='只处理早于该时间的文件（避开上传中的文件）')
+    @click.option('--page-size', default=1000, show_default=True, help='每页列出的文件数')
+    @click.option('--dry-run', is_flag=True, help='只统计，不删除')
+    def reconcile_orphans(prefix, min_age_hours, page_size, dry_run):
+        """删除存储中没有任何图片记录引用的文件（含派生图）"""
+        from app.models.image_records import ImageRecord
+        from app.models.upload_session import UploadSession
+        from app.utils.storage import file_storage
+
+        derivative_pattern = re.compile(r'^(.*)_(?:thumb|preview)\.webp$')
+        started = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+        scanned = orphans = orphan_bytes = deleted = failed = 0
+
+        for page in file_storage.iter_objects(prefix, page_size=page_size):
+            scanned += len(page)
+            candidates = []
+            for item in page:
+                last_modified = item['last_modified']
+                if last_modified and last_modified.tzinfo is None:
+                    last_modified = last_modified.replace(tzinfo=timezone.utc)
+                if last_modified and last_modified > cutoff:
+                    continue
+                match = derivative_pattern.match(item['key'])
+                candidates.append((item, match.group(1) if match else None))
+
+            if not candidates:
+                continue
+
+            # 列表按key排序，原图（xxx.png）排在其派生图（xxx_thumb.webp）之前，
+            # 用一次范围查询取出本页涉及的全部引用
+            low = min(root or item['key'] for item, root in candidates)
+            high = max(item['key'] for item, _ in candidates)
+            referenced = {row[0] for row in db.session.query(ImageRecord.image_filename).filter(
+                ImageRecord.image_filename >= low,
+                ImageRecord.image_filename <= high
+            )}
+            referenced.update(row[0] for row in db.session.query(UploadSession.object_key).filter(
+                UploadSession.object_key >= low,
+                UploadSession.object_key <= high,
+                UploadSession.status == 'pending',
+                UploadSession.expires_at > datetime.utcnow()
+            ))
+            referenced_roots = {os.path.splitext(filename)[0] for filename in referenced}
+
+            page_orphans = [
+                item for item, root in candidates
+                if (root not in referenced_roots if root else item['key'] not in referenced)
+            ]
+            orphans += len(page_orphans)
+            orphan_bytes += sum(item['size'] or 0 for item in page_orphans)
+
+            if page_orphans and not dry_run:
+                result = file_storage.delete_files([item['key'] for item in page_orphans])
+                deleted += len(result.get('deleted', []))
+                failed += len(result.get('failed', []))
+
+            click.echo(f"已扫描 {scanned} 个文件，孤立文件 {orphans} 个")
+
+        db.session.rollback()
+        elapsed = time.monotonic() - started
+        summary = f"完成：扫描 {scanned} 个文件，孤立文件 {orphans} 个（{orphan_bytes} bytes）"
+        if not dry_run:
+            summary += f"，已删除 {deleted} 个，失败 {failed} 个"
+        click.echo(f"{summary}，耗时 {elapsed:.1f}s（{scanned / max(elapsed, 0.001):.0f} 个/秒）")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """创建（不存在时）并重建提示词全文索引（SQLite FTS5；MySQL FULLTEXT只在缺失时创建）"""
+        from app.utils.image_search import rebuild_search_index
+
+        started = time.monotonic()
+        if rebuild_search_index():
+            click.echo(f"完成：全文索引已就绪，耗时 {time.monotonic() - started:.1f}s")
+        else:
+            click.echo("当前数据库不支持全文索引，搜索使用LIKE匹配")
+
+    @app.cli.command('reconcile-storage')
+    @click.option('--chunk-size', default=500, show_default=True, help='每批核对的用户数')
+    @click.option('--dry-run', is_flag=True, help='只输出偏差报告，不修正')
+    def reconcile_storage(chunk_size, dry_run):
+        """根据图片记录重新计算用户的存储使用量和图片数量，修正累计计数的偏差"""
+        from app.models.image_records import ImageRecord
+        from app.models.storage_reservation import StorageReservation
+        from app.models.user_storage import UserStorage
+
+        started = time.monotonic()
+        last_user_id = 0
+        checked = drifted = fixed = skipped = 0
+
+        while True:
+            storages = db.session.query(
+                UserStorage.user_id, UserStorage.used_storage, UserStorage.current_images,
+                UserStorage.reserved_storage, UserStorage.reserved_images
+            ).filter(
+                UserStorage.user_id > last_user_id
+            ).order_by(UserStorage.user_id).limit(chunk_size).all()
+            if not storages:
+                break
+
+            last_user_id = storages[-1].user_id
+            user_ids = [row.user_id for row in storages]
+
+            # 内容去重后多条记录共用同一文件，只计一次空间；后台上传中的记录（无文件名）逐条计入
+            files = db.session.query(
+                ImageRecord.user_id.label('user_id'),
+                db.case(
+                    (ImageRecord.image_filename.is_(None), db.func.sum(ImageRecord.image_size)),
+                    else_=db.func.max(ImageRecord.image_size)
+                ).label('size'),
+                db.func.count(ImageRecord.id).label('images')
+            ).filter(
+                ImageRecord.user_id.in_(user_ids),
+                ImageRecord.deleted_at.is_(None)
+            ).group_by(ImageRecord.user_id, ImageRecord.image_filename).subquery()
+            actual = {row[0]: (int(row[1] or 0), int(row[2])) for row in db.session.query(
+                files.c.user_id, db.func.sum(files.c.size), db.func.sum(files.c.images)
+            ).group_by(files.c.user_id)}
+            reserved = {row[0]: (int(row[1] or 0), int(row[2])) for row in db.session.query(
+                StorageReservation.user_id,
+                db.func.sum(StorageReservation.size),
+                db.func.sum(StorageReservation.image_count)
+            ).filter(StorageReservation.user_id.in_(user_ids)).group_by(StorageReservation.user_id)}
+
+            for row in storages:
+                checked += 1
+                used, images = actual.get(row.user_id, (0, 0))
+                reserved_size, reserved_count = reserved.get(row.user_id, (0, 0))
+                current = (row.used_storage or 0, row.current_images or 0,
+                           row.reserved_storage or 0, row.reserved_images or 0)
+                if current == (used, images, reserved_size, reserved_count):
+                    continue
+
+                drifted += 1
+                click.echo(f"用户 {row.user_id}: 空间 {current[0]} -> {used}，图片 {current[1]} -> {images}，"
+                           f"预留 {current[2]}/{current[3]} -> {reserved_size}/{reserved_count}")
+                if dry_run:
+                    continue
+
+                # 计数在核对期间被其他请求修改时跳过，避免覆盖新的变更
+                result = db.session.execute(
+                    db.update(UserStorage).where(
+                        UserStorage.user_id == row.user_id,
+                        UserStorage.used_storage == row.used_storage,
+                        UserStorage.current_images == row.current_images,
+                        UserStorage.reserved_storage == row.reserved_storage,
+                        UserStorage.reserved_images == row.reserved_images
+                    ).values(
+                        used_storage=used,
+                        current_images=images,
+                        reserved_storage=reserved_size,
+                        reserved_images=reserved_count
+                    ).execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    fixed += 1
+                else:
+                    skipped += 1
+
+            # 每批单独提交，不长时间持有锁
+            db.session.commit()
+            click.echo(f"已核对 {checked} 个用户，偏差 {drifted} 个")
+
+        elapsed = time.monotonic() - started
+        summary = f"完成：核对 {checked} 个用户，偏差 {drifted} 个"
+        if not dry_run:
+            summary += f"，已修正 {fixed} 个，计数已变化跳过 {skipped} 个"
+        click.echo(f"{summary}，耗时 {elapsed:.1f}s（{checked / max(elapsed, 0.001):.0f} 个/秒）")
+
+    @app.cli.command('drain-deletions')
+    @click.option('--retry-failed', is_flag=True, help='先把全部failed记录重新放回队列')
+    def drain_deletions(retry_failed):
+        """处理待删除文件队列中全部到期的记录（如后台线程未运行时）"""
+        from app.models.storage_deletion import StorageDeletion
+        from app.utils.deletion_queue import deletion_queue
+
+        started = time.monotonic()
+        if retry_failed:
+            click.echo(f"重新排队 {deletion_queue.requeue_failed(force=True)} 条failed记录")
+
+        processed = deletion_queue.drain()
+        remaining = dict(db.session.query(
+            StorageDeletion.status, db.func.count(StorageDeletion.id)
+        ).group_by(StorageDeletion.status).all())
+        click.echo(f"完成：处理 {processed} 条，剩余待重试 {remaining.get('pending', 0)} 条，"
+                   f"failed {remaining.get('failed', 0)} 条，耗时 {time.monotonic() - started:.1f}s")
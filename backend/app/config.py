@@ -42,6 +42,47 @@ class Config:
     DATE_FORMAT = "%Y-%m-%d"  # 日期格式
     # UPLOAD_FOLDER = '/uploads'  # 建议使用绝对路径
     MAX_USER_STORAGE = int(os.getenv('MAX_USER_STORAGE', 100 ))* 1024 * 1024  # 默认100MB
+    # 直传OSS预签名地址有效期（秒）
+    PRESIGN_EXPIRES = int(os.getenv('PRESIGN_EXPIRES', 900))
+    # 保存图片时预留存储配额的有效期（秒），超时未提交的预留自动释放
+    STORAGE_RESERVATION_TTL = int(os.getenv('STORAGE_RESERVATION_TTL', 300))
+    # 相同内容的图片复用已上传的OSS文件
+    IMAGE_DEDUP_ENABLED = os.getenv('IMAGE_DEDUP_ENABLED', 'true').lower() == 'true'
+    # 严格模式：除解析文件头外，再用Pillow完整校验图片
+    IMAGE_STRICT_VERIFY = os.getenv('IMAGE_STRICT_VERIFY', 'false').lower() == 'true'
+    # 存储转码策略：original（保留原图）/webp_lossless/webp（有损，按质量参数）/avif（不可用时退回webp）
+    IMAGE_TRANSCODE_POLICY = os.getenv('IMAGE_TRANSCODE_POLICY', 'original')
+    IMAGE_TRANSCODE_QUALITY = int(os.getenv('IMAGE_TRANSCODE_QUALITY', 85))
+    # 缩略图/预览图生成方式：sync（保存时同步生成）/async（后台生成）/off（不生成）
+    IMAGE_DERIVATIVES_MODE = os.getenv('IMAGE_DERIVATIVES_MODE', 'async')
+    # 批量保存接口单次最多图片数
+    IMAGE_BATCH_MAX = int(os.getenv('IMAGE_BATCH_MAX', 10))
+    # 异步上传队列配置（前端传 async=true 时启用）
+    ASYNC_UPLOAD_ENABLED = os.getenv('ASYNC_UPLOAD_ENABLED', 'true').lower() == 'true'
+    ASYNC_UPLOAD_WORKERS = int(os.getenv('ASYNC_UPLOAD_WORKERS', 4))
+    ASYNC_UPLOAD_QUEUE_SIZE = int(os.getenv('ASYNC_UPLOAD_QUEUE_SIZE', 100))
+    ASYNC_UPLOAD_MAX_RETRIES = int(os.getenv('ASYNC_UPLOAD_MAX_RETRIES', 3))
+    # 文件删除队列配置（批量删除最多1000个，失败按指数退避重试）
+    STORAGE_DELETE_BATCH_SIZE = int(os.getenv('STORAGE_DELETE_BATCH_SIZE', 1000))
+    STORAGE_DELETE_MAX_ATTEMPTS = int(os.getenv('STORAGE_DELETE_MAX_ATTEMPTS', 5))
+    STORAGE_DELETE_POLL_INTERVAL = int(os.getenv('STORAGE_DELETE_POLL_INTERVAL', 30))
+    # 多次删除失败（failed）的记录重新排队的初始间隔（秒），之后逐次加倍，最长1天
+    STORAGE_DELETE_FAILED_RETRY_DELAY = int(os.getenv('STORAGE_DELETE_FAILED_RETRY_DELAY', 3600))
+
+    # 列表/详情接口响应缓存（按用户缓存，图片变更后失效）；配置Redis地址后多进程共享
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+    RESPONSE_CACHE_REDIS_URL = os.getenv('RESPONSE_CACHE_REDIS_URL', '')
+
+    # 下载外部图片的HTTP连接池：缓存连接池的主机数、每个主机的最大连接数、连接/读取超时（秒）
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+
+    # 运行指标接口的访问令牌（请求头 X-Metrics-Token），未配置时接口不可用
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 
     # 系统版本配置
     SYSTEM_VERSION = 'business'  # business/community
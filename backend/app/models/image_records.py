@@ -1,4 +1,8 @@
 from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+
+from sqlalchemy.dialects import mysql
 from app import db
 from app.utils.id_generator import generate_image_id
 
@@ -6,6 +10,15 @@ from app.utils.id_generator import generate_image_id
 class ImageRecord(db.Model):
     """图片记录表"""
     __tablename__ = 'image_records'
+    __table_args__ = (
+        db.Index('ix_image_records_user_hash', 'user_id', 'content_hash'),
+        db.Index('ix_image_records_filename', 'image_filename'),
+        db.Index('ix_image_records_deleted_at', 'deleted_at'),
+        # 列表游标分页：user_id + deleted_at IS NULL 过滤后按 (created_at, id) 倒序扫描
+        db.Index('ix_image_records_user_list', 'user_id', 'deleted_at', 'created_at', 'id'),
+        # ETag：按用户统计最新更新时间和记录数（覆盖索引）
+        db.Index('ix_image_records_user_updated', 'user_id', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -18,6 +31,9 @@ class ImageRecord(db.Model):
     # 图片信息
     image_url = db.Column(db.String(500), nullable=False)
     image_filename = db.Column(db.String(255))
+    # 派生图（WebP缩略图/预览图），与原图存放在同一目录
+    thumb_url = db.Column(db.String(500))
+    preview_url = db.Column(db.String(500))
 
     # 其他信息
     elapsed_time = db.Column(db.String(10))  # 如 "2.5s"
@@ -25,39 +41,303 @@ class ImageRecord(db.Model):
     # 图片元数据
     image_width = db.Column(db.Integer)
     image_height = db.Column(db.Integer)
-    image_size = db.Column(db.Integer)  # 文件大小（字节）
+    image_size = db.Column(db.Integer)  # 实际存储的文件大小（字节），用于配额计算
+    original_size = db.Column(db.Integer)  # 上传的原始文件大小（字节），转码前
+    content_hash = db.Column(db.String(64))  # 图片内容sha256，用于去重（同一用户相同内容共用OSS文件）
+    # 上传状态：pending（后台上传中）/ready（可用）/failed（上传失败）
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
 
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # MySQL使用微秒精度，同一秒内的多次更新也能区分（用于ETag）
+    updated_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
     deleted_at = db.Column(db.DateTime)
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'prompt': self.prompt,
-            'model': self.model,
-            'image_url': self.image_url,
-            'image_filename': self.image_filename,
-            'elapsed_time': self.elapsed_time,
-            'image_width': self.image_width,
-            'image_height': self.image_height,
-            'model_response': self.model_response,
-            'image_size': self.image_size,
-            'created_at': self.created_at.isoformat(),
-            'timestamp': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'sortTimestamp': int(self.created_at.timestamp() * 1000)
-        }
+        return _serialize_full_object(self)
 
     def to_simple_dict(self):
         """简化版本，用于列表展示"""
-        return {
-            'image_id': self.image_id,
-            'model': self.model,
-            'prompt': self.prompt[:50] + '...' if len(self.prompt) > 50 else self.prompt,
-            'image_url': self.image_url,
-            'model_response': self.model_response,
-            'elapsed_time': self.elapsed_time,
-            'created_at': self.created_at.isoformat(),
-            'sortTimestamp': int(self.created_at.timestamp() * 1000)
-        }
+        return _serialize_simple_object(self)
+
+
+# 简化版本中提示词的预览长度
+PROMPT_PREVIEW_LENGTH = 50
+
+
+def _prompt_preview(prompt):
+    return prompt[:PROMPT_PREVIEW_LENGTH] + '...' if len(prompt) > PROMPT_PREVIEW_LENGTH else prompt
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _timestamp_text(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _sort_timestamp(value):
+    return int(value.timestamp() * 1000)
+
+
+def _or_image_url(url, image_url):
+    """派生图不存在时使用原图地址"""
+    return url or image_url
+
+
+# 可输出的字段 -> (引用的列, 取值函数)；取值函数为None时直接输出列值
+_FIELD_SOURCES = {
+    'id': (('id',), None),
+    'image_id': (('image_id',), None),
+    'prompt': (('prompt',), None),
+    'model': (('model',), None),
+    'image_url': (('image_url',), None),
+    'thumb_url': (('thumb_url', 'image_url'), _or_image_url),
+    'preview_url': (('preview_url', 'image_url'), _or_image_url),
+    'image_filename': (('image_filename',), None),
+    'elapsed_time': (('elapsed_time',), None),
+    'image_width': (('image_width',), None),
+    'image_height': (('image_height',), None),
+    'model_response': (('model_response',), None),
+    'image_size': (('image_size',), None),
+    'original_size': (('original_size',), None),
+    'status': (('status',), None),
+    'created_at': (('created_at',), _isoformat),
+    'timestamp': (('created_at',), _timestamp_text),
+    'sortTimestamp': (('created_at',), _sort_timestamp)
+}
+IMAGE_FIELDS = frozenset(_FIELD_SOURCES)
+# 完整版本和简化版本的字段（简化版本的提示词为截断后的预览）
+FULL_FIELDS = ('id', 'prompt', 'model', 'image_url', 'thumb_url', 'preview_url', 'image_filename',
+               'elapsed_time', 'image_width', 'image_height', 'model_response', 'image_size',
+               'original_size', 'status', 'created_at', 'timestamp', 'sortTimestamp')
+SIMPLE_FIELDS = ('image_id', 'model', 'prompt', 'image_url', 'thumb_url', 'preview_url', 'model_response',
+                 'elapsed_time', 'status', 'created_at', 'sortTimestamp')
+# 分页和排序总是需要的列
+_KEY_COLUMNS = ('id', 'created_at')
+
+
+def _field_getter(columns, convert, positions):
+    """生成单个字段的取值函数：Row按位置取值（itemgetter），ORM对象按属性取值（attrgetter）"""
+    get = itemgetter(*(positions[column] for column in columns)) if positions else attrgetter(*columns)
+    if convert is None:
+        return get
+    if len(columns) == 1:
+        return lambda r: convert(get(r))
+    return lambda r: convert(*get(r))
+
+
+def _build_serializer(fields, simple=False, positions=None):
+    """
+    生成序列化函数：每个字段的取值函数在字段集确定时选好，序列化时不再逐字段查表
+
+    Args:
+        fields: 输出字段（必须是IMAGE_FIELDS中的字段）
+        simple: 提示词是否输出为预览
+        positions: 列名 -> Row中的位置；为空时按属性访问（用于ORM对象）
+    """
+    getters = []
+    for name in fields:
+        columns, convert = _FIELD_SOURCES[name]
+        if simple and name == 'prompt':
+            convert = _prompt_preview
+        getters.append((name, _field_getter(columns, convert, positions)))
+    getters = tuple(getters)
+
+    def serialize(r):
+        return {name: get(r) for name, get in getters}
+
+    return serialize
+
+
+class ImageFieldSet:
+    """预编译的字段集：查询的投影列 + 对应的序列化函数"""
+
+    __slots__ = ('fields', 'simple', 'columns', 'serialize')
+
+    def __init__(self, fields, simple=False):
+        self.fields = fields
+        self.simple = simple
+
+        # 按字段收集需要查询的列（去重），分页用的id和created_at总是查询
+        names = list(_KEY_COLUMNS)
+        for name in fields:
+            for column in _FIELD_SOURCES[name][0]:
+                if column not in names:
+                    names.append(column)
+
+        self.columns = tuple(self._column(name) for name in names)
+        self.serialize = _build_serializer(fields, simple, {name: index for index, name in enumerate(names)})
+
+    def _column(self, name):
+        if self.simple and name == 'prompt':
+            # 简化版本在SQL中截断提示词
+            return db.func.substr(ImageRecord.prompt, 1, PROMPT_PREVIEW_LENGTH + 1).label('prompt')
+        return getattr(ImageRecord, name)
+
+
+@lru_cache(maxsize=256)
+def compile_fields(fields=None, simple=False):
+    """
+    获取字段集（按字段组合缓存）
+
+    Args:
+        fields: 字段元组，为空时使用完整版本或简化版本的字段
+        simple: 是否为简化版本（提示词输出为预览）
+
+    Returns:
+        ImageFieldSet: 字段集
+    """
+    if not fields:
+        fields = SIMPLE_FIELDS if simple else FULL_FIELDS
+    return ImageFieldSet(tuple(fields), simple)
+
+
+def parse_fields(value):
+    """
+    解析 fields=a,b,c 参数
+
+    Returns:
+        tuple: (字段元组或None, 不支持的字段列表)
+    """
+    if not value:
+        return None, []
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    return fields or None, [name for name in fields if name not in IMAGE_FIELDS]
+
+
+_serialize_full_object = _build_serializer(FULL_FIELDS)
+_serialize_simple_object = _build_serializer(SIMPLE_FIELDS, simple=True)
+
+
+def query_image_list(user_id, limit, position=None, fieldset=None):
+    """
+    查询用户图片列表（投影查询，返回Row而非ORM对象）
+
+    Args:
+        user_id: 用户ID
+        limit: 返回条数
+        position: 游标位置 (created_at, id)，从该位置之后继续查询
+        fieldset: 字段集，只查询其需要的列，为空时使用完整版本
+
+    Returns:
+        list: Row列表，按 (created_at, id) 倒序
+    """
+    fieldset = fieldset or compile_fields()
+    query = db.session.query(*fieldset.columns).filter(
+        ImageRecord.user_id == user_id,
+        ImageRecord.deleted_at.is_(None)
+    )
+    if position:
+        created_at, record_id = position
+        # 先用 created_at <= 游标时间 限定索引范围，再排除同一时间中已返回的记录
+        query = query.filter(
+            ImageRecord.created_at <= created_at,
+            db.or_(ImageRecord.created_at < created_at, ImageRecord.id < record_id)
+        )
+    return query.order_by(
+        ImageRecord.created_at.desc(),
+        ImageRecord.id.desc()
+    ).limit(limit).all()
+
+
+def query_images_by_ids(ids, fieldset=None):
+    """按给定id顺序查询图片（投影查询，返回Row列表，已删除的记录不返回）"""
+    if not ids:
+        return []
+    fieldset = fieldset or compile_fields()
+    rows = db.session.query(*fieldset.columns).filter(
+        ImageRecord.id.in_(ids),
+        ImageRecord.deleted_at.is_(None)
+    ).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[record_id] for record_id in ids if record_id in by_id]
+
+
+def query_image_detail(user_id, image_id, fieldset=None):
+    """按业务ID查询用户的图片（投影查询），不存在时返回None"""
+    fieldset = fieldset or compile_fields()
+    return db.session.query(*fieldset.columns).filter(
+        ImageRecord.image_id == image_id,
+        ImageRecord.user_id == user_id,
+        ImageRecord.deleted_at.is_(None)
+    ).first()
+
+
+def get_user_image_version(user_id):
+    """
+    用户图片数据的版本：全部记录（含软删除）的最新更新时间和记录数
+
+    新增、修改、软删除都会更新updated_at，硬删除会改变记录数。
+
+    Returns:
+        tuple: (最新更新时间, 记录数)
+    """
+    return db.session.query(
+        db.func.max(ImageRecord.updated_at),
+        db.func.count(ImageRecord.id)
+    ).filter(ImageRecord.user_id == user_id).one()
+
+
+def find_duplicate_image(user_id, content_hash):
+    """查找用户已保存的相同内容图片，用于复用其OSS文件"""
+    if not content_hash:
+        return None
+    return ImageRecord.query.filter_by(
+        user_id=user_id,
+        content_hash=content_hash,
+        status='ready'
+    ).filter(
+        ImageRecord.deleted_at.is_(None),
+        ImageRecord.image_filename.isnot(None)
+    ).order_by(ImageRecord.id).first()
+
+
+def find_referenced_keys(object_keys):
+    """
+    找出仍被未删除图片引用的文件key（原图及其派生图），删除文件前的最后检查
+
+    Args:
+        object_keys: 待删除的文件key
+
+    Returns:
+        set: 仍在使用、不能删除的key
+    """
+    from app.utils.image_derivatives import DERIVATIVE_SIZES
+
+    keys = set(object_keys)
+    if not keys:
+        return set()
+
+    # 派生图 xxx_thumb.webp 对应原图 xxx.<任意扩展名>
+    roots = {}
+    for key in keys:
+        for name in DERIVATIVE_SIZES:
+            suffix = f'_{name}.webp'
+            if key.endswith(suffix):
+                roots.setdefault(key[:-len(suffix)], []).append(key)
+
+    conditions = [ImageRecord.image_filename.in_(keys)]
+    conditions += [ImageRecord.image_filename.startswith(root + '.', autoescape=True) for root in roots]
+    filenames = db.session.query(ImageRecord.image_filename).filter(
+        ImageRecord.deleted_at.is_(None),
+        db.or_(*conditions)
+    ).distinct().all()
+
+    referenced = set()
+    for filename, in filenames:
+        if filename in keys:
+            referenced.add(filename)
+        referenced.update(roots.get(filename.rsplit('.', 1)[0], []))
+    return referenced
+
+
+def count_image_references(image_filename):
+    """统计仍在引用指定OSS文件的图片记录数（未删除）"""
+    if not image_filename:
+        return 0
+    return ImageRecord.query.filter_by(image_filename=image_filename).filter(
+        ImageRecord.deleted_at.is_(None)
+    ).count()
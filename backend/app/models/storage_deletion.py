@@ -0,0 +1,42 @@
+from datetime import datetime
+from app import db
+
+
+class StorageDeletion(db.Model):
+    """待删除文件表（outbox）- 与业务数据在同一事务中写入，由后台线程批量删除"""
+    __tablename__ = 'storage_deletions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    object_key = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)  # pending/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(255))
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'object_key': self.object_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat()
+        }
+
+
+def enqueue_deletions(object_keys):
+    """
+    登记待删除的文件（不提交事务，随调用方的事务一起提交）
+
+    Args:
+        object_keys: 文件key列表，忽略空值
+
+    Returns:
+        int: 登记的文件数
+    """
+    object_keys = [key for key in object_keys if key]
+    for key in object_keys:
+        db.session.add(StorageDeletion(object_key=key))
+    return len(object_keys)
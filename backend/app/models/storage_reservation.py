@@ -0,0 +1,186 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.user_storage import UserStorage, update_storage_on_image_save
+from app.utils.id_generator import generate_image_id
+
+
+class StorageReservation(db.Model):
+    """
+    存储配额预留表 - 上传前先预留空间和数量，保存成功时转为实际使用量，失败时释放
+
+    预留量同时累加在 user_storage.reserved_storage/reserved_images 上，准入判断只需
+    一条条件UPDATE；超过有效期仍未提交的预留（进程崩溃等）在该用户下次预留时释放，
+    也由后台删除线程定期统一释放。
+    """
+    __tablename__ = 'storage_reservations'
+    __table_args__ = (
+        db.Index('ix_storage_reservations_user_expires', 'user_id', 'expires_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    reservation_id = db.Column(db.String(20), unique=True, nullable=False,
+                               default=lambda: generate_image_id(prefix='rsv'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    image_count = db.Column(db.Integer, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+def _adjust_reserved(user_id, size, image_count):
+    """增减用户的预留量（减少时不低于0）"""
+    return db.session.execute(
+        db.update(UserStorage).where(
+            UserStorage.user_id == user_id
+        ).values(
+            reserved_storage=db.case(
+                (UserStorage.reserved_storage + size > 0, UserStorage.reserved_storage + size),
+                else_=0
+            ),
+            reserved_images=db.case(
+                (UserStorage.reserved_images + image_count > 0, UserStorage.reserved_images + image_count),
+                else_=0
+            )
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def _claim(reservation_id):
+    """删除预留记录，返回是否由本次删除（防止提交、释放和过期清理重复归还）"""
+    return db.session.execute(
+        db.delete(StorageReservation).where(
+            StorageReservation.id == reservation_id
+        ).execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def release_expired_reservations(user_id=None, batch_size=1000):
+    """
+    释放已过期的预留（分批提交事务），返回释放的条数
+
+    Args:
+        user_id: 只释放该用户的预留，为空时释放全部用户的（后台定期清理）
+        batch_size: 每批处理的条数
+    """
+    query = db.session.query(
+        StorageReservation.id, StorageReservation.user_id, StorageReservation.size, StorageReservation.image_count
+    ).filter(StorageReservation.expires_at <= datetime.utcnow())
+    if user_id is not None:
+        query = query.filter(StorageReservation.user_id == user_id)
+
+    released = 0
+    while True:
+        expired = query.order_by(StorageReservation.id).limit(batch_size).all()
+        for reservation_id, owner_id, size, image_count in expired:
+            if _claim(reservation_id):
+                _adjust_reserved(owner_id, -size, -image_count)
+                released += 1
+        if expired:
+            db.session.commit()
+        if len(expired) < batch_size:
+            return released
+
+
+def reserve_storage(user_id, size, image_count=1, ttl_seconds=300):
+    """
+    预留存储空间和图片数量（单独提交事务，上传期间对其他请求可见）
+
+    Args:
+        user_id: 用户ID
+        size: 预留的空间（字节），通常为估算大小
+        image_count: 预留的图片数量
+        ttl_seconds: 预留有效期（秒）
+
+    Returns:
+        dict: 预留信息（id、user_id、size、image_count），配额不足时返回None
+    """
+    release_expired_reservations(user_id)
+
+    try:
+        admitted = db.session.execute(
+            db.update(UserStorage).where(
+                UserStorage.user_id == user_id,
+                UserStorage.used_storage + UserStorage.reserved_storage + size <= UserStorage.total_storage,
+                UserStorage.current_images + UserStorage.reserved_images + image_count <= UserStorage.max_images
+            ).values(
+                reserved_storage=UserStorage.reserved_storage + size,
+                reserved_images=UserStorage.reserved_images + image_count
+            ).execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if not admitted:
+            db.session.rollback()
+            return None
+
+        reservation = StorageReservation(
+            user_id=user_id,
+            size=size,
+            image_count=image_count,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        )
+        db.session.add(reservation)
+        db.session.flush()
+        reservation_id = reservation.id
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'id': reservation_id,
+        'user_id': user_id,
+        'size': size,
+        'image_count': image_count
+    }
+
+
+def commit_reservation(reservation, size, image_count=None):
+    """
+    把预留转为实际使用量（不提交事务，随图片记录一起提交）
+
+    实际大小可能与预留不同，按实际大小计入，超出配额时不更新；预留已过期被
+    释放时按普通保存重新占用配额。
+
+    Args:
+        reservation: reserve_storage返回的预留信息
+        size: 实际占用的空间（字节）
+        image_count: 实际保存的图片数量，默认为预留的数量
+
+    Returns:
+        bool: 是否成功
+    """
+    if image_count is None:
+        image_count = reservation['image_count']
+    if not _claim(reservation['id']):
+        return update_storage_on_image_save(reservation['user_id'], size, image_count)
+
+    reserved_size = reservation['size']
+    reserved_count = reservation['image_count']
+    result = db.session.execute(
+        db.update(UserStorage).where(
+            UserStorage.user_id == reservation['user_id'],
+            UserStorage.used_storage + UserStorage.reserved_storage - reserved_size + size
+            <= UserStorage.total_storage,
+            UserStorage.current_images + UserStorage.reserved_images - reserved_count + image_count
+            <= UserStorage.max_images
+        ).values(
+            used_storage=UserStorage.used_storage + size,
+            current_images=UserStorage.current_images + image_count,
+            reserved_storage=UserStorage.reserved_storage - reserved_size,
+            reserved_images=UserStorage.reserved_images - reserved_count
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def release_reservation(reservation):
+    """释放预留（提交事务，需在调用方回滚或提交之后调用）"""
+    if not reservation:
+        return
+    try:
+        if _claim(reservation['id']):
+            _adjust_reserved(reservation['user_id'], -reservation['size'], -reservation['image_count'])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,47 @@
+from datetime import datetime
+from app import db
+from app.utils.id_generator import generate_image_id
+
+
+class UploadSession(db.Model):
+    """直传OSS上传会话表 - 记录预签名上传的预留信息"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.String(20), unique=True, nullable=False,
+                          default=lambda: generate_image_id(prefix='upl'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    # 预留信息
+    object_key = db.Column(db.String(255), nullable=False)
+    declared_size = db.Column(db.Integer, nullable=False)  # 前端声明的文件大小（字节）
+    content_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending/committed
+    # 申请上传地址时预留的配额（storage_reservations.id），提交时转为实际使用量
+    reservation_id = db.Column(db.Integer)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def is_expired(self):
+        """检查是否过期"""
+        return datetime.utcnow() > self.expires_at
+
+    def reservation(self):
+        """预留信息（与reserve_storage的返回值格式一致）"""
+        return {
+            'id': self.reservation_id,
+            'user_id': self.user_id,
+            'size': self.declared_size,
+            'image_count': 1
+        }
+
+    def to_dict(self):
+        return {
+            'upload_id': self.upload_id,
+            'object_key': self.object_key,
+            'declared_size': self.declared_size,
+            'content_type': self.content_type,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat()
+        }
+
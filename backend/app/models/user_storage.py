@@ -17,6 +17,10 @@ class UserStorage(db.Model):
     max_images = db.Column(db.Integer, default=100)  # 最大图片数量
     current_images = db.Column(db.Integer, default=0)  # 当前图片数量
 
+    # 上传中的图片预留的空间和数量（见 storage_reservation）
+    reserved_storage = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    reserved_images = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
     # 单个文件大小限制（字节）
     max_file_size = db.Column(db.Integer, default=10 * 1024 * 1024)  # 默认10MB
 
@@ -25,8 +29,8 @@ class UserStorage(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def get_remaining_space(self):
-        """获取剩余空间"""
-        return max(0, self.total_storage - self.used_storage)
+        """获取剩余空间（扣除上传中预留的空间）"""
+        return max(0, self.total_storage - self.used_storage - (self.reserved_storage or 0))
 
     def get_usage_percentage(self):
         """获取使用率百分比"""
@@ -39,21 +43,9 @@ class UserStorage(db.Model):
         return (
                 file_size <= self.max_file_size and
                 file_size <= self.get_remaining_space() and
-                self.current_images < self.max_images
+                self.current_images + (self.reserved_images or 0) < self.max_images
         )
 
-    def add_usage(self, file_size):
-        """增加使用量"""
-        self.used_storage += file_size
-        self.current_images += 1
-        db.session.commit()
-
-    def remove_usage(self, file_size):
-        """减少使用量"""
-        self.used_storage = max(0, self.used_storage - file_size)
-        self.current_images = max(0, self.current_images - 1)
-        db.session.commit()
-
     def to_dict(self):
         return {
             'id': self.id,
@@ -63,25 +55,68 @@ class UserStorage(db.Model):
             'usage_percentage': self.get_usage_percentage(),
             'max_images': self.max_images,
             'current_images': self.current_images,
+            'reserved_storage': self.reserved_storage or 0,
+            'reserved_images': self.reserved_images or 0,
             'max_file_size': self.max_file_size,
             'updated_at': self.updated_at.isoformat()
         }
 
 
 # 更新存储使用量的辅助函数
-def update_storage_on_image_save(user_id, image_size):
-    """保存图片时更新存储使用量"""
-    storage = UserStorage.query.filter_by(user_id=user_id).first()
-    if storage:
-        storage.add_usage(image_size)
-        return True
-    return False
-
-
-def update_storage_on_image_delete(user_id, image_size):
-    """删除图片时更新存储使用量"""
-    storage = UserStorage.query.filter_by(user_id=user_id).first()
-    if storage:
-        storage.remove_usage(image_size)
-        return True
-    return False
+#
+# 使用量通过单条条件UPDATE在数据库中原子增减，不在Python中读改写，
+# 同一用户并发保存时不会丢失更新；函数不提交事务，由调用方与图片记录一起提交。
+def update_storage_on_image_save(user_id, image_size, image_count=1):
+    """
+    保存图片时占用存储空间和图片数量
+
+    仅当占用后（含其他上传中的预留）不超过总空间和最大图片数量时更新。
+
+    Returns:
+        bool: 是否占用成功（存储信息不存在或配额不足时为False）
+    """
+    result = db.session.execute(
+        db.update(UserStorage).where(
+            UserStorage.user_id == user_id,
+            UserStorage.used_storage + UserStorage.reserved_storage + image_size <= UserStorage.total_storage,
+            UserStorage.current_images + UserStorage.reserved_images + image_count <= UserStorage.max_images
+        ).values(
+            used_storage=UserStorage.used_storage + image_size,
+            current_images=UserStorage.current_images + image_count
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def update_storage_on_image_delete(user_id, image_size, image_count=1):
+    """删除图片时归还存储空间和图片数量（不会减到0以下）"""
+    result = db.session.execute(
+        db.update(UserStorage).where(
+            UserStorage.user_id == user_id
+        ).values(
+            used_storage=db.case(
+                (UserStorage.used_storage > image_size, UserStorage.used_storage - image_size),
+                else_=0
+            ),
+            current_images=db.case(
+                (UserStorage.current_images > image_count, UserStorage.current_images - image_count),
+                else_=0
+            )
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def adjust_storage_usage(user_id, size_delta):
+    """按差值修正已占用的存储空间（文件已保存，不检查配额，不会减到0以下）"""
+    result = db.session.execute(
+        db.update(UserStorage).where(
+            UserStorage.user_id == user_id
+        ).values(
+            used_storage=db.case(
+                (UserStorage.used_storage + size_delta > 0, UserStorage.used_storage + size_delta),
+                else_=0
+            )
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
@@ -1,7 +1,10 @@
 from app.apis.auth import SendCodeResource, RegisterResource, LoginResource, ResetPasswordResource, \
     UserInfoResource
-from app.apis.image import ImageSaveResource, ImageListResource, ImageDetailResource, \
+from app.apis.image import ImageSaveResource, ImageBatchSaveResource, ImageUploadResource, ImagePresignResource, \
+    ImageCommitResource, ImageListResource, ImageSearchResource, ImageDetailResource, ImageStatusResource, \
     ImageUpdateResource, ImageDeleteResource, ImageUrlToBase64Resource
+from app.apis.storage import StorageFileResource
+from app.apis.system import SystemMetricsResource
 
 
 def register_routes(api):
@@ -13,8 +16,18 @@ def register_routes(api):
     api.add_resource(UserInfoResource, '/api/user/info')
     # 图片相关接口 - 增删查改
     api.add_resource(ImageSaveResource, '/api/images/add')                    # POST - 增
+    api.add_resource(ImageBatchSaveResource, '/api/images/batch-add')        # POST - 增（批量）
+    api.add_resource(ImageUploadResource, '/api/images/upload')              # POST - 增（二进制/表单上传）
+    api.add_resource(ImagePresignResource, '/api/images/presign')            # POST - 直传OSS（申请上传地址）
+    api.add_resource(ImageCommitResource, '/api/images/commit')              # POST - 直传OSS（提交）
     api.add_resource(ImageListResource, '/api/images/list')                    # GET - 查（列表）
+    api.add_resource(ImageSearchResource, '/api/images/search')                # GET - 查（全文搜索）
     api.add_resource(ImageDetailResource, '/api/images/<string:image_id>') # GET - 查（详情）
+    api.add_resource(ImageStatusResource, '/api/images/<string:image_id>/status')  # GET - 上传状态
     api.add_resource(ImageUpdateResource, '/api/images/<string:image_id>') # PUT - 改
     api.add_resource(ImageDeleteResource, '/api/images/<string:image_id>') # DELETE - 删
     api.add_resource(ImageUrlToBase64Resource, '/api/images/url-to-base64')    # POST - URL转Base64
+    # 本地存储文件（STORAGE_BACKEND=local）
+    api.add_resource(StorageFileResource, '/api/storage/<path:key>')         # GET/PUT - 下载/直传
+    # 系统相关接口
+    api.add_resource(SystemMetricsResource, '/api/system/metrics')             # GET - 运行指标
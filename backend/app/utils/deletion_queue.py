@@ -0,0 +1,222 @@
+import atexit
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class DeletionQueue:
+    """
+    文件删除队列 - 后台线程消费storage_deletions表
+
+    删除接口只在事务中登记待删除的key，提交后唤醒后台线程；线程按批
+    （OSS单次最多1000个）调用批量删除，成功的记录直接移除，失败的按指数
+    退避加随机抖动重新排期，超过最大次数标记为failed。
+
+    记录持久化在数据库中：后台线程在进程处理第一个请求时启动，启动后先处理
+    一轮到期记录，因此重启前遗留的pending记录不需要等到新的删除请求。
+    failed记录按更长的指数退避（STORAGE_DELETE_FAILED_RETRY_DELAY起，最长1天）
+    由后台线程重新放回队列；也可以用 flask drain-deletions 手动处理。
+    """
+
+    # failed记录重新排队的最大间隔（秒）
+    MAX_FAILED_RETRY_DELAY = 24 * 3600
+
+    def __init__(self):
+        self.app = None
+        self.batch_size = 1000
+        self.max_attempts = 5
+        self.poll_interval = 30
+        self.retry_base_delay = 5
+        self.failed_retry_delay = 3600
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'deleted': 0,
+            'retried': 0,
+            'failed': 0,
+            'skipped': 0,
+            'requeued': 0,
+            'last_batch_size': 0,
+            'last_latency_ms': 0
+        }
+
+    def init_app(self, app):
+        """读取配置并注册退出时的清理函数"""
+        self.app = app
+        self.batch_size = min(app.config.get('STORAGE_DELETE_BATCH_SIZE', 1000), 1000)
+        self.max_attempts = app.config.get('STORAGE_DELETE_MAX_ATTEMPTS', 5)
+        self.poll_interval = app.config.get('STORAGE_DELETE_POLL_INTERVAL', 30)
+        self.failed_retry_delay = app.config.get('STORAGE_DELETE_FAILED_RETRY_DELAY', 3600)
+        # 在处理第一个请求时启动后台线程（命令行命令不启动）
+        app.before_request(self.start)
+        atexit.register(self.shutdown)
+
+    def start(self):
+        """启动后台线程（已启动时直接返回），线程启动后先处理一轮遗留的到期记录"""
+        if self.app is None or self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._worker_loop, name='deletion-worker', daemon=True)
+                self._worker.start()
+
+    def notify(self):
+        """有新的待删除文件时唤醒后台线程"""
+        if self.app is None:
+            return
+        self.start()
+        self._wakeup.set()
+
+    def get_metrics(self):
+        """获取删除队列统计信息"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['running'] = self._worker is not None
+        return metrics
+
+    def shutdown(self, timeout=10):
+        """停止后台线程（未处理的记录保留在数据库中）"""
+        if self._worker is None:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._worker.join(timeout)
+        self._worker = None
+
+    def process_batch(self):
+        """
+        处理一批到期的待删除记录（需在应用上下文中调用）
+
+        Returns:
+            int: 本批处理的记录数
+        """
+        from app import db
+        from app.models.image_records import find_referenced_keys
+        from app.models.storage_deletion import StorageDeletion
+        from app.utils.storage import file_storage
+
+        now = datetime.utcnow()
+        rows = StorageDeletion.query.filter(
+            StorageDeletion.status == 'pending',
+            StorageDeletion.next_attempt_at <= now
+        ).order_by(StorageDeletion.id).limit(self.batch_size).with_for_update(skip_locked=True).all()
+
+        if not rows:
+            db.session.rollback()
+            return 0
+
+        started = time.monotonic()
+        # 登记后又被记录引用的文件（内容去重复用）不删除，直接移出队列
+        referenced = find_referenced_keys(row.object_key for row in rows)
+        keys = {row.object_key for row in rows} - referenced
+        result = file_storage.delete_files(keys) if keys else {'deleted': []}
+        deleted = set(result.get('deleted', []))
+        retried = failed = skipped = 0
+
+        for row in rows:
+            if row.object_key in referenced:
+                db.session.delete(row)
+                skipped += 1
+                continue
+            if row.object_key in deleted:
+                db.session.delete(row)
+                continue
+
+            row.attempts += 1
+            row.last_error = (result.get('message') or '')[:255]
+            if row.attempts >= self.max_attempts:
+                # 标记为failed，按更长的间隔（逐次加倍）由requeue_failed重新排队
+                row.status = 'failed'
+                row.next_attempt_at = now + timedelta(seconds=min(
+                    self.failed_retry_delay * (2 ** (row.attempts - self.max_attempts)),
+                    self.MAX_FAILED_RETRY_DELAY
+                ))
+                failed += 1
+            else:
+                # 指数退避 + 随机抖动
+                delay = random.uniform(0, self.retry_base_delay * (2 ** row.attempts))
+                row.next_attempt_at = now + timedelta(seconds=delay)
+                retried += 1
+
+        db.session.commit()
+
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['deleted'] += len(rows) - skipped - retried - failed
+            self._metrics['skipped'] += skipped
+            self._metrics['retried'] += retried
+            self._metrics['failed'] += failed
+            self._metrics['last_batch_size'] = len(rows)
+            self._metrics['last_latency_ms'] = int((time.monotonic() - started) * 1000)
+
+        if failed:
+            logging.error(f"{failed}个文件多次删除失败，已标记为failed")
+        return len(rows)
+
+    def requeue_failed(self, force=False):
+        """
+        把到期的failed记录重新放回队列（需在应用上下文中调用）
+
+        Args:
+            force: 为True时忽略排期，重新排队全部failed记录
+
+        Returns:
+            int: 重新排队的记录数
+        """
+        from app import db
+        from app.models.storage_deletion import StorageDeletion
+
+        now = datetime.utcnow()
+        query = db.update(StorageDeletion).where(StorageDeletion.status == 'failed')
+        if not force:
+            query = query.where(StorageDeletion.next_attempt_at <= now)
+        # 保留attempts：再次失败时直接回到failed，重排间隔继续加倍
+        requeued = db.session.execute(
+            query.values(status='pending', next_attempt_at=now).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        if requeued:
+            with self._lock:
+                self._metrics['requeued'] += requeued
+        return requeued
+
+    def drain(self):
+        """
+        同步处理全部到期记录（需在应用上下文中调用），返回处理的记录数
+
+        失败后重新排期的记录不会在本次继续处理。
+        """
+        total = 0
+        while True:
+            processed = self.process_batch()
+            total += processed
+            if processed < self.batch_size:
+                return total
+
+    def _worker_loop(self):
+        from app.models.storage_reservation import release_expired_reservations
+
+        # 启动后立即处理一轮（包括进程重启前遗留的记录），之后等待唤醒或轮询
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    self.requeue_failed()
+                    self.drain()
+                    # 顺带释放所有用户已过期的配额预留，不再上传的用户也能归还
+                    release_expired_reservations()
+            except Exception as e:
+                logging.error(f"后台删除任务异常: {str(e)}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+# 创建全局实例 - 在create_app中初始化
+deletion_queue = DeletionQueue()
@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class DiskLRUCache:
+    """
+    本地磁盘LRU缓存 - 缓存最近保存/读取的图片文件，避免重复从存储下载
+
+    文件以key的sha1命名保存在缓存目录中，写入先落到临时文件再原子替换。
+    LRU索引只在当前进程内维护（首次使用时按修改时间扫描目录重建），
+    多个进程共用目录时，被其他进程淘汰的文件按未命中处理。
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self._index = None  # 文件名 -> 大小，按访问顺序排列
+        self._total = 0
+        self._lock = threading.Lock()
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+    @classmethod
+    def from_env(cls):
+        """
+        按环境变量创建：IMAGE_CACHE_MAX_SIZE（MB，默认0即不缓存）、IMAGE_CACHE_DIR
+
+        缓存需显式开启；未指定目录时放在系统临时目录下，不写入代码目录。
+        """
+        directory = os.path.abspath(os.getenv(
+            'IMAGE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'ezwork-image-cache')
+        ))
+        return cls(directory, int(os.getenv('IMAGE_CACHE_MAX_SIZE', 0)) * 1024 * 1024)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        """读取缓存，未命中时返回None"""
+        if not self.enabled:
+            return None
+
+        name = self._name(key)
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._metrics['misses'] += 1
+                self._forget(name)
+            return None
+
+        with self._lock:
+            self._metrics['hits'] += 1
+            index = self._load_index()
+            if name in index:
+                index.move_to_end(name)
+        return data
+
+    def put(self, key, data):
+        """写入缓存，超过容量时淘汰最久未使用的文件"""
+        if not self.enabled or len(data) > self.max_size:
+            return
+
+        name = self._name(key)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+            tmp_path = None
+        except OSError as e:
+            logging.error(f"写入图片缓存失败: {str(e)}")
+            return
+        finally:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self._metrics['writes'] += 1
+            index = self._load_index()
+            self._total -= index.pop(name, 0)
+            index[name] = len(data)
+            self._total += len(data)
+            while self._total > self.max_size and index:
+                evicted, size = index.popitem(last=False)
+                self._total -= size
+                self._metrics['evictions'] += 1
+                try:
+                    os.remove(os.path.join(self.directory, evicted))
+                except OSError:
+                    pass
+
+    def get_metrics(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['files'] = len(self._index) if self._index is not None else None
+            metrics['size'] = self._total
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0
+        metrics['enabled'] = self.enabled
+        return metrics
+
+    def _name(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _forget(self, name):
+        if self._index is not None and name in self._index:
+            self._total -= self._index.pop(name)
+
+    def _load_index(self):
+        """首次使用时按修改时间扫描缓存目录（需持有锁）"""
+        if self._index is None:
+            entries = []
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if entry.is_file() and not entry.name.startswith('.tmp-'):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime, entry.name, stat.st_size))
+            except OSError:
+                pass
+            self._index = OrderedDict((name, size) for _, name, size in sorted(entries))
+            self._total = sum(self._index.values())
+        return self._index
+
+
+# 创建全局实例 - 由存储后端在上传和读取图片时使用
+image_file_cache = DiskLRUCache.from_env()
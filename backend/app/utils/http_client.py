@@ -0,0 +1,71 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpClient:
+    """
+    共享的HTTP客户端 - 复用连接池下载外部资源
+
+    所有请求共用一个requests.Session：同一主机的连接保持keep-alive复用，
+    每个主机的连接数不超过HTTP_POOL_MAXSIZE（连接用尽时等待而不是新建），
+    连接和读取分别设置超时。
+    """
+
+    DEFAULT_HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'image/*,*/*;q=0.8',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    }
+
+    def __init__(self):
+        self.pool_connections = 10
+        self.pool_maxsize = 10
+        self.connect_timeout = 5
+        self.read_timeout = 30
+        self._session = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """读取连接池和超时配置"""
+        self.pool_connections = app.config.get('HTTP_POOL_CONNECTIONS', 10)
+        self.pool_maxsize = app.config.get('HTTP_POOL_MAXSIZE', 10)
+        self.connect_timeout = app.config.get('HTTP_CONNECT_TIMEOUT', 5)
+        self.read_timeout = app.config.get('HTTP_READ_TIMEOUT', 30)
+
+    @property
+    def session(self):
+        """首次使用时创建Session"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=True
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update(self.DEFAULT_HEADERS)
+                    self._session = session
+        return self._session
+
+    def stream(self, url, **kwargs):
+        """
+        发起流式GET请求（调用方负责关闭响应，可用with语句）
+
+        Returns:
+            requests.Response: 响应体尚未读取，raw已开启解压
+        """
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        response = self.session.get(url, stream=True, **kwargs)
+        # 按块读取raw时同样解压gzip/deflate，大小限制作用于解压后的数据
+        response.raw.decode_content = True
+        return response
+
+
+# 创建全局实例 - 在create_app中初始化
+http_client = HttpClient()
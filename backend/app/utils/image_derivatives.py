@@ -0,0 +1,128 @@
+import logging
+import os
+from io import BytesIO
+
+from PIL import Image
+
+# 派生图规格：名称 -> 最长边像素
+DERIVATIVE_SIZES = {
+    'thumb': 256,
+    'preview': 1024
+}
+DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', 80))
+
+
+def derivative_key(image_filename, name):
+    """派生图的OSS key - 与原图放在同一目录，如 xxx.png -> xxx_thumb.webp"""
+    root, _ = os.path.splitext(image_filename)
+    return f"{root}_{name}.webp"
+
+
+def derivative_keys(image_filename):
+    """原图对应的全部派生图key"""
+    if not image_filename:
+        return []
+    return [derivative_key(image_filename, name) for name in DERIVATIVE_SIZES]
+
+
+def render_derivatives(image_bytes):
+    """
+    生成缩略图和预览图（WebP）
+
+    Returns:
+        dict: 名称 -> WebP字节数据，原图不大于目标尺寸时不生成该规格
+    """
+    results = {}
+    with Image.open(BytesIO(image_bytes)) as img:
+        largest = max(DERIVATIVE_SIZES.values())
+        # JPEG可按目标尺寸直接缩小解码，避免解码全分辨率
+        img.draft('RGB', (largest, largest))
+
+        if img.mode in ('P', 'LA', 'PA'):
+            img = img.convert('RGBA')
+        elif img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+
+        # 从大到小依次缩放，小图基于上一级结果生成
+        source = img
+        for name, size in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+            if max(source.size) <= size:
+                continue
+            source = source.copy()
+            source.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+            buffer = BytesIO()
+            source.save(buffer, 'WEBP', quality=DERIVATIVE_QUALITY, method=4)
+            results[name] = buffer.getvalue()
+
+    return results
+
+
+def attach_derivatives(image_record, image_bytes=None):
+    """
+    生成并上传派生图，写入记录的thumb_url/preview_url（不提交事务）
+
+    Args:
+        image_record: 图片记录
+        image_bytes: 原图数据，为空时从OSS读取
+
+    Returns:
+        bool: 是否成功
+    """
+    from app.utils.storage import file_storage
+
+    if not image_record.image_filename:
+        return False
+
+    try:
+        if image_bytes is None:
+            image_bytes = file_storage.read_file(image_record.image_filename)
+            if image_bytes is None:
+                return False
+
+        rendered = render_derivatives(image_bytes)
+        urls = {}
+        for name, data in rendered.items():
+            result = file_storage.put_bytes(
+                derivative_key(image_record.image_filename, name),
+                data,
+                content_type='image/webp'
+            )
+            if not result['success']:
+                return False
+            urls[name] = result['url']
+
+        # 原图已经足够小的规格直接使用原图
+        image_record.thumb_url = urls.get('thumb', image_record.image_url)
+        image_record.preview_url = urls.get('preview', image_record.image_url)
+        return True
+
+    except Exception as e:
+        logging.error(f"生成派生图失败: {image_record.image_id}, {str(e)}")
+        return False
+
+
+def schedule_derivatives(app, image_id, image_bytes=None):
+    """
+    提交后台任务生成派生图（使用OSS传输线程池）
+
+    Args:
+        app: Flask应用实例
+        image_id: 图片业务ID
+        image_bytes: 原图数据，为空时从OSS读取
+    """
+    from app.utils.storage import file_storage
+
+    def job():
+        from app import db
+        from app.models.image_records import ImageRecord
+
+        with app.app_context():
+            image_record = ImageRecord.query.filter_by(image_id=image_id).first()
+            if not image_record or image_record.deleted_at is not None:
+                return
+            if attach_derivatives(image_record, image_bytes):
+                db.session.commit()
+            else:
+                db.session.rollback()
+
+    return file_storage.submit(job)
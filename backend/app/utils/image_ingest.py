@@ -0,0 +1,210 @@
+import base64
+import binascii
+import hashlib
+import logging
+from io import BytesIO
+
+from PIL import Image
+
+from app.utils.image_probe import probe_image, verify_image
+
+
+def check_image_format(data):
+    """检查数据是否为可识别的图片格式（只解析文件头）"""
+    return probe_image(data) is not None
+
+
+class ImageIngest:
+    """
+    图片数据接收对象 - 整个保存流程只解码一次
+
+    拆分data URL、估算大小、校验、获取图片信息和上传共用同一份字节数据，
+    避免在校验、配额检查、上传和读取图片信息时重复解码base64。
+    """
+
+    MIN_IMAGE_SIZE = 100  # 解码后最小字节数
+
+    def __init__(self, image_data):
+        self.image_data = image_data
+        self.header = None
+        self.base64_part = None
+        self.image_bytes = None
+        self._image_info = None
+        self._content_hash = None
+
+    def parse(self):
+        """拆分data URL（不解码），返回校验结果"""
+        image_data = self.image_data
+
+        if not image_data:
+            return {'valid': False, 'message': '图片数据为空'}
+
+        if not isinstance(image_data, str):
+            return {'valid': False, 'message': '图片数据必须是字符串格式'}
+
+        # 检查是否包含data URL前缀
+        if image_data.startswith('data:image'):
+            if ',' not in image_data:
+                return {'valid': False, 'message': 'data URL格式错误，缺少逗号分隔符'}
+            self.header, self.base64_part = image_data.split(',', 1)
+        else:
+            self.base64_part = image_data
+
+        return {'valid': True, 'message': '图片数据格式正确'}
+
+    @property
+    def estimated_size(self):
+        """根据base64长度估算解码后的字节数（无需解码）"""
+        if self.image_bytes is not None:
+            return len(self.image_bytes)
+        if self.base64_part is None:
+            return 0
+
+        length = len(self.base64_part)
+        padding = 0
+        if self.base64_part.endswith('=='):
+            padding = 2
+        elif self.base64_part.endswith('='):
+            padding = 1
+        return max(0, length * 3 // 4 - padding)
+
+    def validate(self, strict=False):
+        """
+        解码base64（仅一次）并校验图片数据
+
+        Args:
+            strict: 是否使用Pillow完整校验图片（默认只解析文件头）
+        """
+        if self.base64_part is None:
+            parse_result = self.parse()
+            if not parse_result['valid']:
+                return parse_result
+
+        if self.image_bytes is None:
+            try:
+                self.image_bytes = base64.b64decode(self.base64_part)
+            except (binascii.Error, ValueError) as e:
+                return {'valid': False, 'message': f'base64解码失败: {str(e)}'}
+
+        # 检查解码后的数据大小
+        if len(self.image_bytes) < self.MIN_IMAGE_SIZE:
+            return {'valid': False, 'message': f'解码后数据太小: {len(self.image_bytes)} bytes'}
+
+        # 解析文件头获取格式和尺寸
+        probe = probe_image(self.image_bytes)
+        if not probe:
+            return {'valid': False, 'message': '数据不是有效的图片格式'}
+        self._image_info = probe
+
+        if strict and not verify_image(self.image_bytes):
+            return {'valid': False, 'message': '图片文件已损坏'}
+
+        return {'valid': True, 'message': '图片数据验证成功'}
+
+    @property
+    def size(self):
+        """解码后的实际大小"""
+        return len(self.image_bytes) if self.image_bytes is not None else 0
+
+    @property
+    def content_hash(self):
+        """图片内容的sha256（用于去重）"""
+        if self._content_hash is None and self.image_bytes is not None:
+            self._content_hash = hashlib.sha256(self.image_bytes).hexdigest()
+        return self._content_hash
+
+    @property
+    def image_info(self):
+        """获取图片信息（只读取图片头，结果缓存）"""
+        if self._image_info is None:
+            self._image_info = get_image_info(self.image_bytes) if self.image_bytes else {}
+        return self._image_info
+
+
+def get_image_info(image_bytes):
+    """获取图片信息（优先只解析文件头，无法解析时再使用Pillow）"""
+    probe = probe_image(image_bytes)
+    if probe:
+        return probe
+
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            return {
+                'width': img.width,
+                'height': img.height,
+                'format': img.format,
+                'mime_type': Image.MIME.get(img.format)
+            }
+    except Exception as e:
+        logging.warning(f"获取图片信息失败: {str(e)}")
+        return {}
+
+
+class StreamIngest:
+    """
+    流式图片接收对象 - 分块读取请求体并直接交给存储上传
+
+    不在内存中保留整张图片：开始上传前只缓存解析文件头所需的数据，
+    之后边读取边统计大小，超出大小限制时立即中断。
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    HEADER_LIMIT = 256 * 1024  # 解析文件头最多缓存的数据量（JPEG的EXIF可能较大）
+    MIN_IMAGE_SIZE = ImageIngest.MIN_IMAGE_SIZE
+
+    def __init__(self, stream, content_length=None, max_size=None):
+        self.stream = stream
+        self.content_length = content_length
+        self.max_size = max_size
+        self.size = 0
+        self._first_chunk = b''
+        self.format = None
+        self._image_info = None
+        self._sha256 = hashlib.sha256()
+
+    def prime(self):
+        """读取开头的数据并解析文件头，返回校验结果"""
+        first_chunk = self.stream.read(self.CHUNK_SIZE)
+        probe = probe_image(first_chunk)
+        # 文件头不完整时继续读取，直到能解析出尺寸或达到缓存上限
+        while not probe and len(first_chunk) < self.HEADER_LIMIT:
+            more = self.stream.read(self.CHUNK_SIZE)
+            if not more:
+                break
+            first_chunk += more
+            probe = probe_image(first_chunk)
+
+        if len(first_chunk) < self.MIN_IMAGE_SIZE:
+            return {'valid': False, 'message': f'图片数据太小: {len(first_chunk)} bytes'}
+
+        if not probe:
+            return {'valid': False, 'message': '数据不是有效的图片格式'}
+
+        self.format = probe['format']
+        self._image_info = probe
+        self._first_chunk = first_chunk
+        return {'valid': True, 'message': '图片数据格式正确'}
+
+    def iter_chunks(self):
+        """按块产出图片数据，超过大小限制时抛出ValueError中断上传"""
+        chunk = self._first_chunk
+        self._first_chunk = b''
+        while chunk:
+            self.size += len(chunk)
+            if self.max_size is not None and self.size > self.max_size:
+                raise ValueError(f'图片大小超过限制: {self.max_size} bytes')
+            if self.content_length is not None and self.size > self.content_length:
+                raise ValueError('图片实际大小超过声明的Content-Length')
+            self._sha256.update(chunk)
+            yield chunk
+            chunk = self.stream.read(self.CHUNK_SIZE)
+
+    @property
+    def content_hash(self):
+        """图片内容的sha256（上传完成后可用）"""
+        return self._sha256.hexdigest()
+
+    @property
+    def image_info(self):
+        """获取图片信息（prime成功后可用）"""
+        return self._image_info or {}
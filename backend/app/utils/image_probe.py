@@ -0,0 +1,158 @@
+import logging
+import struct
+from io import BytesIO
+
+from PIL import Image
+
+# 格式 -> MIME类型（格式名与Pillow保持一致）
+MIME_TYPES = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+    'BMP': 'image/bmp',
+    'AVIF': 'image/avif'
+}
+
+# JPEG中携带图片尺寸的SOF标记（排除DHT=C4、JPG=C8、DAC=CC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 没有长度字段的JPEG标记
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def probe_image(data):
+    """
+    只解析文件头获取图片格式和尺寸，不解码像素
+
+    支持PNG、JPEG（扫描SOF）、GIF、WebP（VP8/VP8L/VP8X）、BMP和AVIF。
+
+    Args:
+        data: 图片数据（完整数据或开头的一段）
+
+    Returns:
+        dict: format、mime_type、width、height；无法识别时返回None
+    """
+    if not data or len(data) < 12:
+        return None
+
+    head = bytes(data[:32])
+    try:
+        if head.startswith(b'\x89PNG\r\n\x1a\n'):
+            size = _probe_png(data)
+            format_name = 'PNG'
+        elif head.startswith(b'\xff\xd8\xff'):
+            size = _probe_jpeg(data)
+            format_name = 'JPEG'
+        elif head[:6] in (b'GIF87a', b'GIF89a'):
+            size = struct.unpack('<HH', head[6:10])
+            format_name = 'GIF'
+        elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            size = _probe_webp(data)
+            format_name = 'WEBP'
+        elif head[:2] == b'BM':
+            size = _probe_bmp(data)
+            format_name = 'BMP'
+        elif head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+            size = _probe_avif(data)
+            format_name = 'AVIF'
+        else:
+            return None
+    except (struct.error, IndexError, ValueError):
+        return None
+
+    if not size or size[0] <= 0 or size[1] <= 0:
+        return None
+
+    return {
+        'format': format_name,
+        'mime_type': MIME_TYPES[format_name],
+        'width': size[0],
+        'height': size[1]
+    }
+
+
+def verify_image(data):
+    """严格模式：使用Pillow完整校验图片（会读取全部数据），返回是否有效"""
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.verify()
+        return True
+    except Exception as e:
+        logging.warning(f"图片校验失败: {str(e)}")
+        return False
+
+
+def _probe_png(data):
+    # 签名(8) + IHDR长度(4) + 'IHDR'(4) + 宽(4) + 高(4)
+    if data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def _probe_jpeg(data):
+    length = len(data)
+    offset = 2
+    while offset < length:
+        # 跳到下一个标记（允许多个0xFF填充字节）
+        if data[offset] != 0xFF:
+            offset += 1
+            continue
+        while offset < length and data[offset] == 0xFF:
+            offset += 1
+        if offset >= length:
+            return None
+        marker = data[offset]
+        offset += 1
+
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9 or marker == 0xDA:
+            # 图片结束或扫描数据开始前仍未找到SOF
+            return None
+
+        segment_length = struct.unpack('>H', data[offset:offset + 2])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            # 长度(2) + 精度(1) + 高(2) + 宽(2)
+            height, width = struct.unpack('>HH', data[offset + 3:offset + 7])
+            return width, height
+        offset += segment_length
+    return None
+
+
+def _probe_webp(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        # 帧头：3字节帧标记 + 起始码 9d 01 2a + 14位宽高
+        if data[23:26] != b'\x9d\x01\x2a':
+            return None
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        if data[20] != 0x2F:
+            return None
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        # 画布宽高-1，各24位小端
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def _probe_bmp(data):
+    header_size = struct.unpack('<I', data[14:18])[0]
+    if header_size == 12:
+        # OS/2 BITMAPCOREHEADER
+        return struct.unpack('<HH', data[18:22])
+    width, height = struct.unpack('<ii', data[18:26])
+    # 高度为负表示自上而下存储
+    return width, abs(height)
+
+
+def _probe_avif(data):
+    # 在文件头中查找ispe（图像空间尺寸）box：版本/标志(4) + 宽(4) + 高(4)
+    index = bytes(data[:64 * 1024]).find(b'ispe')
+    if index < 0:
+        return None
+    return struct.unpack('>II', data[index + 8:index + 16])
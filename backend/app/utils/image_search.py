@@ -0,0 +1,187 @@
+import logging
+
+from app import db
+from app.models.image_records import ImageRecord
+
+# SQLite FTS5（trigram分词，支持中文子串匹配），通过触发器随image_records自动维护
+_SQLITE_FTS_TABLE = 'image_records_fts'
+_SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {_SQLITE_FTS_TABLE} USING fts5(
+        prompt, model_response, content='image_records', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_ai AFTER INSERT ON image_records BEGIN
+        INSERT INTO {_SQLITE_FTS_TABLE}(rowid, prompt, model_response)
+        VALUES (new.id, new.prompt, new.model_response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_ad AFTER DELETE ON image_records BEGIN
+        INSERT INTO {_SQLITE_FTS_TABLE}({_SQLITE_FTS_TABLE}, rowid, prompt, model_response)
+        VALUES ('delete', old.id, old.prompt, old.model_response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_au AFTER UPDATE OF prompt, model_response ON image_records BEGIN
+        INSERT INTO {_SQLITE_FTS_TABLE}({_SQLITE_FTS_TABLE}, rowid, prompt, model_response)
+        VALUES ('delete', old.id, old.prompt, old.model_response);
+        INSERT INTO {_SQLITE_FTS_TABLE}(rowid, prompt, model_response)
+        VALUES (new.id, new.prompt, new.model_response);
+    END"""
+]
+# trigram分词要求每个检索词至少3个字符，更短的检索词使用LIKE
+_TRIGRAM_MIN_LENGTH = 3
+
+# MySQL FULLTEXT索引（ngram分词，支持中文），由MySQL随写入自动维护
+_MYSQL_FULLTEXT_INDEX = 'ft_image_records_text'
+# ngram分词的长度（MySQL变量ngram_token_size，默认2），更短的检索词无法命中索引，使用LIKE
+_mysql_ngram_token_size = 2
+
+# 全文索引是否可用（由detect_search_index设置），不可用时搜索使用LIKE
+_search_index_available = False
+
+
+def detect_search_index():
+    """
+    检测全文索引是否可用（只读，不创建），返回是否可用
+
+    应用启动时调用。索引由迁移（flask db upgrade）或 flask rebuild-search-index 创建，
+    启动时不执行DDL，避免多个进程同时对大表加索引。
+    """
+    global _search_index_available, _mysql_ngram_token_size
+
+    available = False
+    dialect = db.engine.dialect.name
+    try:
+        with db.engine.connect() as conn:
+            if dialect == 'sqlite':
+                # 虚拟表和维护索引的三个触发器都存在时才使用
+                names = {row[0] for row in conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE name IN (?, ?, ?, ?)",
+                    (_SQLITE_FTS_TABLE, 'image_records_fts_ai', 'image_records_fts_ad', 'image_records_fts_au')
+                )}
+                available = len(names) == 4
+            elif dialect == 'mysql':
+                available = conn.exec_driver_sql(
+                    "SHOW INDEX FROM image_records WHERE Key_name = %s", (_MYSQL_FULLTEXT_INDEX,)
+                ).first() is not None
+                token_size = conn.exec_driver_sql("SHOW VARIABLES LIKE 'ngram_token_size'").first()
+                if token_size:
+                    _mysql_ngram_token_size = int(token_size[1])
+    except Exception as e:
+        logging.error(f"检测全文索引失败: {str(e)}")
+
+    if not available:
+        logging.warning("未找到全文索引，搜索将使用LIKE匹配（执行 flask db upgrade 或 flask rebuild-search-index 创建）")
+    _search_index_available = available
+    return available
+
+
+def rebuild_search_index():
+    """
+    创建全文索引（不存在时）并导入已有数据，返回是否执行（不支持的数据库返回False）
+
+    SQLite重建FTS5表的全部内容；MySQL的FULLTEXT索引由数据库随写入维护，只在缺失时创建
+    （会锁表，应在维护窗口执行）。
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        with db.engine.begin() as conn:
+            for statement in _SQLITE_SETUP:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql(f"INSERT INTO {_SQLITE_FTS_TABLE}({_SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+    elif dialect == 'mysql':
+        with db.engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SHOW INDEX FROM image_records WHERE Key_name = %s", (_MYSQL_FULLTEXT_INDEX,)
+            ).first()
+            if not exists:
+                conn.exec_driver_sql(
+                    f"ALTER TABLE image_records ADD FULLTEXT INDEX {_MYSQL_FULLTEXT_INDEX} "
+                    f"(prompt, model_response) WITH PARSER ngram"
+                )
+    else:
+        return False
+
+    detect_search_index()
+    return True
+
+
+def search_images(user_id, keyword, limit, position=None):
+    """
+    在用户的图片中搜索提示词和模型回复
+
+    Args:
+        user_id: 用户ID
+        keyword: 检索词，多个词用空格分隔（全部匹配）
+        limit: 返回条数
+        position: 游标位置 (score, id)，从该位置之后继续查询
+
+    Returns:
+        list: (id, score) 列表，按相关度排序（score越小越相关），相同时按id倒序
+    """
+    terms = keyword.split()
+    if not terms:
+        return []
+
+    dialect = db.engine.dialect.name
+    if _search_index_available:
+        if dialect == 'sqlite' and all(len(term) >= _TRIGRAM_MIN_LENGTH for term in terms):
+            return _search_sqlite(user_id, terms, limit, position)
+        if dialect == 'mysql' and all(len(term) >= _mysql_ngram_token_size for term in terms):
+            return _search_mysql(user_id, terms, limit, position)
+    return _search_like(user_id, terms, limit, position)
+
+
+def _search_sqlite(user_id, terms, limit, position):
+    # 每个检索词作为短语匹配，避免用户输入被解析为FTS5语法
+    match = ' AND '.join('"' + term.replace('"', '""') + '"' for term in terms)
+    params = {'match': match, 'user_id': user_id, 'limit': limit}
+    after = ''
+    if position:
+        after = 'AND (s.score > :score OR (s.score = :score AND r.id < :last_id))'
+        params.update(score=position[0], last_id=position[1])
+
+    rows = db.session.execute(db.text(f"""
+        SELECT r.id, s.score
+        FROM (SELECT rowid AS id, bm25({_SQLITE_FTS_TABLE}) AS score
+              FROM {_SQLITE_FTS_TABLE} WHERE {_SQLITE_FTS_TABLE} MATCH :match) s
+        JOIN image_records r ON r.id = s.id
+        WHERE r.user_id = :user_id AND r.deleted_at IS NULL {after}
+        ORDER BY s.score, r.id DESC
+        LIMIT :limit
+    """), params)
+    return [(row[0], row[1]) for row in rows]
+
+
+def _search_mysql(user_id, terms, limit, position):
+    # 布尔模式下每个词都必须出现；相关度取负值，与SQLite的bm25一致（越小越相关）
+    against = ' '.join('+"' + term.replace('"', ' ') + '"' for term in terms)
+    score = '-MATCH(prompt, model_response) AGAINST (:against IN BOOLEAN MODE)'
+    params = {'against': against, 'user_id': user_id, 'limit': limit}
+    after = ''
+    if position:
+        after = f'AND ({score} > :score OR ({score} = :score AND id < :last_id))'
+        params.update(score=position[0], last_id=position[1])
+
+    rows = db.session.execute(db.text(f"""
+        SELECT id, {score} AS score
+        FROM image_records
+        WHERE user_id = :user_id AND deleted_at IS NULL
+          AND MATCH(prompt, model_response) AGAINST (:against IN BOOLEAN MODE) {after}
+        ORDER BY score, id DESC
+        LIMIT :limit
+    """), params)
+    return [(row[0], float(row[1])) for row in rows]
+
+
+def _search_like(user_id, terms, limit, position):
+    """没有可用全文索引时（或检索词过短）按LIKE匹配，结果按id倒序"""
+    query = db.session.query(ImageRecord.id).filter(
+        ImageRecord.user_id == user_id,
+        ImageRecord.deleted_at.is_(None)
+    )
+    for term in terms:
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(db.or_(
+            ImageRecord.prompt.like(pattern, escape='\\'),
+            ImageRecord.model_response.like(pattern, escape='\\')
+        ))
+    if position:
+        query = query.filter(ImageRecord.id < position[1])
+    return [(row[0], 0.0) for row in query.order_by(ImageRecord.id.desc()).limit(limit)]
@@ -0,0 +1,108 @@
+import logging
+from io import BytesIO
+
+from PIL import Image, features
+
+# 存储策略
+POLICY_ORIGINAL = 'original'            # 保留原始数据
+POLICY_WEBP_LOSSLESS = 'webp_lossless'  # WebP无损
+POLICY_WEBP = 'webp'                    # WebP有损（按质量参数）
+POLICY_AVIF = 'avif'                    # AVIF（不可用时退回WebP有损）
+TRANSCODE_POLICIES = (POLICY_ORIGINAL, POLICY_WEBP_LOSSLESS, POLICY_WEBP, POLICY_AVIF)
+
+# 图片格式 -> (扩展名, Content-Type)
+FORMAT_TYPES = {
+    'PNG': ('.png', 'image/png'),
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'GIF': ('.gif', 'image/gif'),
+    'WEBP': ('.webp', 'image/webp'),
+    'BMP': ('.bmp', 'image/bmp'),
+    'AVIF': ('.avif', 'image/avif')
+}
+
+
+def avif_available():
+    """当前Pillow是否支持AVIF编码"""
+    try:
+        return bool(features.check('avif'))
+    except Exception:
+        return False
+
+
+def format_type(format_name):
+    """根据图片格式获取扩展名和Content-Type，未知格式按PNG处理"""
+    return FORMAT_TYPES.get((format_name or '').upper(), FORMAT_TYPES['PNG'])
+
+
+def transcode_image(image_bytes, image_info=None, policy=POLICY_ORIGINAL, quality=85):
+    """
+    按存储策略转码图片
+
+    重新编码时去除EXIF等元数据（保留ICC色彩配置）；动图、转码失败或
+    转码后反而更大时保留原始数据。
+
+    Returns:
+        dict: data、format、extension、content_type
+    """
+    image_info = image_info or {}
+    original_format = image_info.get('format')
+
+    def keep_original():
+        extension, content_type = format_type(original_format)
+        return {
+            'data': image_bytes,
+            'format': original_format,
+            'extension': extension,
+            'content_type': content_type
+        }
+
+    if policy not in TRANSCODE_POLICIES or policy == POLICY_ORIGINAL:
+        return keep_original()
+
+    if policy == POLICY_AVIF and not avif_available():
+        logging.warning("当前环境不支持AVIF编码，使用WebP有损格式")
+        policy = POLICY_WEBP
+
+    target_format = 'AVIF' if policy == POLICY_AVIF else 'WEBP'
+    if (original_format or '').upper() == target_format and policy != POLICY_WEBP_LOSSLESS:
+        return keep_original()
+
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            if getattr(img, 'is_animated', False):
+                return keep_original()
+
+            icc_profile = img.info.get('icc_profile')
+            if img.mode in ('P', 'LA', 'PA'):
+                img = img.convert('RGBA')
+            elif img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGB')
+
+            save_args = {}
+            if icc_profile:
+                save_args['icc_profile'] = icc_profile
+            if policy == POLICY_WEBP_LOSSLESS:
+                save_args.update(lossless=True, quality=100, method=4)
+            else:
+                save_args.update(quality=quality)
+                if target_format == 'WEBP':
+                    save_args['method'] = 4
+
+            buffer = BytesIO()
+            img.save(buffer, target_format, **save_args)
+            data = buffer.getvalue()
+
+    except Exception as e:
+        logging.warning(f"图片转码失败，保留原图: {str(e)}")
+        return keep_original()
+
+    if len(data) >= len(image_bytes):
+        return keep_original()
+
+    extension, content_type = format_type(target_format)
+    return {
+        'data': data,
+        'format': target_format,
+        'extension': extension,
+        'content_type': content_type
+    }
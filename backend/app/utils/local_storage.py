@@ -0,0 +1,327 @@
+import base64
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from flask import Response, send_file
+
+from app.utils.storage_backend import StorageBackend
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    本地文件系统存储后端 - 适用于单机部署和无云端凭证的压测环境
+
+    文件保存在LOCAL_STORAGE_ROOT目录下，key即相对路径；写入先落到同目录的
+    临时文件再原子替换。文件通过 /api/storage/<key> 对外提供：配置了
+    LOCAL_STORAGE_ACCEL_PREFIX 时返回 X-Accel-Redirect 交给Nginx发送，否则
+    使用send_file（WSGI服务器支持时走sendfile零拷贝）。直传地址使用
+    HMAC签名，由同一路由的PUT方法接收。
+    """
+
+    name = 'local'
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self):
+        self.root = os.path.abspath(os.getenv(
+            'LOCAL_STORAGE_ROOT',
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
+        ))
+        self.base_url = os.getenv('LOCAL_STORAGE_URL', '/api/storage').rstrip('/')
+        self.accel_prefix = os.getenv('LOCAL_STORAGE_ACCEL_PREFIX', '').rstrip('/')
+        self.max_age = int(os.getenv('LOCAL_STORAGE_MAX_AGE', 31536000))
+        self.max_workers = int(os.getenv('OSS_TRANSFER_WORKERS', 8))
+        self._secret = os.getenv('SECRET_KEY', 'dev-key').encode('utf-8')
+        self._executor = None
+        self._lock = threading.Lock()
+        # 指标与OSS传输管理器的结构相同
+        self._recent = deque(maxlen=100)
+        self._totals = {
+            'transfers': 0,
+            'failed': 0,
+            'bytes': 0,
+            'parts': 0,
+            'retries': 0,
+            'latency_ms': 0
+        }
+        os.makedirs(self.root, exist_ok=True)
+
+    def is_available(self):
+        """检查存储目录是否可写"""
+        return os.access(self.root, os.W_OK)
+
+    def path_for(self, key):
+        """key对应的本地路径，key越出存储目录时抛出ValueError"""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'非法的文件key: {key}')
+        return path
+
+    def put(self, key, data, content_type=None):
+        """写入内存数据"""
+        content_md5 = base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+        result = self._write(key, [data])
+        if result['success']:
+            result['content_md5'] = content_md5
+        return result
+
+    def put_stream(self, key, body, content_length=None, content_type=None):
+        """写入数据流（可迭代的数据块或file-like对象）"""
+        if hasattr(body, 'read'):
+            def chunks():
+                while True:
+                    chunk = body.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+            return self._write(key, chunks())
+        return self._write(key, body)
+
+    def get(self, key, byte_range=None):
+        """读取文件内容，byte_range为 (起始, 结束) 闭区间"""
+        try:
+            with open(self.path_for(key), 'rb') as f:
+                if not byte_range:
+                    return f.read()
+                f.seek(byte_range[0])
+                return f.read(byte_range[1] - byte_range[0] + 1)
+        except (OSError, ValueError) as e:
+            logging.error(f"读取文件失败: {str(e)}")
+            return None
+
+    def delete(self, key):
+        """删除文件（文件不存在视为成功，与OSS一致）"""
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            error_msg = f"删除文件失败: {str(e)}"
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+        return {
+            'success': True,
+            'message': '删除成功'
+        }
+
+    def delete_many(self, keys):
+        """批量删除文件"""
+        deleted = []
+        failed = []
+        for key in keys:
+            if self.delete(key)['success']:
+                deleted.append(key)
+            else:
+                failed.append(key)
+
+        return {
+            'success': not failed,
+            'deleted': deleted,
+            'failed': failed,
+            'message': '删除成功' if not failed else f'{len(failed)}个文件删除失败'
+        }
+
+    def head(self, key):
+        """获取文件元信息（ETag由修改时间和大小生成，不读取文件内容）"""
+        try:
+            stat = os.stat(self.path_for(key))
+        except (OSError, ValueError) as e:
+            error_msg = f"获取文件信息失败: {str(e)}"
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+        return {
+            'success': True,
+            'size': stat.st_size,
+            'content_type': mimetypes.guess_type(key)[0] or 'application/octet-stream',
+            'etag': f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            'message': '获取成功'
+        }
+
+    def url_for(self, key):
+        """获取文件访问URL"""
+        return f"{self.base_url}/{key}"
+
+    def url_prefixes(self):
+        """文件URL前缀（相对地址时匹配任意主机）"""
+        return [f"{self.base_url}/"]
+
+    def iter_objects(self, prefix='', page_size=1000):
+        """分页列出存储目录下的文件（跳过写入中的临时文件）"""
+        page = []
+        for directory, dirs, files in os.walk(self.root):
+            dirs.sort()
+            for name in sorted(files):
+                if name.startswith('.upload-'):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                page.append({
+                    'key': key,
+                    'size': stat.st_size,
+                    'last_modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                })
+                if len(page) >= page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+    def presign(self, key, content_type, expires_seconds=900):
+        """生成直传地址（由本应用的PUT接口校验签名后写入）"""
+        expires = int(time.time()) + expires_seconds
+        query = urlencode({
+            'expires': expires,
+            'signature': self._sign(key, content_type, expires)
+        })
+
+        return {
+            'success': True,
+            'url': f"{self.url_for(key)}?{query}",
+            'method': 'PUT',
+            'expiration': datetime.fromtimestamp(expires, timezone.utc).isoformat(),
+            'signed_headers': {'Content-Type': content_type},
+            'message': '签名成功'
+        }
+
+    def verify_signature(self, key, content_type, expires, signature):
+        """校验直传地址的签名和有效期"""
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._sign(key, content_type, expires), signature or '')
+
+    def send(self, key):
+        """
+        返回文件下载响应
+
+        Returns:
+            Response: 文件不存在时返回None
+        """
+        try:
+            path = self.path_for(key)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        mimetype = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        if self.accel_prefix:
+            # 由Nginx直接发送文件，应用只返回响应头
+            response = Response(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = f"{self.accel_prefix}/{key}"
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+            return response
+
+        return send_file(path, mimetype=mimetype, conditional=True, max_age=self.max_age)
+
+    def submit(self, fn, *args, **kwargs):
+        """提交并发传输任务，返回Future"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='storage-transfer'
+                    )
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def get_metrics(self):
+        """获取传输统计信息"""
+        with self._lock:
+            return {
+                'backend': self.name,
+                'totals': dict(self._totals),
+                'recent': list(self._recent)
+            }
+
+    def _sign(self, key, content_type, expires):
+        message = f"PUT\n{key}\n{content_type}\n{expires}".encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def _write(self, key, chunks):
+        """写入临时文件后原子替换，返回传输结果"""
+        started = time.monotonic()
+        size = 0
+        tmp_path = None
+        error_msg = None
+        digest = hashlib.md5()
+        try:
+            path = self.path_for(key)
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except Exception as e:
+            error_msg = f'上传失败: {str(e)}'
+        finally:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        # 指标会通过运行指标接口对外展示，不记录对象key
+        metrics = {
+            'mode': 'local',
+            'bytes': size,
+            'parts': 1,
+            'retries': 0,
+            'latency_ms': int((time.monotonic() - started) * 1000),
+            'success': error_msg is None
+        }
+        with self._lock:
+            self._recent.append(metrics)
+            self._totals['transfers'] += 1
+            self._totals['latency_ms'] += metrics['latency_ms']
+            if error_msg:
+                self._totals['failed'] += 1
+            else:
+                self._totals['bytes'] += size
+                self._totals['parts'] += 1
+
+        if error_msg:
+            logging.error(f"写入文件失败: {key}, {error_msg}")
+            return {
+                'success': False,
+                'message': error_msg,
+                'metrics': metrics
+            }
+
+        return {
+            'success': True,
+            'etag': f'"{digest.hexdigest()}"',
+            'request_id': None,
+            'metrics': metrics
+        }
@@ -1,16 +1,18 @@
 import alibabacloud_oss_v2 as oss
-import base64
-import uuid
 import os
-from datetime import datetime
-from PIL import Image
-from io import BytesIO
-import tempfile
+from datetime import timedelta
 import logging
 
+from app.utils.oss_transfer import OSSTransferManager
+from app.utils.storage_backend import StorageBackend
 
-class OSSService:
-    """阿里云OSS存储服务类 - 独立版本"""
+
+class OSSService(StorageBackend):
+    """阿里云OSS存储后端"""
+
+    name = 'oss'
+    # 单次批量删除的最大文件数（OSS限制）
+    DELETE_BATCH_SIZE = 1000
 
     def __init__(self):
         self.client = None
@@ -19,6 +21,7 @@ class OSSService:
         self.endpoint = None
         self._initialized = True
         self._init_client()
+        self.transfer_manager = OSSTransferManager(self)
 
     def _init_client(self):
         """初始化OSS客户端"""
@@ -62,6 +65,14 @@ class OSSService:
             if self.endpoint:
                 cfg.endpoint = self.endpoint
 
+            # 连接池与超时配置（多线程并发上传共用同一个连接池）
+            cfg.retry_max_attempts = int(os.getenv('OSS_RETRY_MAX_ATTEMPTS', 3))
+            cfg.http_client = oss.transport.RequestsHttpClient(
+                max_connections=int(os.getenv('OSS_MAX_CONNECTIONS', 50)),
+                connect_timeout=float(os.getenv('OSS_CONNECT_TIMEOUT', 10)),
+                readwrite_timeout=float(os.getenv('OSS_READWRITE_TIMEOUT', 60))
+            )
+
             # 创建OSS客户端
             self.client = oss.Client(cfg)
 
@@ -77,118 +88,51 @@ class OSSService:
         """检查OSS服务是否可用"""
         return self._initialized and self.client is not None
 
-    def upload_base64_image(self, base64_data, user_id, folder='ai-images'):
-        """
-        上传base64图片到OSS
-
-        Args:
-            base64_data: base64编码的图片数据
-            user_id: 用户ID
-            folder: 存储文件夹
+    def put(self, key, data, content_type=None):
+        """上传内存数据（大文件自动分片并行上传）"""
+        if not self.is_available():
+            return self._unavailable()
+        return self.transfer_manager.upload_bytes(key, data, content_type=content_type)
 
-        Returns:
-            dict: 上传结果
-        """
+    def put_stream(self, key, body, content_length=None, content_type=None):
+        """上传数据流（超过阈值时按分片读取并并行上传）"""
         if not self.is_available():
-            return {
-                'success': False,
-                'message': 'OSS服务不可用，请检查配置'
-            }
+            return self._unavailable()
+        return self.transfer_manager.upload_stream(
+            key,
+            body,
+            content_length=content_length,
+            content_type=content_type
+        )
+
+    def get(self, key, byte_range=None):
+        """读取文件内容，byte_range为 (起始, 结束) 闭区间"""
+        if not self.is_available():
+            return None
 
         try:
-            print(f"开始上传图片，用户ID: {user_id}")
-
-            # 解码base64数据
-            if base64_data.startswith('data:image'):
-                # 移除data:image/...;base64,前缀
-                base64_data = base64_data.split(',')[1]
-
-            image_bytes = base64.b64decode(base64_data)
-            print(f"图片解码成功，大小: {len(image_bytes)} bytes")
-
-            # 生成文件名
-            filename = self._generate_filename(user_id, folder)
-            print(f"生成文件名: {filename}")
-
-            # 获取图片信息
-            image_info = self._get_image_info(image_bytes)
-            print(f"图片信息: {image_info}")
-
-            # 创建临时文件
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                temp_file.write(image_bytes)
-                temp_file_path = temp_file.name
-
-            print(f"创建临时文件: {temp_file_path}")
-
-            try:
-                # 上传到OSS
-                request = oss.PutObjectRequest(
-                    bucket=self.bucket_name,
-                    key=filename
-                )
+            request = oss.GetObjectRequest(
+                bucket=self.bucket_name,
+                key=key,
+                range_header=f'bytes={byte_range[0]}-{byte_range[1]}' if byte_range else None
+            )
 
-                print(f"开始上传到OSS，bucket: {self.bucket_name}, key: {filename}")
-                result = self.client.put_object_from_file(request, temp_file_path)
-                print(f"OSS上传完成，状态码: {result.status_code}")
-
-                if result.status_code == 200:
-                    # 构建访问URL
-                    file_url = self._get_file_url(filename)
-                    print(f"上传成功，文件URL: {file_url}")
-
-                    return {
-                        'success': True,
-                        'url': file_url,
-                        'filename': filename,
-                        'size': len(image_bytes),
-                        'width': image_info.get('width'),
-                        'height': image_info.get('height'),
-                        'format': image_info.get('format'),
-                        'etag': result.etag,
-                        'request_id': result.request_id,
-                        'message': '上传成功'
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'message': f'上传失败，状态码: {result.status_code}'
-                    }
-            finally:
-                # 清理临时文件
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    print(f"清理临时文件: {temp_file_path}")
+            result = self.client.get_object(request)
+            return result.body.content
 
         except Exception as e:
-            error_msg = f"上传图片失败: {str(e)}"
-            print(error_msg)
-            logging.error(error_msg)
-            return {
-                'success': False,
-                'message': error_msg
-            }
+            logging.error(f"读取文件失败: {str(e)}")
+            return None
 
-    def delete_file(self, filename):
-        """
-        删除OSS文件
-
-        Args:
-            filename: 文件名（OSS中的key）
-
-        Returns:
-            dict: 删除结果
-        """
+    def delete(self, key):
+        """删除OSS文件"""
         if not self.is_available():
-            return {
-                'success': False,
-                'message': 'OSS服务不可用，请检查配置'
-            }
+            return self._unavailable()
 
         try:
             request = oss.DeleteObjectRequest(
                 bucket=self.bucket_name,
-                key=filename
+                key=key
             )
 
             result = self.client.delete_object(request)
@@ -215,55 +159,124 @@ class OSSService:
                 'message': error_msg
             }
 
-    def file_exists(self, filename):
-        """
-        检查文件是否存在
-
-        Args:
-            filename: 文件名
+    def delete_many(self, keys):
+        """批量删除OSS文件（每批最多1000个）"""
+        if not self.is_available():
+            return dict(self._unavailable(), deleted=[], failed=list(keys))
 
-        Returns:
-            bool: 文件是否存在
-        """
+        deleted = []
+        failed = []
+        keys = list(keys)
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            batch = keys[start:start + self.DELETE_BATCH_SIZE]
+            try:
+                request = oss.DeleteMultipleObjectsRequest(
+                    bucket=self.bucket_name,
+                    objects=[oss.DeleteObject(key=key) for key in batch],
+                    quiet=False
+                )
+                result = self.client.delete_multiple_objects(request)
+                batch_deleted = {info.key for info in (result.deleted_objects or [])}
+                deleted.extend(key for key in batch if key in batch_deleted)
+                failed.extend(key for key in batch if key not in batch_deleted)
+            except Exception as e:
+                logging.error(f"批量删除文件失败: {str(e)}")
+                failed.extend(batch)
+
+        return {
+            'success': not failed,
+            'deleted': deleted,
+            'failed': failed,
+            'message': '删除成功' if not failed else f'{len(failed)}个文件删除失败'
+        }
+
+    def head(self, key):
+        """获取OSS文件元信息"""
         if not self.is_available():
-            return False
+            return self._unavailable()
 
         try:
             request = oss.HeadObjectRequest(
                 bucket=self.bucket_name,
-                key=filename
+                key=key
             )
 
             result = self.client.head_object(request)
-            return result.status_code == 200
+
+            return {
+                'success': True,
+                'size': result.content_length,
+                'content_type': result.content_type,
+                'etag': result.etag,
+                'message': '获取成功'
+            }
 
         except Exception as e:
-            logging.error(f"检查文件存在性失败: {str(e)}")
-            return False
-
-    def _generate_filename(self, user_id, folder, original_filename=None):
-        """生成唯一文件名"""
-        # 生成时间戳路径
-        now = datetime.now()
-        date_path = now.strftime('%Y/%m/%d')
-
-        # 生成唯一ID
-        unique_id = str(uuid.uuid4())
-
-        if original_filename:
-            # 保留原始文件扩展名
-            _, ext = os.path.splitext(original_filename)
-            filename = f"{unique_id}{ext}"
-        else:
-            # 默认为PNG格式
-            filename = f"{unique_id}.png"
+            error_msg = f"获取文件信息失败: {str(e)}"
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
 
-        # 构建完整路径: folder/user_id/date/filename
-        full_path = f"{folder}/user_{user_id}/{date_path}/{filename}"
+    def iter_objects(self, prefix='', page_size=1000):
+        """分页列出OSS文件（ListObjectsV2）"""
+        if not self.is_available():
+            return
+
+        paginator = self.client.list_objects_v2_paginator()
+        request = oss.ListObjectsV2Request(
+            bucket=self.bucket_name,
+            prefix=prefix,
+            max_keys=page_size
+        )
+        for page in paginator.iter_page(request):
+            yield [{
+                'key': item.key,
+                'size': item.size,
+                'last_modified': item.last_modified
+            } for item in (page.contents or [])]
+
+    def presign(self, key, content_type, expires_seconds=900):
+        """生成直传OSS的预签名PUT地址"""
+        if not self.is_available():
+            return self._unavailable()
 
-        return full_path
+        try:
+            request = oss.PutObjectRequest(
+                bucket=self.bucket_name,
+                key=key,
+                content_type=content_type
+            )
+
+            result = self.client.presign(request, expires=timedelta(seconds=expires_seconds))
+
+            return {
+                'success': True,
+                'url': result.url,
+                'method': result.method,
+                'expiration': result.expiration.isoformat() if result.expiration else None,
+                'signed_headers': dict(result.signed_headers or {}),
+                'message': '签名成功'
+            }
 
-    def _get_file_url(self, filename):
+        except Exception as e:
+            error_msg = f"生成预签名地址失败: {str(e)}"
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+    def submit(self, fn, *args, **kwargs):
+        """提交并发传输任务（OSS传输线程池）"""
+        return self.transfer_manager.submit(fn, *args, **kwargs)
+
+    def get_metrics(self):
+        """获取OSS传输统计信息"""
+        return dict(self.transfer_manager.get_metrics(), backend=self.name)
+
+    def url_for(self, filename):
         """获取文件访问URL"""
         # 获取并验证自定义域名
         custom_domain = os.getenv('OSS_CUSTOM_DOMAIN', '').strip()
@@ -292,20 +305,14 @@ class OSSService:
             print(f"使用默认OSS域名: {default_url}")
             return default_url
 
-    def _get_image_info(self, image_bytes):
-        """获取图片信息"""
-        try:
-            with Image.open(BytesIO(image_bytes)) as img:
-                return {
-                    'width': img.width,
-                    'height': img.height,
-                    'format': img.format,
-                    'mode': img.mode
-                }
-        except Exception as e:
-            logging.warning(f"获取图片信息失败: {str(e)}")
-            return {}
-
-
-# 创建全局实例 - 自动初始化
-oss_service = OSSService()
+    def url_prefixes(self):
+        """本bucket文件的URL前缀：自定义域名、endpoint域名和默认区域域名"""
+        prefixes = []
+        custom_domain = os.getenv('OSS_CUSTOM_DOMAIN', '').strip()
+        if custom_domain and custom_domain.lower() not in ['null', 'none', 'undefined']:
+            prefixes.append(f"https://{custom_domain.split('://', 1)[-1]}/")
+        if self.bucket_name:
+            if self.endpoint:
+                prefixes.append(f"https://{self.bucket_name}.{self.endpoint.split('://', 1)[-1]}/")
+            prefixes.append(f"https://{self.bucket_name}.oss-{self.region}.aliyuncs.com/")
+        return prefixes
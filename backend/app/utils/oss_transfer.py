@@ -0,0 +1,226 @@
+import base64
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, RawIOBase
+
+import alibabacloud_oss_v2 as oss
+
+
+class IterReader(RawIOBase):
+    """把数据块迭代器包装成只读file-like对象，供分片上传按需读取"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class OSSTransferManager:
+    """
+    OSS传输管理器 - 构建在OSSService之上
+
+    小文件直接put_object；超过阈值的文件使用分片上传并行发送分片。另外提供
+    线程池用于多个文件并发上传，并记录每次传输的字节数、分片数、重试次数和耗时。
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.multipart_threshold = int(os.getenv('OSS_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+        self.part_size = int(os.getenv('OSS_PART_SIZE', 2 * 1024 * 1024))
+        self.parallel_num = int(os.getenv('OSS_UPLOAD_PARALLEL', 4))
+        self.max_workers = int(os.getenv('OSS_TRANSFER_WORKERS', 8))
+        self.max_retries = int(os.getenv('OSS_TRANSFER_RETRIES', 2))
+        self._executor = None
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=100)
+        self._totals = {
+            'transfers': 0,
+            'failed': 0,
+            'bytes': 0,
+            'parts': 0,
+            'retries': 0,
+            'latency_ms': 0
+        }
+
+    @property
+    def executor(self):
+        """并发上传使用的线程池（首次使用时创建）"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='oss-transfer'
+                    )
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """提交并发传输任务，返回Future"""
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def upload_bytes(self, filename, data, content_type=None):
+        """
+        上传内存中的数据
+
+        Returns:
+            dict: 传输结果（含etag、request_id和metrics）
+        """
+        size = len(data)
+        if size < self.multipart_threshold:
+            content_md5 = base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+            def put():
+                request = oss.PutObjectRequest(
+                    bucket=self.service.bucket_name,
+                    key=filename,
+                    content_length=size,
+                    content_md5=content_md5,
+                    content_type=content_type,
+                    body=data
+                )
+                return self.service.client.put_object(request)
+
+            result = self._run(filename, size, 1, 'put', put)
+            if result['success']:
+                result['content_md5'] = content_md5
+            return result
+
+        def multipart():
+            request = oss.PutObjectRequest(
+                bucket=self.service.bucket_name,
+                key=filename,
+                content_type=content_type
+            )
+            uploader = self.service.client.uploader(
+                part_size=self.part_size,
+                parallel_num=self.parallel_num
+            )
+            return uploader.upload_from(request, BytesIO(data))
+
+        return self._run(filename, size, self._count_parts(size), 'multipart', multipart)
+
+    def upload_stream(self, filename, body, content_length=None, content_type=None):
+        """
+        上传数据流（可迭代的数据块或file-like对象，只能读取一次，不重试）
+
+        超过阈值时按分片读取并并行上传，内存占用为 分片大小 x 并发数。
+        """
+        if content_length is not None and content_length < self.multipart_threshold:
+            def put():
+                request = oss.PutObjectRequest(
+                    bucket=self.service.bucket_name,
+                    key=filename,
+                    content_length=content_length,
+                    content_type=content_type,
+                    body=body
+                )
+                return self.service.client.put_object(request)
+
+            return self._run(filename, content_length, 1, 'put', put, retryable=False)
+
+        reader = body if hasattr(body, 'read') else IterReader(body)
+
+        def multipart():
+            request = oss.PutObjectRequest(
+                bucket=self.service.bucket_name,
+                key=filename,
+                content_type=content_type
+            )
+            uploader = self.service.client.uploader(
+                part_size=self.part_size,
+                parallel_num=self.parallel_num
+            )
+            return uploader.upload_from(request, reader)
+
+        parts = self._count_parts(content_length) if content_length else 0
+        return self._run(filename, content_length or 0, parts, 'multipart', multipart, retryable=False)
+
+    def get_metrics(self):
+        """获取传输统计信息"""
+        with self._lock:
+            return {
+                'totals': dict(self._totals),
+                'recent': list(self._recent)
+            }
+
+    def _count_parts(self, size):
+        return max(1, math.ceil(size / self.part_size))
+
+    def _run(self, filename, size, parts, mode, operation, retryable=True):
+        """执行传输并记录指标，失败时按配置重试"""
+        started = time.monotonic()
+        attempts = 0
+        error_msg = None
+        result = None
+
+        while True:
+            attempts += 1
+            try:
+                result = operation()
+                if result.status_code == 200:
+                    error_msg = None
+                    break
+                error_msg = f'上传失败，状态码: {result.status_code}'
+            except Exception as e:
+                error_msg = f'上传失败: {str(e)}'
+
+            if not retryable or attempts > self.max_retries:
+                break
+            logging.warning(f"OSS传输重试({attempts}/{self.max_retries}): {filename}, {error_msg}")
+
+        # 指标会通过运行指标接口对外展示，不记录对象key
+        metrics = {
+            'mode': mode,
+            'bytes': size,
+            'parts': parts,
+            'retries': attempts - 1,
+            'latency_ms': int((time.monotonic() - started) * 1000),
+            'success': error_msg is None
+        }
+        self._record(metrics)
+
+        if error_msg:
+            return {
+                'success': False,
+                'message': error_msg,
+                'metrics': metrics
+            }
+
+        return {
+            'success': True,
+            'etag': result.etag,
+            'request_id': result.request_id,
+            'metrics': metrics
+        }
+
+    def _record(self, metrics):
+        with self._lock:
+            self._recent.append(metrics)
+            self._totals['transfers'] += 1
+            self._totals['retries'] += metrics['retries']
+            self._totals['latency_ms'] += metrics['latency_ms']
+            if metrics['success']:
+                self._totals['bytes'] += metrics['bytes']
+                self._totals['parts'] += metrics['parts']
+            else:
+                self._totals['failed'] += 1
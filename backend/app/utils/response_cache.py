@@ -0,0 +1,224 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalCacheBackend:
+    """进程内缓存 - LRU淘汰 + TTL过期，代数计数器单独保存不参与淘汰"""
+
+    name = 'local'
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, name):
+        with self._lock:
+            return self._generations.get(name, 0)
+
+    def incr_generation(self, name):
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            return self._generations[name]
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Redis共享缓存 - 多进程/多实例部署时共用缓存和代数计数器"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='rc:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+
+    def get_generation(self, name):
+        value = self.client.get(f'{self.prefix}gen:{name}')
+        return int(value) if value is not None else 0
+
+    def incr_generation(self, name):
+        return self.client.incr(f'{self.prefix}gen:{name}')
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    """
+    按用户缓存接口响应数据
+
+    缓存key由 用户ID + 该用户的代数 + 接口 + 查询参数 组成。用户的图片有
+    任何变更时代数加一，旧key自然失效（随TTL或LRU清除）。默认使用进程内
+    缓存，配置RESPONSE_CACHE_REDIS_URL后使用Redis，多个进程共享缓存和代数。
+    仅使用进程内缓存时，其他进程中的旧数据最多保留TTL时长。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.ttl = 60
+        self.backend = LocalCacheBackend()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'errors': 0
+        }
+
+    def init_app(self, app):
+        """读取配置，选择缓存后端并注册图片记录变更的监听"""
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', True)
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+
+        redis_url = app.config.get('RESPONSE_CACHE_REDIS_URL')
+        if redis_url:
+            try:
+                self.backend = RedisCacheBackend(redis_url)
+            except ImportError:
+                logging.warning("未安装redis，响应缓存使用进程内缓存")
+                self.backend = LocalCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+        else:
+            self.backend = LocalCacheBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 10000))
+
+        _register_invalidation_listeners(self)
+
+    def get_or_load(self, user_id, kind, params, loader):
+        """
+        读取缓存，未命中时调用loader加载并写入缓存
+
+        Args:
+            user_id: 用户ID
+            kind: 接口名，如 list/detail
+            params: 影响响应内容的查询参数（可转为字符串的元组）
+            loader: 加载函数，返回None时不缓存
+
+        Returns:
+            loader的返回值（可能来自缓存，调用方不应修改）
+        """
+        if not self.enabled:
+            return loader()
+
+        try:
+            # 加载前确定代数，加载期间发生的变更会使本次写入的缓存直接失效
+            generation = self.backend.get_generation(str(user_id))
+            key = f"{user_id}:{generation}:{kind}:{'|'.join(str(param) for param in params)}"
+            value = self.backend.get(key)
+        except Exception as e:
+            logging.error(f"读取响应缓存失败: {str(e)}")
+            self._count('errors')
+            return loader()
+
+        if value is not None:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+        value = loader()
+        if value is not None:
+            try:
+                self.backend.set(key, value, self.ttl)
+            except Exception as e:
+                logging.error(f"写入响应缓存失败: {str(e)}")
+                self._count('errors')
+        return value
+
+    def invalidate(self, user_id):
+        """使用户的全部缓存失效"""
+        if not self.enabled:
+            return
+        try:
+            self.backend.incr_generation(str(user_id))
+            self._count('invalidations')
+        except Exception as e:
+            logging.error(f"清除响应缓存失败: {str(e)}")
+            self._count('errors')
+
+    def get_metrics(self):
+        """获取缓存统计信息"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_rate'] = round(metrics['hits'] / lookups, 4) if lookups else 0
+        metrics['backend'] = self.backend.name
+        metrics['size'] = self.backend.size()
+        metrics['enabled'] = self.enabled
+        return metrics
+
+    def _count(self, name):
+        with self._lock:
+            self._metrics[name] += 1
+
+
+_listeners_registered = False
+
+
+def _register_invalidation_listeners(cache):
+    """
+    flush时记录有图片记录变更的用户，事务提交后使其缓存失效
+
+    覆盖接口、后台上传队列和派生图任务等所有通过ORM修改图片记录的地方；
+    绕过ORM的批量UPDATE需由调用方自行调用invalidate。
+    """
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    _listeners_registered = True
+
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    from app.models.image_records import ImageRecord
+
+    @event.listens_for(Session, 'before_flush')
+    def collect_changed_users(session, flush_context, instances):
+        changed = session.info.setdefault('response_cache_users', set())
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(instance, ImageRecord) and instance.user_id is not None:
+                changed.add(instance.user_id)
+
+    @event.listens_for(Session, 'after_commit')
+    def invalidate_changed_users(session):
+        for user_id in session.info.pop('response_cache_users', ()):
+            cache.invalidate(user_id)
+
+    @event.listens_for(Session, 'after_rollback')
+    def discard_changed_users(session):
+        session.info.pop('response_cache_users', None)
+
+
+# 创建全局实例 - 在create_app中初始化
+response_cache = ResponseCache()
@@ -0,0 +1,24 @@
+import os
+
+
+def create_storage_backend(backend=None):
+    """
+    按配置创建存储后端
+
+    Args:
+        backend: oss（默认）/local，为空时读取STORAGE_BACKEND环境变量
+
+    Returns:
+        StorageBackend: 存储后端实例
+    """
+    backend = (backend or os.getenv('STORAGE_BACKEND', 'oss')).lower()
+    if backend == 'local':
+        from app.utils.local_storage import LocalStorageBackend
+        return LocalStorageBackend()
+
+    from app.utils.oss_service import OSSService
+    return OSSService()
+
+
+# 创建全局实例 - 自动初始化
+file_storage = create_storage_backend()
@@ -0,0 +1,485 @@
+import base64
+import uuid
+import os
+from datetime import datetime
+import logging
+from urllib.parse import unquote, urlsplit
+
+from app.utils.file_cache import image_file_cache
+from app.utils.image_ingest import get_image_info
+from app.utils.image_transcode import transcode_image
+
+
+class StorageBackend:
+    """
+    存储后端基类
+
+    子类实现底层对象操作：put、put_stream、get、delete、delete_many、head、
+    url_for、url_prefixes、iter_objects、presign、submit和get_metrics；图片上传、
+    文件名生成等业务方法基于这些操作实现，所有后端共用。
+    """
+
+    name = None
+
+    def is_available(self):
+        """检查存储服务是否可用"""
+        raise NotImplementedError
+
+    def put(self, key, data, content_type=None):
+        """
+        上传内存数据
+
+        Returns:
+            dict: success、etag、request_id、metrics，失败时为success和message
+        """
+        raise NotImplementedError
+
+    def put_stream(self, key, body, content_length=None, content_type=None):
+        """上传数据流（可迭代的数据块或file-like对象，只能读取一次）"""
+        raise NotImplementedError
+
+    def get(self, key, byte_range=None):
+        """
+        读取文件内容
+
+        Args:
+            key: 文件名
+            byte_range: (起始, 结束) 闭区间，为空时读取全部
+
+        Returns:
+            bytes: 文件内容，失败时返回None
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """删除单个文件，返回删除结果"""
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        """
+        批量删除文件
+
+        Returns:
+            dict: success、deleted（已删除的key）、failed（删除失败的key）
+        """
+        raise NotImplementedError
+
+    def head(self, key):
+        """获取文件元信息：size、content_type、etag"""
+        raise NotImplementedError
+
+    def url_for(self, key):
+        """获取文件访问URL"""
+        raise NotImplementedError
+
+    def url_prefixes(self):
+        """本存储文件可能使用的URL前缀列表（用于把URL还原为key）"""
+        raise NotImplementedError
+
+    def iter_objects(self, prefix='', page_size=1000):
+        """
+        按key顺序分页列出文件
+
+        Yields:
+            list: 一页文件信息，每项为 {key, size, last_modified}（last_modified为UTC时间）
+        """
+        raise NotImplementedError
+
+    def presign(self, key, content_type, expires_seconds=900):
+        """生成直传上传地址：url、method、expiration、signed_headers"""
+        raise NotImplementedError
+
+    def submit(self, fn, *args, **kwargs):
+        """提交并发传输任务，返回Future"""
+        raise NotImplementedError
+
+    def get_metrics(self):
+        """获取传输统计信息"""
+        raise NotImplementedError
+
+    def _unavailable(self):
+        return {
+            'success': False,
+            'message': '存储服务不可用，请检查配置'
+        }
+
+    def upload_base64_image(self, base64_data, user_id, folder='ai-images'):
+        """
+        上传base64图片
+
+        Args:
+            base64_data: base64编码的图片数据
+            user_id: 用户ID
+            folder: 存储文件夹
+
+        Returns:
+            dict: 上传结果
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        try:
+            print(f"开始上传图片，用户ID: {user_id}")
+
+            # 解码base64数据
+            if base64_data.startswith('data:image'):
+                # 移除data:image/...;base64,前缀
+                base64_data = base64_data.split(',')[1]
+
+            image_bytes = base64.b64decode(base64_data)
+            print(f"图片解码成功，大小: {len(image_bytes)} bytes")
+
+        except Exception as e:
+            error_msg = f"上传图片失败: {str(e)}"
+            print(error_msg)
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+        return self.upload_image_bytes(image_bytes, user_id, folder)
+
+    def upload_image_bytes(self, image_bytes, user_id, folder='ai-images', image_info=None,
+                           transcode_policy=None, transcode_quality=85):
+        """
+        上传已解码的图片数据
+
+        Args:
+            image_bytes: 图片字节数据（bytes或memoryview）
+            user_id: 用户ID
+            folder: 存储文件夹
+            image_info: 已获取的图片信息，为空时自动读取
+            transcode_policy: 存储转码策略（original/webp_lossless/webp/avif），为空时保留原图
+            transcode_quality: 有损转码质量
+
+        Returns:
+            dict: 上传结果
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        try:
+            # 获取图片信息
+            if image_info is None:
+                image_info = self._get_image_info(image_bytes)
+            print(f"图片信息: {image_info}")
+
+            if not isinstance(image_bytes, bytes):
+                image_bytes = bytes(image_bytes)
+
+            # 按存储策略转码，扩展名和Content-Type以实际存储格式为准
+            transcoded = transcode_image(
+                image_bytes,
+                image_info,
+                policy=transcode_policy or 'original',
+                quality=transcode_quality
+            )
+            stored_bytes = transcoded['data']
+
+            # 生成文件名
+            filename = self._generate_filename(user_id, folder, extension=transcoded['extension'])
+            print(f"生成文件名: {filename}")
+
+            print(f"开始上传，存储后端: {self.name}, key: {filename}")
+            result = self.put(filename, stored_bytes, content_type=transcoded['content_type'])
+            print(f"上传完成: {result.get('metrics')}")
+
+            if result['success']:
+                # 刚保存的图片很可能马上被读取（修改此图、生成派生图），写入本地缓存
+                image_file_cache.put(filename, stored_bytes)
+
+                # 构建访问URL
+                file_url = self.url_for(filename)
+                print(f"上传成功，文件URL: {file_url}")
+
+                return {
+                    'success': True,
+                    'url': file_url,
+                    'filename': filename,
+                    'size': len(stored_bytes),
+                    'original_size': len(image_bytes),
+                    'width': image_info.get('width'),
+                    'height': image_info.get('height'),
+                    'format': transcoded['format'],
+                    'content_type': transcoded['content_type'],
+                    'etag': result['etag'],
+                    'content_md5': result.get('content_md5'),
+                    'request_id': result.get('request_id'),
+                    'metrics': result.get('metrics'),
+                    'message': '上传成功'
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': result['message']
+                }
+
+        except Exception as e:
+            error_msg = f"上传图片失败: {str(e)}"
+            print(error_msg)
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+    def upload_image_stream(self, body, user_id, folder='ai-images', content_length=None,
+                            extension='.png', content_type=None):
+        """
+        流式上传图片（不经过临时文件，也不在内存中保留整张图片）
+
+        Args:
+            body: 可迭代的数据块或file-like对象
+            user_id: 用户ID
+            folder: 存储文件夹
+            content_length: 数据长度，已知时随请求发送
+            extension: 文件扩展名
+            content_type: 文件类型
+
+        Returns:
+            dict: 上传结果（size为声明长度，实际大小由调用方统计）
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        try:
+            filename = self._generate_filename(user_id, folder, extension=extension)
+
+            print(f"开始流式上传，存储后端: {self.name}, key: {filename}")
+            result = self.put_stream(
+                filename,
+                body,
+                content_length=content_length,
+                content_type=content_type
+            )
+            print(f"上传完成: {result.get('metrics')}")
+
+            if result['success']:
+                return {
+                    'success': True,
+                    'url': self.url_for(filename),
+                    'filename': filename,
+                    'size': content_length,
+                    'etag': result['etag'],
+                    'request_id': result.get('request_id'),
+                    'metrics': result.get('metrics'),
+                    'message': '上传成功'
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': result['message']
+                }
+
+        except Exception as e:
+            error_msg = f"上传图片失败: {str(e)}"
+            print(error_msg)
+            logging.error(error_msg)
+            return {
+                'success': False,
+                'message': error_msg
+            }
+
+    def put_bytes(self, filename, data, content_type=None):
+        """
+        把内存数据上传到指定的key（用于缩略图等派生文件）
+
+        Args:
+            filename: 文件名（存储中的key）
+            data: 字节数据
+            content_type: 文件类型
+
+        Returns:
+            dict: 上传结果
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        result = self.put(filename, data, content_type=content_type)
+        if not result['success']:
+            logging.error(f"上传文件失败: {filename}, {result['message']}")
+            return result
+
+        return {
+            'success': True,
+            'url': self.url_for(filename),
+            'filename': filename,
+            'size': len(data),
+            'etag': result['etag'],
+            'message': '上传成功'
+        }
+
+    def delete_file(self, filename):
+        """
+        删除文件
+
+        Args:
+            filename: 文件名（存储中的key）
+
+        Returns:
+            dict: 删除结果
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        return self.delete(filename)
+
+    def delete_files(self, filenames):
+        """
+        批量删除文件（忽略空文件名）
+
+        Returns:
+            dict: 删除结果
+        """
+        filenames = [filename for filename in filenames if filename]
+        if not filenames:
+            return {'success': True, 'deleted': [], 'failed': []}
+        if not self.is_available():
+            return dict(self._unavailable(), deleted=[], failed=filenames)
+
+        return self.delete_many(filenames)
+
+    def file_exists(self, filename):
+        """
+        检查文件是否存在
+
+        Args:
+            filename: 文件名
+
+        Returns:
+            bool: 文件是否存在
+        """
+        if not self.is_available():
+            return False
+
+        return self.head(filename)['success']
+
+    def presign_upload(self, user_id, content_type, folder='ai-images', extension='.png',
+                       expires_seconds=900):
+        """
+        生成直传的预签名PUT地址
+
+        Args:
+            user_id: 用户ID
+            content_type: 上传时必须携带的Content-Type
+            folder: 存储文件夹
+            extension: 文件扩展名
+            expires_seconds: 有效期（秒）
+
+        Returns:
+            dict: 预签名结果（包含生成的文件名）
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        filename = self._generate_filename(user_id, folder, extension=extension)
+        result = self.presign(filename, content_type, expires_seconds)
+        if result['success']:
+            result['filename'] = filename
+        return result
+
+    def head_file(self, filename):
+        """
+        获取文件元信息
+
+        Args:
+            filename: 文件名
+
+        Returns:
+            dict: 文件大小、类型等信息
+        """
+        if not self.is_available():
+            return self._unavailable()
+
+        result = self.head(filename)
+        if result['success']:
+            result['url'] = self.url_for(filename)
+        return result
+
+    def read_file_head(self, filename, length=64 * 1024):
+        """
+        读取文件开头的若干字节（用于检查图片格式和尺寸）
+
+        Args:
+            filename: 文件名
+            length: 读取的字节数
+
+        Returns:
+            bytes: 文件开头数据，失败时返回None
+        """
+        if not self.is_available():
+            return None
+
+        return self.get(filename, byte_range=(0, length - 1))
+
+    def read_file(self, filename):
+        """
+        读取完整文件内容（优先读取本地缓存，未命中时从存储读取并写入缓存）
+
+        Args:
+            filename: 文件名
+
+        Returns:
+            bytes: 文件内容，失败时返回None
+        """
+        data = image_file_cache.get(filename)
+        if data is not None:
+            return data
+
+        if not self.is_available():
+            return None
+
+        data = self.get(filename)
+        if data is not None:
+            image_file_cache.put(filename, data)
+        return data
+
+    def key_for_url(self, url):
+        """
+        把本存储的文件URL还原为key
+
+        Args:
+            url: 文件URL（忽略协议和查询参数）
+
+        Returns:
+            str: 文件key，不是本存储的URL时返回None
+        """
+        parts = urlsplit(url)
+        for prefix in self.url_prefixes():
+            prefix_parts = urlsplit(prefix)
+            if prefix_parts.netloc and prefix_parts.netloc.lower() != parts.netloc.lower():
+                continue
+            if parts.path.startswith(prefix_parts.path):
+                key = unquote(parts.path[len(prefix_parts.path):])
+                if key and '..' not in key.split('/'):
+                    return key
+        return None
+
+    def _generate_filename(self, user_id, folder, original_filename=None, extension=None):
+        """生成唯一文件名"""
+        # 生成时间戳路径
+        now = datetime.now()
+        date_path = now.strftime('%Y/%m/%d')
+
+        # 生成唯一ID
+        unique_id = str(uuid.uuid4())
+
+        if extension:
+            filename = f"{unique_id}{extension}"
+        elif original_filename:
+            # 保留原始文件扩展名
+            _, ext = os.path.splitext(original_filename)
+            filename = f"{unique_id}{ext}"
+        else:
+            # 默认为PNG格式
+            filename = f"{unique_id}.png"
+
+        # 构建完整路径: folder/user_id/date/filename
+        full_path = f"{folder}/user_{user_id}/{date_path}/{filename}"
+
+        return full_path
+
+    def _get_image_info(self, image_bytes):
+        """获取图片信息"""
+        return get_image_info(image_bytes)
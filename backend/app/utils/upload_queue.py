@@ -0,0 +1,236 @@
+import atexit
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+
+class UploadTask:
+    """后台上传任务"""
+
+    __slots__ = ('image_id', 'user_id', 'image_bytes', 'image_info', 'folder', 'attempts')
+
+    def __init__(self, image_id, user_id, image_bytes, image_info=None, folder='ai-images'):
+        self.image_id = image_id
+        self.user_id = user_id
+        self.image_bytes = image_bytes
+        self.image_info = image_info
+        self.folder = folder
+        self.attempts = 0
+
+
+class UploadQueue:
+    """
+    异步上传队列 - 有界队列 + 固定数量的后台线程
+
+    图片记录先以pending状态写入数据库，由后台线程上传到OSS后
+    更新为ready或failed。队列满时拒绝新任务（背压），失败按指数退避
+    加随机抖动重试，进程退出时等待队列中的任务处理完毕。
+    """
+
+    _STOP = object()
+
+    def __init__(self):
+        self.app = None
+        self.max_workers = 4
+        self.max_retries = 3
+        self.retry_base_delay = 0.5
+        self._queue = None
+        self._workers = []
+        self._events = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._metrics = {
+            'submitted': 0,
+            'rejected': 0,
+            'completed': 0,
+            'failed': 0,
+            'retries': 0
+        }
+
+    def init_app(self, app):
+        """读取配置并注册退出时的清理函数"""
+        self.app = app
+        self.max_workers = app.config.get('ASYNC_UPLOAD_WORKERS', 4)
+        self.max_retries = app.config.get('ASYNC_UPLOAD_MAX_RETRIES', 3)
+        self._queue = queue.Queue(maxsize=app.config.get('ASYNC_UPLOAD_QUEUE_SIZE', 100))
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        """首次提交任务时再启动后台线程"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.max_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f'upload-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._started = True
+
+    def is_full(self):
+        """队列是否已满"""
+        return self._queue is None or self._queue.full()
+
+    def submit(self, task):
+        """提交上传任务，队列已满时返回False"""
+        if self._queue is None:
+            return False
+
+        self._ensure_started()
+        with self._lock:
+            self._events[task.image_id] = threading.Event()
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            with self._lock:
+                self._events.pop(task.image_id, None)
+                self._metrics['rejected'] += 1
+            return False
+
+        with self._lock:
+            self._metrics['submitted'] += 1
+        return True
+
+    def wait(self, image_id, timeout):
+        """等待指定图片上传结束（仅限本进程内的任务），返回是否已结束"""
+        with self._lock:
+            event = self._events.get(image_id)
+        if event is None:
+            return True
+        return event.wait(timeout)
+
+    def get_metrics(self):
+        """获取队列统计信息"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['queue_size'] = self._queue.qsize() if self._queue else 0
+        metrics['workers'] = len(self._workers)
+        return metrics
+
+    def shutdown(self, timeout=30):
+        """停止接收新任务并等待队列中已有任务处理完毕"""
+        if not self._started:
+            return
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            self._queue.put(self._STOP)
+        for worker in self._workers:
+            worker.join(max(0, deadline - time.monotonic()))
+        self._workers = []
+        self._started = False
+
+    def _worker_loop(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is self._STOP:
+                    return
+                with self.app.app_context():
+                    self._process(task)
+            except Exception as e:
+                logging.error(f"后台上传任务异常: {str(e)}")
+            finally:
+                if task is not self._STOP:
+                    with self._lock:
+                        event = self._events.pop(task.image_id, None)
+                    if event:
+                        event.set()
+                self._queue.task_done()
+
+    def _process(self, task):
+        from app.utils.storage import file_storage
+
+        upload_result = None
+        while True:
+            task.attempts += 1
+            upload_result = file_storage.upload_image_bytes(
+                image_bytes=task.image_bytes,
+                user_id=task.user_id,
+                folder=task.folder,
+                image_info=task.image_info,
+                transcode_policy=self.app.config.get('IMAGE_TRANSCODE_POLICY'),
+                transcode_quality=self.app.config.get('IMAGE_TRANSCODE_QUALITY', 85)
+            )
+            if upload_result['success'] or task.attempts > self.max_retries:
+                break
+
+            # 指数退避 + 随机抖动
+            delay = random.uniform(0, self.retry_base_delay * (2 ** task.attempts))
+            with self._lock:
+                self._metrics['retries'] += 1
+            logging.warning(f"图片 {task.image_id} 上传失败，{delay:.2f}s 后重试: {upload_result['message']}")
+            time.sleep(delay)
+
+        if upload_result['success']:
+            self._mark_ready(task, upload_result)
+        else:
+            self._mark_failed(task, upload_result['message'])
+
+        # 处理结束后释放图片数据
+        task.image_bytes = None
+
+    def _mark_ready(self, task, upload_result):
+        from app import db
+        from app.models.image_records import ImageRecord
+        from app.models.user_storage import adjust_storage_usage
+        from app.utils.image_derivatives import attach_derivatives
+        from app.utils.storage import file_storage
+
+        image_record = ImageRecord.query.filter_by(image_id=task.image_id).first()
+        if not image_record or image_record.deleted_at is not None:
+            # 上传期间记录已被删除，清理刚上传的文件
+            file_storage.delete_file(upload_result['filename'])
+            return
+
+        try:
+            image_record.image_url = upload_result['url']
+            image_record.image_filename = upload_result['filename']
+            image_record.status = 'ready'
+            # 保存时按解码后的大小占用了配额，按实际存储大小（转码后）修正
+            charged_size = image_record.image_size or 0
+            image_record.image_size = upload_result['size']
+            image_record.original_size = upload_result.get('original_size', upload_result['size'])
+            if upload_result['size'] != charged_size:
+                adjust_storage_usage(image_record.user_id, upload_result['size'] - charged_size)
+            # 已在后台线程中，派生图直接在此生成
+            if self.app.config.get('IMAGE_DERIVATIVES_MODE', 'async') != 'off':
+                attach_derivatives(image_record, task.image_bytes)
+            db.session.commit()
+            with self._lock:
+                self._metrics['completed'] += 1
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"更新图片状态失败: {str(e)}")
+            file_storage.delete_file(upload_result['filename'])
+            self._mark_failed(task, str(e))
+
+    def _mark_failed(self, task, message):
+        from app import db
+        from app.models.image_records import ImageRecord
+        from app.models.user_storage import update_storage_on_image_delete
+
+        logging.error(f"图片 {task.image_id} 后台上传失败: {message}")
+        with self._lock:
+            self._metrics['failed'] += 1
+
+        image_record = ImageRecord.query.filter_by(image_id=task.image_id).first()
+        if not image_record or image_record.deleted_at is not None:
+            return
+
+        try:
+            # 上传失败的记录直接标记删除并归还存储空间
+            image_record.status = 'failed'
+            image_record.deleted_at = datetime.utcnow()
+            update_storage_on_image_delete(image_record.user_id, image_record.image_size or 0)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"更新图片状态失败: {str(e)}")
+
+
+# 创建全局实例 - 在create_app中初始化
+upload_queue = UploadQueue()
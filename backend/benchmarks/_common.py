@@ -0,0 +1,42 @@
+import io
+import os
+import time
+import tracemalloc
+
+
+def make_image(width, height, fmt='PNG', **options):
+    """生成随机内容的图片（噪声图几乎无法压缩，接近真实的大图）"""
+    from PIL import Image
+
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def measure(fn, repeat):
+    """
+    运行fn若干次，返回 (每次CPU耗时ms, 每次墙钟耗时ms, 峰值内存MB)
+
+    峰值内存单独运行一次，用tracemalloc统计，不影响计时。
+    """
+    fn()  # 预热
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    cpu = (time.process_time() - cpu_started) * 1000 / repeat
+    wall = (time.perf_counter() - wall_started) * 1000 / repeat
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, wall, peak / 1024 / 1024
+
+
+def report(title, rows):
+    """输出对比表格：rows为 (名称, cpu_ms, wall_ms, peak_mb)，名称使用ASCII以便对齐"""
+    print(f"\n{title}")
+    print(f"{'':<32}{'CPU ms':>10}{'wall ms':>10}{'peak MB':>10}")
+    for name, cpu, wall, peak in rows:
+        print(f"{name:<32}{cpu:>10.2f}{wall:>10.2f}{peak:>10.1f}")
@@ -0,0 +1,50 @@
+"""
+图片保存请求的解码开销：旧流程（最多解码4次 + Pillow读取图片信息）与ImageIngest（只解码一次）对比
+
+运行：cd backend && python -m benchmarks.bench_ingest
+"""
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from app.utils.image_ingest import ImageIngest
+from benchmarks._common import make_image, measure, report
+
+
+def legacy_save(data_url):
+    """旧流程：校验、估算大小、上传、读取图片信息各自解码一次"""
+    base64_part = data_url.split(',', 1)[1]
+    decoded = base64.b64decode(base64_part)                      # _validate_base64_image
+    assert len(decoded) >= 100 and decoded[:8] == b'\x89PNG\r\n\x1a\n'
+    estimated_size = len(base64.b64decode(base64_part))           # 估算图片大小
+    image_bytes = base64.b64decode(base64_part)                   # upload_base64_image
+    with Image.open(BytesIO(base64.b64decode(base64_part))) as img:  # _get_image_info
+        info = (img.width, img.height, img.format)
+    return estimated_size, len(image_bytes), info
+
+
+def ingest_save(data_url):
+    """新流程：按base64长度估算大小，解码一次后共用字节数据"""
+    ingest = ImageIngest(data_url)
+    ingest.parse()
+    estimated_size = ingest.estimated_size
+    assert ingest.validate()['valid']
+    info = ingest.image_info
+    return estimated_size, ingest.size, (info['width'], info['height'], info['format'])
+
+
+def main():
+    for width, height in ((1024, 1024), (1920, 1440)):
+        image_bytes = make_image(width, height)
+        data_url = 'data:image/png;base64,' + base64.b64encode(image_bytes).decode('ascii')
+        assert legacy_save(data_url) == ingest_save(data_url)
+
+        report(f"{width}x{height} PNG，{len(image_bytes) / 1024 / 1024:.1f} MB", [
+            ('legacy (4x b64decode + Pillow)', *measure(lambda: legacy_save(data_url), 20)),
+            ('ImageIngest (1x b64decode)', *measure(lambda: ingest_save(data_url), 20)),
+        ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+图片列表游标分页：一个用户100万条记录时，第一页与深分页的查询耗时对比（同时列出OFFSET分页）
+
+在临时SQLite数据库中生成数据（带迁移中的 (user_id, deleted_at, created_at, id) 复合索引），
+每个深度先用OFFSET找到该位置的游标（不计时），再分别计时游标查询和OFFSET查询。
+
+运行：cd backend && python -m benchmarks.bench_list_pagination [记录数]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 存储等单例在导入app时读取环境变量
+_TMP_DIR = tempfile.mkdtemp(prefix='bench-list-')
+os.environ.setdefault('STORAGE_BACKEND', 'local')
+os.environ.setdefault('LOCAL_STORAGE_ROOT', os.path.join(_TMP_DIR, 'storage'))
+os.environ.setdefault('IMAGE_CACHE_DIR', os.path.join(_TMP_DIR, 'cache'))
+
+from app import create_app, db  # noqa: E402
+from app.config import TestingConfig  # noqa: E402
+from app.models.image_records import ImageRecord, compile_fields, query_image_list  # noqa: E402
+
+PAGE_SIZE = 20
+USER_ID = 1
+
+
+class BenchConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(_TMP_DIR, 'bench.db')
+    RESPONSE_CACHE_ENABLED = False
+
+
+def seed(rows, chunk_size=50000):
+    """生成记录：每10条共用一个created_at，覆盖同一时间的游标翻页"""
+    db.session.execute(db.text("INSERT INTO users (id, email, password_hash) VALUES (:id, 'bench@test', 'x')"),
+                       {'id': USER_ID})
+    started = datetime(2020, 1, 1)
+    insert = db.text("""
+        INSERT INTO image_records (user_id, image_id, prompt, model, image_url, status, created_at, updated_at)
+        VALUES (:user_id, :image_id, :prompt, 'bench-model', :image_url, 'ready', :created_at, :created_at)
+    """)
+    for offset in range(0, rows, chunk_size):
+        db.session.execute(insert, [{
+            'user_id': USER_ID,
+            'image_id': f'img{index:012d}',
+            'prompt': f'bench prompt {index}',
+            'image_url': f'https://cdn/bench/{index}.png',
+            'created_at': started + timedelta(seconds=index // 10)
+        } for index in range(offset, min(offset + chunk_size, rows))])
+        db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def position_at(depth):
+    """第depth条记录的游标位置 (created_at, id)"""
+    return db.session.query(ImageRecord.created_at, ImageRecord.id).filter(
+        ImageRecord.user_id == USER_ID,
+        ImageRecord.deleted_at.is_(None)
+    ).order_by(ImageRecord.created_at.desc(), ImageRecord.id.desc()).offset(depth - 1).limit(1).one()
+
+
+def offset_page(fieldset, depth):
+    return db.session.query(*fieldset.columns).filter(
+        ImageRecord.user_id == USER_ID,
+        ImageRecord.deleted_at.is_(None)
+    ).order_by(ImageRecord.created_at.desc(), ImageRecord.id.desc()).offset(depth).limit(PAGE_SIZE + 1).all()
+
+
+def timings_ms(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    app = create_app(BenchConfig)
+    try:
+        run(app, rows)
+    finally:
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+def run(app, rows):
+    with app.app_context():
+        started = time.perf_counter()
+        seed(rows)
+        print(f"生成 {rows} 条记录，耗时 {time.perf_counter() - started:.1f}s（{BenchConfig.SQLALCHEMY_DATABASE_URI}）")
+
+        fieldset = compile_fields(simple=True)
+        depths = [depth for depth in (0, 1_000, 10_000, 100_000, 500_000, rows - PAGE_SIZE) if depth < rows]
+        print(f"{'depth':>10}{'cursor p50 ms':>15}{'cursor p95 ms':>15}{'offset p50 ms':>15}{'offset p95 ms':>15}")
+        for depth in depths:
+            position = position_at(depth) if depth else None
+            cursor = timings_ms(lambda: query_image_list(USER_ID, PAGE_SIZE + 1, position=position,
+                                                         fieldset=fieldset), 50)
+            offset = timings_ms(lambda: offset_page(fieldset, depth), 5 if depth >= 100_000 else 20)
+            print(f"{depth:>10}{cursor[0]:>15.2f}{cursor[1]:>15.2f}{offset[0]:>15.2f}{offset[1]:>15.2f}")
+
+
+if __name__ == '__main__':
+    main()
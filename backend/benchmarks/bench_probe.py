@@ -0,0 +1,65 @@
+"""
+读取图片格式和尺寸：只解析文件头的probe_image 与 旧的Pillow调用对比
+
+- Pillow open：旧的 _get_image_info（Image.open 读取尺寸）
+- Pillow verify + reopen：旧的 ImageUrlToBase64Resource（verify后重新打开）
+
+运行：cd backend && python -m benchmarks.bench_probe
+"""
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from app.utils.image_probe import probe_image
+from benchmarks._common import make_image
+
+
+def pillow_open(data):
+    with Image.open(BytesIO(data)) as img:
+        return img.format, img.size
+
+
+def pillow_verify_reopen(data):
+    with Image.open(BytesIO(data)) as img:
+        img.verify()
+    with Image.open(BytesIO(data)) as img:
+        return img.format, img.size
+
+
+def per_call_us(fn, data, min_seconds=0.3):
+    """重复调用至少min_seconds，返回每次调用的微秒数"""
+    fn(data)
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for _ in range(50):
+            fn(data)
+        calls += 50
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+
+def main():
+    samples = [
+        ('PNG 1920x1080', make_image(1920, 1080, 'PNG')),
+        ('JPEG 1920x1080', make_image(1920, 1080, 'JPEG', quality=90)),
+        ('JPEG progressive', make_image(1920, 1080, 'JPEG', quality=90, progressive=True)),
+        ('WEBP 1920x1080', make_image(1920, 1080, 'WEBP', quality=80)),
+        ('GIF 640x480', make_image(640, 480, 'GIF')),
+        ('BMP 1024x768', make_image(1024, 768, 'BMP')),
+    ]
+
+    print(f"{'':<20}{'MB':>6}{'probe us':>12}{'open us':>12}{'verify+reopen us':>19}")
+    for name, data in samples:
+        info = probe_image(data)
+        assert (info['format'], (info['width'], info['height'])) == pillow_open(data)
+        print(f"{name:<20}{len(data) / 1024 / 1024:>6.1f}"
+              f"{per_call_us(probe_image, data):>12.1f}"
+              f"{per_call_us(pillow_open, data):>12.1f}"
+              f"{per_call_us(pillow_verify_reopen, data):>19.1f}")
+
+
+if __name__ == '__main__':
+    main()
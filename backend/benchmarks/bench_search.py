@@ -0,0 +1,106 @@
+"""
+提示词搜索：一个用户10万张图片时，全文索引（SQLite FTS5）与LIKE匹配的查询耗时（p50/p95）
+
+在临时SQLite数据库中生成数据后执行 rebuild_search_index 创建索引，
+每个检索词分别在索引可用和强制LIKE两种模式下计时第一页查询。
+
+运行：cd backend && python -m benchmarks.bench_search [记录数]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 存储等单例在导入app时读取环境变量
+_TMP_DIR = tempfile.mkdtemp(prefix='bench-search-')
+os.environ.setdefault('STORAGE_BACKEND', 'local')
+os.environ.setdefault('LOCAL_STORAGE_ROOT', os.path.join(_TMP_DIR, 'storage'))
+os.environ.setdefault('IMAGE_CACHE_DIR', os.path.join(_TMP_DIR, 'cache'))
+
+from app import create_app, db  # noqa: E402
+from app.config import TestingConfig  # noqa: E402
+from app.utils import image_search  # noqa: E402
+from benchmarks.bench_list_pagination import timings_ms  # noqa: E402
+
+PAGE_SIZE = 20
+USER_ID = 1
+# 提示词词表：中英文混合，后两个是低频词
+WORDS = ['一只', '橘猫', '坐在', '窗台上', '夕阳', '城市', '夜景', '赛博朋克', '水彩', '油画风格',
+         'cat', 'sunset', 'portrait', 'landscape', 'watercolor', 'cyberpunk', 'neon', 'forest']
+RARE_WORDS = ['独角兽', 'lighthouse']
+TERMS = ['橘猫', '赛博朋克', 'watercolor', 'cat sunset', '窗台上 夕阳', '独角兽', 'lighthouse', '不存在的词语']
+
+
+class BenchConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(_TMP_DIR, 'bench.db')
+    RESPONSE_CACHE_ENABLED = False
+
+
+def seed(rows, chunk_size=20000):
+    """生成记录：提示词由词表随机组成，约0.1%包含低频词"""
+    rng = random.Random(42)
+    db.session.execute(db.text("INSERT INTO users (id, email, password_hash) VALUES (:id, 'bench@test', 'x')"),
+                       {'id': USER_ID})
+    started = datetime(2020, 1, 1)
+    insert = db.text("""
+        INSERT INTO image_records (user_id, image_id, prompt, model_response, model, image_url, status,
+                                   created_at, updated_at)
+        VALUES (:user_id, :image_id, :prompt, :model_response, 'bench-model', :image_url, 'ready',
+                :created_at, :created_at)
+    """)
+    for offset in range(0, rows, chunk_size):
+        batch = []
+        for index in range(offset, min(offset + chunk_size, rows)):
+            words = rng.sample(WORDS, 6)
+            if rng.random() < 0.001:
+                words.append(rng.choice(RARE_WORDS))
+            batch.append({
+                'user_id': USER_ID,
+                'image_id': f'img{index:012d}',
+                'prompt': ' '.join(words),
+                'model_response': '已生成图片：' + '，'.join(rng.sample(WORDS, 3)),
+                'image_url': f'https://cdn/bench/{index}.png',
+                'created_at': started + timedelta(seconds=index)
+            })
+        db.session.execute(insert, batch)
+        db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    app = create_app(BenchConfig)
+    try:
+        run(app, rows)
+    finally:
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+def run(app, rows):
+    with app.app_context():
+        started = time.perf_counter()
+        seed(rows)
+        print(f"生成 {rows} 条记录，耗时 {time.perf_counter() - started:.1f}s（{BenchConfig.SQLALCHEMY_DATABASE_URI}）")
+
+        started = time.perf_counter()
+        image_search.rebuild_search_index()
+        print(f"创建全文索引，耗时 {time.perf_counter() - started:.1f}s")
+
+        print(f"{'keyword':>14}{'hits':>6}{'fts p50 ms':>13}{'fts p95 ms':>13}{'like p50 ms':>13}{'like p95 ms':>13}")
+        for keyword in TERMS:
+            search = lambda: image_search.search_images(USER_ID, keyword, PAGE_SIZE + 1)  # noqa: E731
+            image_search._search_index_available = True
+            hits = len(search())
+            fts = timings_ms(search, 50)
+            image_search._search_index_available = False
+            like = timings_ms(search, 20)
+            print(f"{keyword:>14}{hits:>6}{fts[0]:>13.2f}{fts[1]:>13.2f}{like[0]:>13.2f}{like[1]:>13.2f}")
+        image_search._search_index_available = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+上传路径对比：临时文件 + put_object_from_file（旧） 与 内存数据直接put_object（含Content-MD5）
+
+OSS客户端用只读取请求体的替身代替，只比较服务端本地开销（磁盘写入/读取、MD5计算），
+不包含网络传输时间。另外列出不计算MD5的内存上传，区分去掉临时文件和计算Content-MD5
+各自的影响。临时文件写入后很快删除，通常只落在页缓存中，磁盘繁忙时旧流程会更慢。
+
+运行：cd backend && python -m benchmarks.bench_upload [并发数...]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from app.utils.oss_transfer import OSSTransferManager
+
+RESPONSE = SimpleNamespace(status_code=200, etag='"etag"', request_id='req')
+
+
+class SinkClient:
+    """读取完整请求体后返回成功（相当于数据已发送）"""
+
+    def put_object(self, request):
+        len(memoryview(request.body))
+        return RESPONSE
+
+    def put_object_from_file(self, request, filepath):
+        with open(filepath, 'rb') as f:
+            while f.read(1024 * 1024):
+                pass
+        return RESPONSE
+
+
+def legacy_upload(client, key, data):
+    """旧流程：写入NamedTemporaryFile，从文件上传后删除"""
+    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+    try:
+        return client.put_object_from_file(SimpleNamespace(key=key), temp_path)
+    finally:
+        os.unlink(temp_path)
+
+
+def saves_per_second(upload, data, workers, total):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(lambda index: upload(f'ai-images/bench/{index}.png', data), range(total)):
+            pass
+    return total / (time.perf_counter() - started)
+
+
+def main():
+    concurrency = [int(value) for value in sys.argv[1:]] or [1, 8]
+    client = SinkClient()
+    manager = OSSTransferManager(SimpleNamespace(bucket_name='bench', client=client))
+    # 内存上传走单次put_object（不分片）
+    manager.multipart_threshold = 64 * 1024 * 1024
+
+    print(f"临时文件目录: {tempfile.gettempdir()}")
+    print(f"{'size':>8}{'workers':>9}{'temp file /s':>15}{'memory+MD5 /s':>15}{'memory /s':>12}")
+    for size_mb in (1, 4, 10):
+        data = os.urandom(size_mb * 1024 * 1024)
+        for workers in concurrency:
+            total = max(20, workers * 10)
+            legacy = saves_per_second(lambda key, body: legacy_upload(client, key, body), data, workers, total)
+            memory = saves_per_second(
+                lambda key, body: manager.upload_bytes(key, body, content_type='image/png'), data, workers, total
+            )
+            no_md5 = saves_per_second(
+                lambda key, body: client.put_object(SimpleNamespace(key=key, body=body)), data, workers, total
+            )
+            print(f"{size_mb:>6}MB{workers:>9}{legacy:>15.1f}{memory:>15.1f}{no_md5:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""image storage and upload tables
+
+Revision ID: 2406fa63853e
+Revises: af9830a4b053
+Create Date: 2026-10-17 12:23:04.368003
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = '2406fa63853e'
+down_revision = 'af9830a4b053'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _add_columns(table, columns):
+    """添加不存在的列（db.create_all()建的新库已包含这些列）"""
+    existing = {column['name'] for column in _inspector().get_columns(table)}
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+
+
+def _create_indexes(table, indexes):
+    existing = {index['name'] for index in _inspector().get_indexes(table)}
+    for name, columns in indexes:
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def upgrade():
+    tables = set(_inspector().get_table_names())
+
+    # 图片记录：派生图、转码前大小、内容哈希（去重）、上传状态
+    _add_columns('image_records', [
+        sa.Column('thumb_url', sa.String(length=500), nullable=True),
+        sa.Column('preview_url', sa.String(length=500), nullable=True),
+        sa.Column('original_size', sa.Integer(), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='ready'),
+    ])
+    # 已有记录没有转码，原始大小即存储大小
+    op.execute('UPDATE image_records SET original_size = image_size WHERE original_size IS NULL')
+    if op.get_bind().dialect.name == 'mysql':
+        # ETag依赖updated_at，MySQL改为微秒精度
+        op.alter_column('image_records', 'updated_at',
+                        existing_type=sa.DateTime(), type_=mysql.DATETIME(fsp=6), existing_nullable=True)
+    _create_indexes('image_records', [
+        ('ix_image_records_user_hash', ['user_id', 'content_hash']),
+        ('ix_image_records_filename', ['image_filename']),
+        ('ix_image_records_deleted_at', ['deleted_at']),
+        ('ix_image_records_user_list', ['user_id', 'deleted_at', 'created_at', 'id']),
+        ('ix_image_records_user_updated', ['user_id', 'updated_at']),
+    ])
+
+    # 用户存储：配额预留量
+    _add_columns('user_storage', [
+        sa.Column('reserved_storage', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('reserved_images', sa.Integer(), nullable=False, server_default='0'),
+    ])
+
+    # 待删除文件（outbox）
+    if 'storage_deletions' not in tables:
+        op.create_table(
+            'storage_deletions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('object_key', sa.String(length=255), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('last_error', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    _create_indexes('storage_deletions', [
+        ('ix_storage_deletions_status', ['status']),
+        ('ix_storage_deletions_next_attempt_at', ['next_attempt_at']),
+    ])
+
+    # 配额预留
+    if 'storage_reservations' not in tables:
+        op.create_table(
+            'storage_reservations',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('reservation_id', sa.String(length=20), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('size', sa.BigInteger(), nullable=False),
+            sa.Column('image_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('reservation_id')
+        )
+    _create_indexes('storage_reservations', [
+        ('ix_storage_reservations_user_expires', ['user_id', 'expires_at']),
+    ])
+
+    # 直传上传会话
+    if 'upload_sessions' not in tables:
+        op.create_table(
+            'upload_sessions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('upload_id', sa.String(length=20), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('object_key', sa.String(length=255), nullable=False),
+            sa.Column('declared_size', sa.Integer(), nullable=False),
+            sa.Column('content_type', sa.String(length=50), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('upload_id')
+        )
+    _create_indexes('upload_sessions', [
+        ('ix_upload_sessions_user_id', ['user_id']),
+    ])
+
+
+def downgrade():
+    op.drop_table('upload_sessions')
+    op.drop_table('storage_reservations')
+    op.drop_table('storage_deletions')
+
+    with op.batch_alter_table('user_storage') as batch_op:
+        batch_op.drop_column('reserved_images')
+        batch_op.drop_column('reserved_storage')
+
+    with op.batch_alter_table('image_records') as batch_op:
+        batch_op.drop_index('ix_image_records_user_updated')
+        batch_op.drop_index('ix_image_records_user_list')
+        batch_op.drop_index('ix_image_records_deleted_at')
+        batch_op.drop_index('ix_image_records_filename')
+        batch_op.drop_index('ix_image_records_user_hash')
+        batch_op.drop_column('status')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('preview_url')
+        batch_op.drop_column('thumb_url')
+    if op.get_bind().dialect.name == 'mysql':
+        op.alter_column('image_records', 'updated_at',
+                        existing_type=mysql.DATETIME(fsp=6), type_=sa.DateTime(), existing_nullable=True)
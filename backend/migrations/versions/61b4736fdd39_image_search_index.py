@@ -0,0 +1,67 @@
+"""image search index
+
+Revision ID: 61b4736fdd39
+Revises: 2406fa63853e
+Create Date: 2026-10-17 12:23:05.739434
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '61b4736fdd39'
+down_revision = '2406fa63853e'
+branch_labels = None
+depends_on = None
+
+
+# 与 app/utils/image_search.py 中的定义保持一致
+FTS_TABLE = 'image_records_fts'
+FULLTEXT_INDEX = 'ft_image_records_text'
+
+SQLITE_UPGRADE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        prompt, model_response, content='image_records', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_ai AFTER INSERT ON image_records BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, prompt, model_response)
+        VALUES (new.id, new.prompt, new.model_response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_ad AFTER DELETE ON image_records BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, prompt, model_response)
+        VALUES ('delete', old.id, old.prompt, old.model_response);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS image_records_fts_au AFTER UPDATE OF prompt, model_response ON image_records BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, prompt, model_response)
+        VALUES ('delete', old.id, old.prompt, old.model_response);
+        INSERT INTO {FTS_TABLE}(rowid, prompt, model_response)
+        VALUES (new.id, new.prompt, new.model_response);
+    END""",
+    # 导入已有数据
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # SQLite FTS5（trigram分词，需要SQLite 3.34+），通过触发器随image_records维护
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif bind.dialect.name == 'mysql':
+        # MySQL FULLTEXT索引（ngram分词，支持中文）
+        existing = {index['name'] for index in sa.inspect(bind).get_indexes('image_records')}
+        if FULLTEXT_INDEX not in existing:
+            op.execute(f"ALTER TABLE image_records ADD FULLTEXT INDEX {FULLTEXT_INDEX} "
+                       f"(prompt, model_response) WITH PARSER ngram")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('image_records_fts_ai', 'image_records_fts_ad', 'image_records_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif bind.dialect.name == 'mysql':
+        op.drop_index(FULLTEXT_INDEX, table_name='image_records')
@@ -0,0 +1,98 @@
+"""baseline schema
+
+Revision ID: af9830a4b053
+Revises: 
+Create Date: 2026-10-17 12:23:00.595370
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'af9830a4b053'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已由db.create_all()建好表的数据库跳过（也可直接 flask db stamp af9830a4b053）
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=50), nullable=True),
+            sa.Column('email', sa.String(length=100), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email')
+        )
+
+    if 'send_code' not in existing:
+        op.create_table(
+            'send_code',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('is_used', sa.Boolean(), nullable=True),
+            sa.Column('send_type', sa.Integer(), nullable=False),
+            sa.Column('send_to', sa.String(length=100), nullable=False),
+            sa.Column('code', sa.String(length=6), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'user_storage' not in existing:
+        op.create_table(
+            'user_storage',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('total_storage', sa.BigInteger(), nullable=True),
+            sa.Column('used_storage', sa.BigInteger(), nullable=True),
+            sa.Column('max_images', sa.Integer(), nullable=True),
+            sa.Column('current_images', sa.Integer(), nullable=True),
+            sa.Column('max_file_size', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+
+    if 'image_records' not in existing:
+        op.create_table(
+            'image_records',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('image_id', sa.String(length=20), nullable=False),
+            sa.Column('prompt', sa.Text(), nullable=False),
+            sa.Column('model', sa.String(length=100), nullable=False),
+            sa.Column('base_url', sa.String(length=100), nullable=True),
+            sa.Column('api_key', sa.String(length=100), nullable=True),
+            sa.Column('image_url', sa.String(length=500), nullable=False),
+            sa.Column('image_filename', sa.String(length=255), nullable=True),
+            sa.Column('elapsed_time', sa.String(length=10), nullable=True),
+            sa.Column('model_response', sa.Text(), nullable=True),
+            sa.Column('image_width', sa.Integer(), nullable=True),
+            sa.Column('image_height', sa.Integer(), nullable=True),
+            sa.Column('image_size', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('deleted_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('image_id')
+        )
+
+
+def downgrade():
+    op.drop_table('image_records')
+    op.drop_table('user_storage')
+    op.drop_table('send_code')
+    op.drop_table('users')
@@ -0,0 +1,28 @@
+"""upload session reservation
+
+Revision ID: f607ea453263
+Revises: 61b4736fdd39
+Create Date: 2026-10-17 12:27:21.080121
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f607ea453263'
+down_revision = '61b4736fdd39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 直传上传会话关联申请地址时的配额预留
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('upload_sessions')}
+    if 'reservation_id' not in existing:
+        op.add_column('upload_sessions', sa.Column('reservation_id', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('reservation_id')
@@ -0,0 +1,95 @@
+import base64
+import io
+import os
+import tempfile
+
+import pytest
+
+# 存储、缓存等单例在导入时读取环境变量，需在导入app之前设置
+_TMP_DIR = tempfile.mkdtemp(prefix='ezwork-test-')
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['LOCAL_STORAGE_ROOT'] = os.path.join(_TMP_DIR, 'storage')
+os.environ['IMAGE_CACHE_DIR'] = os.path.join(_TMP_DIR, 'cache')
+
+from PIL import Image  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.config import TestingConfig  # noqa: E402
+
+
+class Config(TestingConfig):
+    # 文件数据库：并发测试的多个线程需要共用同一个数据库
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(_TMP_DIR, 'test.db')
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+    JWT_SECRET_KEY = 'test-secret-key-with-enough-length-for-hs256'
+    IMAGE_DERIVATIVES_MODE = 'off'
+    RESPONSE_CACHE_ENABLED = False
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(Config)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """每个测试结束后清空所有表"""
+    yield
+    db.session.rollback()
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+    # 删除后ID会被复用，清空会话中已加载的对象
+    db.session.expunge_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def create_user(app):
+    """创建用户及其存储信息，返回 (user_id, 请求头)"""
+    from app.models.user import User
+    from app.models.user_storage import UserStorage
+
+    counter = [0]
+
+    def create(**storage_options):
+        counter[0] += 1
+        user = User(email=f'user{counter[0]}@test.com', username=f'user{counter[0]}')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(UserStorage(user_id=user.id, **storage_options))
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+        return user.id, {'Authorization': f'Bearer {token}'}
+
+    return create
+
+
+def make_image(width=64, height=48, fmt='PNG'):
+    """生成随机内容的图片（内容不同，不会被去重）"""
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def make_data_url(image_bytes, mime_type='image/png'):
+    return f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+
+
+@pytest.fixture
+def image_factory():
+    return make_image
+
+
+@pytest.fixture
+def data_url_factory():
+    return make_data_url
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.image_records import ImageRecord
+from app.models.storage_deletion import StorageDeletion
+from app.utils.deletion_queue import deletion_queue
+from app.utils.image_derivatives import derivative_keys
+from app.utils.storage import file_storage
+
+
+def _failing_delete(keys):
+    return {'success': False, 'deleted': [], 'message': 'boom'}
+
+
+def test_drain_command_processes_leftover_rows(app):
+    file_storage.put_stream('ai-images/leftover.png', iter([b'data']), content_type='image/png')
+    db.session.add(StorageDeletion(object_key='ai-images/leftover.png'))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['drain-deletions'])
+    assert result.exit_code == 0, result.output
+    assert StorageDeletion.query.count() == 0
+    assert not file_storage.head_file('ai-images/leftover.png')['success']
+
+
+def test_failed_rows_are_requeued_with_backoff(app, monkeypatch):
+    monkeypatch.setattr(file_storage, 'delete_files', _failing_delete)
+    monkeypatch.setattr(deletion_queue, 'max_attempts', 1)
+    db.session.add(StorageDeletion(object_key='ai-images/missing.png'))
+    db.session.commit()
+
+    deletion_queue.process_batch()
+    row = StorageDeletion.query.one()
+    assert row.status == 'failed'
+    first_delay = row.next_attempt_at - datetime.utcnow()
+    assert first_delay > timedelta(seconds=deletion_queue.failed_retry_delay - 60)
+
+    # 未到重排时间不会重新排队
+    assert deletion_queue.requeue_failed() == 0
+
+    # 强制重新排队后再次失败，重排间隔加倍
+    assert deletion_queue.requeue_failed(force=True) == 1
+    assert StorageDeletion.query.one().status == 'pending'
+    deletion_queue.process_batch()
+    row = StorageDeletion.query.one()
+    assert row.status == 'failed'
+    assert row.next_attempt_at - datetime.utcnow() > first_delay + timedelta(seconds=deletion_queue.failed_retry_delay - 60)
+
+
+def test_files_referenced_again_are_not_deleted(client, create_user, image_factory, data_url_factory):
+    _, headers = create_user()
+    response = client.post('/api/images/add', json={
+        'image_data': data_url_factory(image_factory()), 'prompt': 'p', 'model': 'm'
+    }, headers=headers)
+    assert response.status_code == 200, response.json
+    filename = ImageRecord.query.one().image_filename
+
+    # 删除登记之后，文件又被去重的记录引用
+    keys = [filename] + derivative_keys(filename)
+    for key in keys + ['ai-images/unreferenced.png']:
+        db.session.add(StorageDeletion(object_key=key))
+    db.session.commit()
+    skipped = deletion_queue.get_metrics()['skipped']
+
+    assert deletion_queue.process_batch() == len(keys) + 1
+    assert StorageDeletion.query.count() == 0
+    assert file_storage.head_file(filename)['success']
+    assert deletion_queue.get_metrics()['skipped'] - skipped == len(keys)
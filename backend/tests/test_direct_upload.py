@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from app import db
+from app.apis.image import QUOTA_EXCEEDED_MESSAGE
+from app.models.image_records import ImageRecord
+from app.models.storage_reservation import StorageReservation
+from app.models.user_storage import UserStorage
+
+
+def _presign_and_put(client, headers, image_bytes, content_type='image/png'):
+    response = client.post('/api/images/presign', json={
+        'content_type': content_type,
+        'size': len(image_bytes)
+    }, headers=headers)
+    assert response.status_code == 200, response.json
+    data = response.json['data']
+
+    url = urlsplit(data['upload_url'])
+    put = client.put(f'{url.path}?{url.query}', data=image_bytes, headers=data['headers'])
+    assert put.status_code == 200, put.json
+    return data['upload_id']
+
+
+def _commit(client, headers, upload_id):
+    return client.post('/api/images/commit', json={
+        'upload_id': upload_id,
+        'prompt': 'direct upload',
+        'model': 'm'
+    }, headers=headers)
+
+
+def test_presign_put_commit(client, create_user, image_factory):
+    user_id, headers = create_user()
+    image_bytes = image_factory()
+    upload_id = _presign_and_put(client, headers, image_bytes)
+
+    # 申请上传地址时按声明大小预留配额
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+    assert (storage.reserved_storage, storage.reserved_images) == (len(image_bytes), 1)
+    assert StorageReservation.query.filter_by(user_id=user_id).count() == 1
+
+    response = _commit(client, headers, upload_id)
+    assert response.status_code == 200, response.json
+    assert response.json['data']['image']['status'] == 'ready'
+
+    db.session.rollback()
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+    assert storage.used_storage == len(image_bytes)
+    assert storage.current_images == 1
+    assert (storage.reserved_storage, storage.reserved_images) == (0, 0)
+    assert StorageReservation.query.filter_by(user_id=user_id).count() == 0
+
+    # 重复提交被拒绝，不会重复记账
+    again = _commit(client, headers, upload_id)
+    assert again.status_code == 400
+    assert ImageRecord.query.filter_by(user_id=user_id).count() == 1
+    assert UserStorage.query.filter_by(user_id=user_id).one().current_images == 1
+
+
+def test_commit_rejects_invalid_signature(client, create_user, image_factory):
+    _, headers = create_user()
+    response = client.post('/api/images/presign', json={'content_type': 'image/png', 'size': 100},
+                           headers=headers)
+    url = urlsplit(response.json['data']['upload_url'])
+    put = client.put(url.path + '?expires=1&signature=bad', data=image_factory(),
+                     headers={'Content-Type': 'image/png'})
+    assert put.status_code == 403
+
+
+def test_concurrent_commits_create_one_record(app, create_user, image_factory):
+    user_id, headers = create_user()
+    upload_id = _presign_and_put(app.test_client(), headers, image_factory())
+
+    def commit(_):
+        with app.app_context():
+            return _commit(app.test_client(), headers, upload_id).status_code
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        codes = list(executor.map(commit, range(4)))
+
+    assert codes.count(200) == 1
+    assert ImageRecord.query.filter_by(user_id=user_id).count() == 1
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+    assert storage.current_images == 1
+
+
+def test_presign_reserves_quota(client, create_user, image_factory, data_url_factory):
+    _, headers = create_user(max_images=1)
+    _presign_and_put(client, headers, image_factory())
+
+    # 未提交的上传占用了唯一的图片名额
+    response = client.post('/api/images/presign', json={'content_type': 'image/png', 'size': 100},
+                           headers=headers)
+    assert response.json['message'] == QUOTA_EXCEEDED_MESSAGE
+    response = client.post('/api/images/add', json={
+        'image_data': data_url_factory(image_factory()),
+        'prompt': 'p',
+        'model': 'm'
+    }, headers=headers)
+    assert response.json['message'] == QUOTA_EXCEEDED_MESSAGE
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+from app.utils.file_cache import DiskLRUCache
+
+
+def test_cache_is_off_by_default_and_outside_the_source_tree(monkeypatch):
+    monkeypatch.delenv('IMAGE_CACHE_DIR', raising=False)
+    monkeypatch.delenv('IMAGE_CACHE_MAX_SIZE', raising=False)
+
+    cache = DiskLRUCache.from_env()
+    assert not cache.enabled
+    assert cache.directory.startswith(os.path.abspath(tempfile.gettempdir()))
+    cache.put('ai-images/a.png', b'data')
+    assert cache.get('ai-images/a.png') is None
+    assert not os.path.exists(os.path.join(cache.directory, cache._name('ai-images/a.png')))
+
+
+def test_enabled_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_size=10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    assert cache.get('a') == b'aaaa'
+
+    cache.put('c', b'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'aaaa' and cache.get('c') == b'cccc'
+    assert cache.get_metrics()['evictions'] == 1
@@ -0,0 +1,85 @@
+from app.models.image_records import ImageRecord
+from app.models.storage_reservation import StorageReservation
+from app.models.user_storage import UserStorage
+from app.utils.storage import file_storage
+
+
+def _batch(client, headers, images):
+    return client.post('/api/images/batch-add', json={'images': images, 'prompt': 'batch', 'model': 'm'},
+                       headers=headers)
+
+
+def _storage(user_id):
+    return UserStorage.query.filter_by(user_id=user_id).one()
+
+
+def _count_uploads(monkeypatch):
+    calls = []
+    upload = file_storage.upload_image_bytes
+
+    def counting_upload(**kwargs):
+        calls.append(1)
+        return upload(**kwargs)
+
+    monkeypatch.setattr(file_storage, 'upload_image_bytes', counting_upload)
+    return calls
+
+
+def test_partial_failure_saves_valid_images(client, create_user, image_factory, data_url_factory):
+    user_id, headers = create_user()
+    first, second = image_factory(), image_factory()
+
+    response = _batch(client, headers, [
+        data_url_factory(first),
+        '',
+        {'image_data': data_url_factory(second), 'model_response': '第二张'},
+        data_url_factory(b'\x89PNG' + b'\0' * 200)
+    ])
+    assert response.status_code == 200, response.json
+    data = response.json['data']
+    assert [result['success'] for result in data['results']] == [True, False, True, False]
+    assert (data['saved'], data['failed']) == (2, 2)
+
+    records = ImageRecord.query.filter_by(user_id=user_id).order_by(ImageRecord.id).all()
+    assert [record.model_response for record in records] == ['', '第二张']
+    storage = _storage(user_id)
+    assert (storage.used_storage, storage.current_images) == (len(first) + len(second), 2)
+    # 失败图片的预留已归还
+    assert (storage.reserved_storage, storage.reserved_images) == (0, 0)
+    assert StorageReservation.query.count() == 0
+
+
+def test_same_image_in_batch_is_stored_and_charged_once(client, create_user, image_factory, data_url_factory,
+                                                        monkeypatch):
+    user_id, headers = create_user()
+    image_bytes = image_factory()
+    uploads = _count_uploads(monkeypatch)
+
+    response = _batch(client, headers, [data_url_factory(image_bytes)] * 3)
+    assert response.status_code == 200, response.json
+    assert response.json['data']['saved'] == 3
+
+    records = ImageRecord.query.filter_by(user_id=user_id).all()
+    assert len(records) == 3
+    assert len({record.image_filename for record in records}) == 1
+    assert len(uploads) == 1
+    storage = _storage(user_id)
+    assert (storage.used_storage, storage.current_images) == (len(image_bytes), 3)
+    assert storage.reserved_storage == 0
+
+
+def test_failed_batch_releases_reservation(client, create_user, image_factory, data_url_factory, monkeypatch):
+    user_id, headers = create_user()
+    monkeypatch.setattr(file_storage, 'upload_image_bytes',
+                        lambda **kwargs: {'success': False, 'message': 'boom'})
+
+    response = _batch(client, headers, [data_url_factory(image_factory()), data_url_factory(image_factory())])
+    assert response.status_code == 400
+    assert response.json['errors']['saved'] == 0
+    assert not any(result['success'] for result in response.json['errors']['results'])
+
+    storage = _storage(user_id)
+    assert (storage.used_storage, storage.current_images) == (0, 0)
+    assert (storage.reserved_storage, storage.reserved_images) == (0, 0)
+    assert StorageReservation.query.count() == 0
+    assert ImageRecord.query.count() == 0
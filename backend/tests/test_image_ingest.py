@@ -0,0 +1,52 @@
+import base64
+
+from app.utils import image_ingest
+from app.utils.image_ingest import ImageIngest
+
+
+def test_ingest_decodes_once_and_estimates_size(image_factory, data_url_factory, monkeypatch):
+    image_bytes = image_factory(120, 80)
+    calls = []
+    decode = base64.b64decode
+    monkeypatch.setattr(image_ingest.base64, 'b64decode', lambda data: calls.append(1) or decode(data))
+
+    ingest = ImageIngest(data_url_factory(image_bytes))
+    assert ingest.parse()['valid']
+    # 解码前即可按base64长度得到准确的大小
+    assert ingest.estimated_size == len(image_bytes)
+    assert not calls
+
+    assert ingest.validate()['valid']
+    assert ingest.image_bytes == image_bytes
+    assert ingest.image_info['width'] == 120 and ingest.image_info['height'] == 80
+    assert ingest.content_hash
+    assert ingest.validate()['valid']
+    assert len(calls) == 1
+
+
+def test_save_request_decodes_payload_once(client, create_user, image_factory, data_url_factory, monkeypatch):
+    _, headers = create_user()
+    data_url = data_url_factory(image_factory())
+    payload = data_url.split(',', 1)[1]
+    calls = []
+    decode = base64.b64decode
+
+    def counting_decode(data, *args, **kwargs):
+        # JWT等也会调用b64decode，只统计图片数据的解码
+        if data == payload:
+            calls.append(1)
+        return decode(data, *args, **kwargs)
+
+    monkeypatch.setattr(image_ingest.base64, 'b64decode', counting_decode)
+
+    response = client.post('/api/images/add', json={'image_data': data_url, 'prompt': 'p', 'model': 'm'},
+                           headers=headers)
+    assert response.status_code == 200
+    assert len(calls) == 1
+
+
+def test_ingest_rejects_invalid_data(data_url_factory):
+    assert not ImageIngest('').parse()['valid']
+    assert not ImageIngest('data:image/png;base64').parse()['valid']
+    assert not ImageIngest('not base64!').validate()['valid']
+    assert not ImageIngest(data_url_factory(b'\x89PNG' + b'\0' * 200)).validate()['valid']
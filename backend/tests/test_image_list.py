@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from app import db
+from app.models.image_records import ImageRecord
+
+
+def _create_records(user_id, count, created_at):
+    records = [ImageRecord(user_id=user_id, prompt=f'p{index}', model='m', image_url=f'https://cdn/{index}.png',
+                           created_at=created_at) for index in range(count)]
+    db.session.add_all(records)
+    db.session.commit()
+    return [record.image_id for record in records]
+
+
+def test_cursor_pages_through_identical_timestamps(client, create_user):
+    user_id, headers = create_user()
+    other_user_id, _ = create_user()
+    same_time = datetime(2024, 5, 1, 12, 0, 0)
+    expected = _create_records(user_id, 20, same_time) + _create_records(user_id, 5, datetime(2024, 4, 1))
+    _create_records(other_user_id, 5, same_time)
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        query = {'limit': 7, 'simple': 'true'}
+        if cursor:
+            query['cursor'] = cursor
+        data = client.get('/api/images/list', query_string=query, headers=headers).json['data']
+        pages += 1
+        seen += [image['image_id'] for image in data['images']]
+        assert data['total'] == len(data['images'])
+        if not data['has_more']:
+            assert data['next_cursor'] is None
+            break
+        assert data['next_cursor']
+        cursor = data['next_cursor']
+
+    assert pages == 4
+    assert len(seen) == len(set(seen))
+    assert sorted(seen) == sorted(expected)
+    # 按 (created_at, id) 倒序：同一时间的记录在前，较新的id在前
+    assert seen[:20] == list(reversed(expected[:20]))
+
+
+def test_invalid_cursor(client, create_user):
+    _, headers = create_user()
+    response = client.get('/api/images/list', query_string={'cursor': 'not-a-cursor'}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_fields_projection(client, create_user):
+    user_id, headers = create_user()
+    _create_records(user_id, 1, datetime(2024, 5, 1))
+
+    response = client.get('/api/images/list', query_string={'fields': 'image_id,thumb_url'}, headers=headers)
+    image = response.json['data']['images'][0]
+    assert set(image) == {'image_id', 'thumb_url'}
+    assert image['thumb_url'] == 'https://cdn/0.png'
+
+    response = client.get('/api/images/list', query_string={'fields': 'image_id,api_key'}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_if_none_match_returns_304_until_images_change(client, create_user):
+    user_id, headers = create_user()
+    _create_records(user_id, 2, datetime(2024, 5, 1))
+
+    first = client.get('/api/images/list', headers=headers)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and etag
+
+    cached = client.get('/api/images/list', headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert not cached.data
+
+    # 不同的查询参数使用不同的ETag
+    other = client.get('/api/images/list', query_string={'limit': 1}, headers={**headers, 'If-None-Match': etag})
+    assert other.status_code == 200
+
+    _create_records(user_id, 1, datetime(2024, 5, 2))
+    changed = client.get('/api/images/list', headers={**headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.json['data']['images']) == 3
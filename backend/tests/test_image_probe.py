@@ -0,0 +1,88 @@
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from app.utils.http_client import http_client
+from app.utils.image_probe import probe_image, verify_image
+
+
+def _encode(fmt, mode='RGB', size=(37, 23), **options):
+    image = Image.new(mode, size, (10, 20, 30, 40)[:len(mode)] if mode != 'P' else 1)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('data, fmt, mime_type', [
+    (_encode('PNG'), 'PNG', 'image/png'),
+    (_encode('JPEG'), 'JPEG', 'image/jpeg'),
+    (_encode('JPEG', progressive=True), 'JPEG', 'image/jpeg'),
+    (_encode('GIF', mode='P'), 'GIF', 'image/gif'),
+    (_encode('WEBP', quality=80), 'WEBP', 'image/webp'),           # VP8
+    (_encode('WEBP', lossless=True), 'WEBP', 'image/webp'),        # VP8L
+    (_encode('WEBP', mode='RGBA'), 'WEBP', 'image/webp'),          # VP8X（带alpha）
+    (_encode('BMP'), 'BMP', 'image/bmp'),
+])
+def test_probe_matches_pillow(data, fmt, mime_type):
+    info = probe_image(data)
+    assert info == {'format': fmt, 'mime_type': mime_type, 'width': 37, 'height': 23}
+    with Image.open(io.BytesIO(data)) as img:
+        assert (img.format, img.size) == (fmt, (37, 23))
+
+
+def test_probe_reads_jpeg_size_after_large_exif():
+    exif = Image.Exif()
+    exif[0x010E] = 'x' * 20000  # ImageDescription
+    data = _encode('JPEG', exif=exif.tobytes())
+    assert probe_image(data)['width'] == 37
+    # 只给出文件头所在的开头部分同样可以解析
+    assert probe_image(data[:21000])['height'] == 23
+
+
+def test_probe_rejects_non_images_and_truncated_headers():
+    wav = b'RIFF' + struct.pack('<I', 200) + b'WAVEfmt ' + b'\0' * 200
+    assert probe_image(wav) is None
+    assert probe_image(b'not an image at all') is None
+    assert probe_image(_encode('PNG')[:16]) is None
+    assert probe_image(_encode('JPEG')[:40]) is None
+
+
+def test_verify_image_is_strict():
+    data = _encode('PNG', size=(64, 64))
+    assert verify_image(data)
+    corrupted = data[:-30] + b'\0' * 30
+    assert probe_image(corrupted) is not None
+    assert not verify_image(corrupted)
+
+
+class _RemoteImage:
+    """http_client.stream返回的响应：声明的Content-Type与实际内容不符"""
+
+    def __init__(self, data, content_type):
+        self.raw = io.BytesIO(data)
+        self.headers = {'Content-Type': content_type, 'Content-Length': str(len(data))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+
+def test_url_to_base64_uses_probed_mime_type(client, create_user, image_factory, monkeypatch):
+    _, headers = create_user()
+    image_bytes = image_factory(50, 40, 'JPEG')
+    monkeypatch.setattr(http_client, 'stream', lambda url, **kwargs: _RemoteImage(image_bytes, 'image/png'))
+
+    response = client.post('/api/images/url-to-base64', json={'image_url': 'https://example.com/a.png'},
+                           headers=headers)
+    assert response.status_code == 200, response.json
+    data = response.json['data']
+    assert data['mimeType'] == 'image/jpeg'
+    assert data['dataUrl'].startswith('data:image/jpeg;base64,')
+    assert (data['width'], data['height'], data['format']) == (50, 40, 'jpeg')
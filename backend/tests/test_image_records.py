@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from app import db
+from app.models.image_records import (
+    FULL_FIELDS, SIMPLE_FIELDS, ImageRecord, compile_fields, parse_fields, query_image_detail
+)
+
+
+def _create_record(user_id, **values):
+    record = ImageRecord(user_id=user_id, prompt='长' * 60, model='m', image_url='https://cdn/img.png',
+                         image_size=10, created_at=datetime(2024, 5, 1, 8, 30, 15, 250000), **values)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def test_object_and_row_serializers_match(create_user):
+    user_id, _ = create_user()
+    record = _create_record(user_id, thumb_url='https://cdn/img.thumb.webp')
+
+    full = record.to_dict()
+    assert tuple(full) == FULL_FIELDS
+    assert full['prompt'] == '长' * 60
+    assert full['thumb_url'] == 'https://cdn/img.thumb.webp'
+    assert full['preview_url'] == 'https://cdn/img.png'
+    assert full['created_at'] == '2024-05-01T08:30:15.250000'
+    assert full['timestamp'] == '2024-05-01 08:30:15'
+    assert full['sortTimestamp'] == int(datetime(2024, 5, 1, 8, 30, 15, 250000).timestamp() * 1000)
+
+    simple = record.to_simple_dict()
+    assert tuple(simple) == SIMPLE_FIELDS
+    assert simple['prompt'] == '长' * 50 + '...'
+
+    # 投影查询的Row与ORM对象输出一致（简化版本在SQL中截断提示词）
+    assert compile_fields().serialize(query_image_detail(user_id, record.image_id)) == full
+    fieldset = compile_fields(simple=True)
+    assert fieldset.serialize(query_image_detail(user_id, record.image_id, fieldset=fieldset)) == simple
+
+
+def test_selected_fields(create_user):
+    user_id, _ = create_user()
+    record = _create_record(user_id)
+
+    fields, unknown = parse_fields('preview_url, timestamp,preview_url,bogus')
+    assert unknown == ['bogus']
+    fieldset = compile_fields(('preview_url', 'timestamp'))
+    assert fieldset is compile_fields(('preview_url', 'timestamp'))
+
+    row = query_image_detail(user_id, record.image_id, fieldset=fieldset)
+    assert fieldset.serialize(row) == {'preview_url': 'https://cdn/img.png', 'timestamp': '2024-05-01 08:30:15'}
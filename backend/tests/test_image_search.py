@@ -0,0 +1,39 @@
+from app.utils import image_search
+
+
+def _save(client, headers, data_url, prompt):
+    response = client.post('/api/images/add', json={'image_data': data_url, 'prompt': prompt, 'model': 'm'},
+                           headers=headers)
+    assert response.status_code == 200
+
+
+def _search(client, headers, keyword):
+    response = client.get('/api/images/search', query_string={'q': keyword}, headers=headers)
+    assert response.status_code == 200
+    return sorted(image['prompt'] for image in response.json['data']['images'])
+
+
+def test_search_uses_index_and_falls_back_to_like(app, client, create_user, image_factory, data_url_factory,
+                                                  monkeypatch):
+    _, headers = create_user()
+    _save(client, headers, data_url_factory(image_factory()), '一只橘猫坐在窗台上')
+    _save(client, headers, data_url_factory(image_factory()), 'a red fox in the snow')
+
+    # 启动时只检测，测试库由create_all建表，没有全文索引
+    monkeypatch.setattr(image_search, '_search_index_available', False)
+    assert _search(client, headers, '橘猫坐') == ['一只橘猫坐在窗台上']
+
+    assert image_search.rebuild_search_index()
+    assert image_search.detect_search_index()
+    assert _search(client, headers, '橘猫坐') == ['一只橘猫坐在窗台上']
+    # 短于trigram长度的检索词使用LIKE
+    assert _search(client, headers, '猫') == ['一只橘猫坐在窗台上']
+
+    # 全文索引不可用时全部使用LIKE
+    def unavailable(*args):
+        raise AssertionError('全文索引不可用时不应使用')
+
+    monkeypatch.setattr(image_search, '_search_index_available', False)
+    monkeypatch.setattr(image_search, '_search_sqlite', unavailable)
+    assert _search(client, headers, 'red fox') == ['a red fox in the snow']
+    assert _search(client, headers, '橘猫坐') == ['一只橘猫坐在窗台上']
@@ -0,0 +1,89 @@
+import io
+import json
+
+from app.apis.image import METADATA_HEADER, QUOTA_EXCEEDED_MESSAGE
+from app.models.image_records import ImageRecord
+from app.models.storage_reservation import StorageReservation
+from app.models.user_storage import UserStorage
+from app.utils.storage import file_storage
+
+METADATA = {'prompt': '一只橘猫', 'model': 'm', 'api_key': 'sk-secret', 'model_response': '已生成'}
+
+
+def _upload_octet(client, headers, body, metadata=METADATA):
+    return client.post('/api/images/upload', data=body, headers={
+        **headers,
+        'Content-Type': 'application/octet-stream',
+        METADATA_HEADER: json.dumps(metadata)
+    })
+
+
+def _assert_nothing_saved(user_id):
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+    assert storage.used_storage == 0 and storage.reserved_storage == 0
+    assert ImageRecord.query.count() == 0
+    assert StorageReservation.query.count() == 0
+
+
+def test_octet_stream_reads_metadata_from_header(client, create_user, image_factory):
+    user_id, headers = create_user()
+    image_bytes = image_factory(80, 60)
+
+    response = _upload_octet(client, headers, image_bytes)
+    assert response.status_code == 200, response.json
+
+    record = ImageRecord.query.filter_by(user_id=user_id).one()
+    assert (record.prompt, record.api_key, record.model_response) == ('一只橘猫', 'sk-secret', '已生成')
+    assert (record.image_width, record.image_height, record.image_size) == (80, 60, len(image_bytes))
+    assert file_storage.head_file(record.image_filename)['success']
+    assert UserStorage.query.filter_by(user_id=user_id).one().used_storage == len(image_bytes)
+
+
+def test_octet_stream_rejects_query_metadata(client, create_user, image_factory):
+    user_id, headers = create_user()
+
+    response = client.post('/api/images/upload?prompt=p&model=m&api_key=sk-secret', data=image_factory(),
+                           headers={**headers, 'Content-Type': 'application/octet-stream'})
+    assert response.status_code == 400
+    assert METADATA_HEADER in response.json['message']
+
+    response = client.post('/api/images/upload', data=image_factory(), headers={
+        **headers, 'Content-Type': 'application/octet-stream', METADATA_HEADER: 'not json'
+    })
+    assert response.status_code == 400
+    _assert_nothing_saved(user_id)
+
+
+def test_multipart_reads_metadata_from_form(client, create_user, image_factory):
+    user_id, headers = create_user()
+    image_bytes = image_factory(40, 30, 'JPEG')
+
+    response = client.post('/api/images/upload', data={
+        **METADATA,
+        'image': (io.BytesIO(image_bytes), 'image.jpg')
+    }, headers=headers, content_type='multipart/form-data')
+    assert response.status_code == 200, response.json
+
+    record = ImageRecord.query.filter_by(user_id=user_id).one()
+    assert record.prompt == '一只橘猫' and record.api_key == 'sk-secret'
+    assert record.image_filename.endswith('.jpg')
+    assert record.image_size == len(image_bytes)
+
+
+def test_upload_rejects_oversize_body(client, create_user, image_factory):
+    image_bytes = image_factory(64, 48)
+    user_id, headers = create_user(max_file_size=len(image_bytes) - 1)
+
+    response = _upload_octet(client, headers, image_bytes)
+    assert response.status_code == 400
+    assert response.json['message'] == QUOTA_EXCEEDED_MESSAGE
+    _assert_nothing_saved(user_id)
+
+
+def test_upload_rejects_non_image_body(client, create_user):
+    user_id, headers = create_user()
+
+    response = _upload_octet(client, headers, b'definitely not an image' * 50)
+    assert response.status_code == 400
+    assert '未找到图片' in response.json['message']
+    _assert_nothing_saved(user_id)
@@ -0,0 +1,47 @@
+import base64
+import hashlib
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.oss_transfer import OSSTransferManager
+
+
+class RecordingClient:
+    """记录put_object请求的OSS客户端替身（不发起网络请求）"""
+
+    def __init__(self):
+        self.requests = []
+
+    def put_object(self, request):
+        self.requests.append(request)
+        return SimpleNamespace(status_code=200, etag='"etag"', request_id='req')
+
+    def put_object_from_file(self, request, filepath):
+        raise AssertionError('不应经过临时文件上传')
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    def no_temp_files(*args, **kwargs):
+        raise AssertionError('不应创建临时文件')
+
+    monkeypatch.setattr(tempfile, 'NamedTemporaryFile', no_temp_files)
+    return OSSTransferManager(SimpleNamespace(bucket_name='bucket', client=RecordingClient()))
+
+
+def test_upload_bytes_puts_memory_body_with_integrity_headers(manager):
+    data = b'\x89PNG' + bytes(range(256)) * 64
+
+    result = manager.upload_bytes('ai-images/a.png', data, content_type='image/png')
+
+    assert result['success']
+    (request,) = manager.service.client.requests
+    assert request.body is data
+    assert request.content_length == len(data)
+    assert request.content_md5 == base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+    assert request.content_type == 'image/png'
+    assert result['content_md5'] == request.content_md5
+    assert result['metrics']['mode'] == 'put'
+    assert result['metrics']['bytes'] == len(data)
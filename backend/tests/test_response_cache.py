@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from app.utils.response_cache import response_cache
+
+
+def test_cached_body_keeps_its_etag(app, client, create_user, image_factory, data_url_factory, monkeypatch):
+    monkeypatch.setattr(response_cache, 'enabled', True)
+    user_id, headers = create_user()
+    response = client.post('/api/images/add', json={
+        'image_data': data_url_factory(image_factory()),
+        'prompt': 'old prompt',
+        'model': 'm'
+    }, headers=headers)
+    assert response.status_code == 200
+
+    first = client.get('/api/images/list', headers=headers)
+    assert first.status_code == 200
+    assert first.json['data']['images'][0]['prompt'] == 'old prompt'
+
+    # 绕过ORM修改数据（不会使缓存失效），模拟其他进程的变更尚未同步到本进程缓存
+    db.session.execute(text(
+        "UPDATE image_records SET prompt = 'new prompt', updated_at = :updated_at WHERE user_id = :user_id"
+    ), {'updated_at': datetime.utcnow() + timedelta(seconds=5), 'user_id': user_id})
+    db.session.commit()
+
+    # 缓存中的旧数据必须与它生成时的ETag一起返回
+    cached = client.get('/api/images/list', headers=headers)
+    assert cached.json['data'] == first.json['data']
+    assert cached.headers['ETag'] == first.headers['ETag']
+
+    # 客户端带着旧ETag重新验证不会得到304
+    revalidated = client.get('/api/images/list', headers={**headers, 'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 200
+
+    response_cache.invalidate(user_id)
+    fresh = client.get('/api/images/list', headers=headers)
+    assert fresh.json['data']['images'][0]['prompt'] == 'new prompt'
+    assert fresh.headers['ETag'] != first.headers['ETag']
+
+    not_modified = client.get('/api/images/list', headers={**headers, 'If-None-Match': fresh.headers['ETag']})
+    assert not_modified.status_code == 304
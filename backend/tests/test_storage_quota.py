@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app import db
+from app.models.image_records import ImageRecord
+from app.models.storage_deletion import StorageDeletion
+from app.models.storage_reservation import StorageReservation, reserve_storage
+from app.models.user_storage import UserStorage
+from app.utils.deletion_queue import deletion_queue
+from app.utils.storage import file_storage
+
+
+def test_parallel_saves_and_deletes_keep_counters_consistent(app, create_user, image_factory, data_url_factory):
+    max_images = 8
+    user_id, headers = create_user(max_images=max_images)
+    images = [data_url_factory(image_factory()) for _ in range(32)]
+
+    def save_and_maybe_delete(index):
+        with app.app_context():
+            client = app.test_client()
+            response = client.post('/api/images/add', json={
+                'image_data': images[index],
+                'prompt': f'p{index}',
+                'model': 'm'
+            }, headers=headers)
+            if response.status_code != 200:
+                return response.status_code
+            if index % 2:
+                image_id = response.json['data']['image']['image_id']
+                assert client.delete(f'/api/images/{image_id}', headers=headers).status_code == 200
+            return response.status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        codes = list(executor.map(save_and_maybe_delete, range(len(images))))
+
+    assert codes.count(200) >= max_images
+    assert set(codes) <= {200, 400}
+
+    db.session.rollback()
+    used, count = db.session.query(
+        db.func.coalesce(db.func.sum(ImageRecord.image_size), 0),
+        db.func.count(ImageRecord.id)
+    ).filter(ImageRecord.user_id == user_id, ImageRecord.deleted_at.is_(None)).one()
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+
+    assert storage.used_storage == used
+    assert storage.current_images == count
+    assert count <= max_images
+    assert storage.reserved_storage == 0
+    assert storage.reserved_images == 0
+
+
+def test_dedup_save_and_delete_accounting(client, create_user, image_factory, data_url_factory, monkeypatch):
+    # 不唤醒后台线程，由测试自己处理删除队列
+    monkeypatch.setattr(deletion_queue, 'notify', lambda: None)
+    user_id, headers = create_user()
+    image_bytes = image_factory()
+    data_url = data_url_factory(image_bytes)
+
+    image_ids = []
+    for index in range(2):
+        response = client.post('/api/images/add', json={'image_data': data_url, 'prompt': f'p{index}', 'model': 'm'},
+                               headers=headers)
+        assert response.status_code == 200, response.json
+        image_ids.append(response.json['data']['image']['image_id'])
+
+    records = ImageRecord.query.filter_by(user_id=user_id).all()
+    assert len({record.image_filename for record in records}) == 1
+    filename = records[0].image_filename
+    storage = UserStorage.query.filter_by(user_id=user_id).one()
+    # 同一内容只占用一份空间，图片数量按记录计算
+    assert (storage.used_storage, storage.current_images) == (len(image_bytes), 2)
+
+    # 删除其中一条：文件仍被引用，只归还图片数量
+    assert client.delete(f'/api/images/{image_ids[0]}', headers=headers).status_code == 200
+    db.session.expire_all()
+    assert (storage.used_storage, storage.current_images) == (len(image_bytes), 1)
+    assert StorageDeletion.query.count() == 0
+
+    # 删除最后一条：归还空间并登记删除文件
+    assert client.delete(f'/api/images/{image_ids[1]}', headers=headers).status_code == 200
+    db.session.expire_all()
+    assert (storage.used_storage, storage.current_images) == (0, 0)
+    assert filename in {row.object_key for row in StorageDeletion.query.all()}
+    deletion_queue.drain()
+    assert not file_storage.head_file(filename)['success']
+
+    # 重复删除不会再次归还
+    assert client.delete(f'/api/images/{image_ids[1]}', headers=headers).status_code == 404
+
+
+def test_expired_reservations_are_released_for_all_users(app, create_user):
+    users = [create_user()[0] for _ in range(2)]
+    for user_id in users:
+        assert reserve_storage(user_id, 1000, image_count=2)
+    live = reserve_storage(users[0], 10)
+    StorageReservation.query.filter(StorageReservation.id != live['id']).update(
+        {'expires_at': datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+    )
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['release-reservations'])
+    assert result.exit_code == 0, result.output
+    assert '释放过期预留 2 条' in result.output
+
+    db.session.expire_all()
+    assert [(storage.reserved_storage, storage.reserved_images) for storage in
+            UserStorage.query.order_by(UserStorage.user_id)] == [(10, 1), (0, 0)]
+    assert [row.id for row in StorageReservation.query.all()] == [live['id']]
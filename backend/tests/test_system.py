@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from app.utils.oss_transfer import OSSTransferManager
+from app.utils.storage import file_storage
+
+
+def test_metrics_requires_token(app, client, create_user, monkeypatch):
+    _, headers = create_user()
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', '')
+    assert client.get('/api/system/metrics', headers=headers).status_code == 403
+
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'internal-token')
+    assert client.get('/api/system/metrics', headers=headers).status_code == 401
+    assert client.get('/api/system/metrics', headers={'X-Metrics-Token': 'wrong'}).status_code == 401
+
+    response = client.get('/api/system/metrics', headers={'X-Metrics-Token': 'internal-token'})
+    assert response.status_code == 200
+    assert 'upload_queue' in response.json['data']
+
+
+def test_transfer_metrics_do_not_expose_object_keys():
+    manager = OSSTransferManager(service=None)
+    manager._run('images/1/secret.png', 10, 1, 'put', lambda: SimpleNamespace(status_code=200, etag='"e"', request_id='r'))
+
+    recent = manager.get_metrics()['recent']
+    assert len(recent) == 1
+    assert 'key' not in recent[0]
+    assert 'secret.png' not in str(recent[0])
+
+
+def test_local_and_oss_transfer_metrics_have_the_same_shape():
+    manager = OSSTransferManager(service=None)
+    manager._run('images/1/a.png', 10, 1, 'put', lambda: SimpleNamespace(status_code=200, etag='"e"', request_id='r'))
+    file_storage.put_stream('ai-images/metrics-shape.png', iter([b'data']), content_type='image/png')
+
+    oss_metrics = manager.get_metrics()
+    local_metrics = file_storage.get_metrics()
+    assert set(local_metrics['totals']) == set(oss_metrics['totals'])
+    assert set(local_metrics['recent'][-1]) == set(oss_metrics['recent'][-1])
+    assert 'metrics-shape.png' not in str(local_metrics)
@@ -0,0 +1,32 @@
+import os
+
+from app import db
+from app.models.image_records import ImageRecord
+from app.models.user_storage import UserStorage
+from app.utils.storage import file_storage
+from app.utils.upload_queue import upload_queue
+
+
+def test_async_save_records_transcoded_size(app, client, create_user, image_factory, data_url_factory, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_TRANSCODE_POLICY', 'webp')
+    user_id, headers = create_user()
+    image_bytes = image_factory(256, 256)
+
+    response = client.post('/api/images/add', json={
+        'image_data': data_url_factory(image_bytes),
+        'prompt': 'p',
+        'model': 'm',
+        'async': True
+    }, headers=headers)
+    assert response.status_code == 202
+    image_id = response.json['data']['image_id']
+    assert upload_queue.wait(image_id, 10)
+
+    db.session.rollback()
+    image_record = ImageRecord.query.filter_by(image_id=image_id).one()
+    stored_size = os.path.getsize(file_storage.path_for(image_record.image_filename))
+    assert image_record.status == 'ready'
+    assert image_record.image_filename.endswith('.webp')
+    assert image_record.image_size == stored_size
+    assert image_record.original_size == len(image_bytes)
+    assert UserStorage.query.filter_by(user_id=user_id).one().used_storage == stored_size